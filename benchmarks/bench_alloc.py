@@ -0,0 +1,115 @@
+"""Memory allocated per frame by the streaming hot loop, measured with tracemalloc.
+
+Runs the same steps as ``stream_frames`` on one thread (read/resize into the
+frame ring, detect/track, copy and annotate, encode, pack the message) on the
+synthetic video with the CPU stub detector. The model call itself is left
+out of the measurement, only the code around it is measured. Per frame,
+after a warmup:
+
+    transient  peak of memory allocated while a frame is processed, minus
+               the JPEG itself (the one buffer that is new every frame)
+    retained   growth of traced memory between consecutive frames
+
+Exits with status 1 when the transient peak reaches 5% of a frame (i.e. a
+frame-sized array is still allocated somewhere) or when memory keeps
+growing at steady state.
+
+    python -m benchmarks.bench_alloc [--frames 300] [--warmup 30]
+"""
+import argparse, os, sys, tempfile, tracemalloc
+import numpy as np
+
+from jetson_nano.config import FRAME_WIDTH, FRAME_HEIGHT, PIPELINE_QUEUE_SIZE
+from jetson_nano.batching import InferenceBatcher
+from jetson_nano.buffers import ring_size
+from jetson_nano.session import StreamSession
+from jetson_nano.annotate import annotate_frame
+from common.protocol import encode_frame_into, FLAG_DETECT_ENABLED
+from benchmarks.stubs import make_video, load, StubTracker
+
+FRAME_BYTES = FRAME_WIDTH * FRAME_HEIGHT * 3
+MAX_TRANSIENT = 0.05     # fraction of a frame
+
+
+def measure(session, batcher, frames, warmup):
+    transient, retained, jpeg = [], [], []
+    tracemalloc.start()
+    previous = tracemalloc.get_traced_memory()[0]
+    for i in range(frames):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        frame = session.read_frame()
+        if frame is None:
+            break
+        peak = tracemalloc.get_traced_memory()[1] - base
+
+        # Inference is the model's business, not part of the hot loop being measured
+        results = batcher.predict(*session.model_inputs(frame))
+
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        packet = session.detect_frame(frame, results)
+        np.copyto(session.annotated, frame)
+        annotate_frame(session.annotated, packet["detections"], packet["area"], packet["line"])
+        buffer = session.encoder.encode(session.annotated)
+        message = encode_frame_into(session.message, session.camera_id, packet["index"],
+                                    buffer, FLAG_DETECT_ENABLED, packet["timestamp"])
+        message.release()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base - buffer.nbytes)
+        size = buffer.nbytes
+        del packet, results, frame, buffer
+
+        current = tracemalloc.get_traced_memory()[0]
+        if i >= warmup:
+            transient.append(peak)
+            retained.append(current - previous)
+            jpeg.append(size)
+        previous = current
+    tracemalloc.stop()
+    return np.array(transient), np.array(retained), np.array(jpeg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", default=None, help="video to use (default: synthetic video)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--detector", default="benchmarks.stubs:StubDetector")
+    parser.add_argument("--max-retained", type=float, default=256,
+                        help="allowed mean growth per frame in bytes")
+    args = parser.parse_args()
+
+    video = args.video
+    if video is None:
+        video = make_video(os.path.join(tempfile.mkdtemp(), "synthetic.mp4"), frames=args.frames)
+
+    batcher = InferenceBatcher(load(args.detector))
+    session = StreamSession({"camera": video, "detect": "true", "motion_gate": False}, batcher,
+                            tracker_factory=StubTracker)
+    if not session.open():
+        sys.exit(f"Não foi possível abrir {video}")
+    session.reserve_frames(ring_size(2, PIPELINE_QUEUE_SIZE))
+
+    transient, retained, jpeg = measure(session, batcher, args.frames, args.warmup)
+    session.capture.release()
+    if not len(transient):
+        sys.exit("Vídeo demasiado curto para o warmup")
+
+    print(f"{len(transient)} frames medidos ({FRAME_WIDTH}x{FRAME_HEIGHT}, frame = {FRAME_BYTES} bytes)")
+    print(f"JPEG:      mediana {np.median(jpeg):.0f} B (não contado abaixo)")
+    print(f"transient: mediana {np.median(transient):.0f} B | máx {transient.max()} B "
+          f"({transient.max() / FRAME_BYTES:.1%} de um frame)")
+    print(f"retained:  média {retained.mean():.1f} B/frame | total {retained.sum()} B")
+
+    failed = False
+    if transient.max() >= MAX_TRANSIENT * FRAME_BYTES:
+        print("FALHOU: ainda há arrays do tamanho de um frame alocados por frame")
+        failed = True
+    if retained.mean() > args.max_retained:
+        print("FALHOU: a memória continua a crescer em regime estável")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Per-frame cost of the area test with 0, 50 and 500 detections.
+
+Compares the old path (mask rebuilt every frame + Python loop per box) with
+the cached ``CompiledArea`` and its vectorised centroid test.
+
+    python -m benchmarks.bench_area
+"""
+import timeit
+import cv2, numpy as np
+
+from jetson_nano.area import compile_area
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+AREA = [[100, 80], [540, 60], [600, 420], [80, 440]]
+DETECTIONS = (0, 50, 500)
+REPEAT = 200
+
+
+def legacy_frame(area_points, xyxy):
+    """Previous per-frame code: create_mask + isinstance per box"""
+    mask = np.zeros((FRAME_HEIGHT, FRAME_WIDTH), dtype=np.uint8)
+    pts = np.array(area_points, np.int32)
+    hull = cv2.convexHull(pts)
+    cv2.fillPoly(mask, [hull], 255)
+    mask = (mask, hull)
+
+    inside = []
+    for box in xyxy.tolist():
+        x1, y1, x2, y2 = map(int, box)
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        inside.append(mask[0][cy, cx] > 0 if isinstance(mask, tuple) else mask[cy, cx] > 0)
+    return inside
+
+
+def compiled_frame(area_points, xyxy):
+    area = compile_area(area_points, FRAME_WIDTH, FRAME_HEIGHT)
+    return area.contains(xyxy)
+
+
+def random_boxes(n, rng):
+    x1 = rng.uniform(0, FRAME_WIDTH - 40, n)
+    y1 = rng.uniform(0, FRAME_HEIGHT - 40, n)
+    w = rng.uniform(10, 40, n)
+    h = rng.uniform(10, 40, n)
+    return np.stack((x1, y1, x1 + w, y1 + h), axis=1).astype(np.float32)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'detections':>10} {'legacy (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+    for n in DETECTIONS:
+        xyxy = random_boxes(n, rng)
+        assert list(compiled_frame(AREA, xyxy)) == legacy_frame(AREA, xyxy)
+
+        legacy = min(timeit.repeat(lambda: legacy_frame(AREA, xyxy), number=REPEAT, repeat=5)) / REPEAT
+        compiled = min(timeit.repeat(lambda: compiled_frame(AREA, xyxy), number=REPEAT, repeat=5)) / REPEAT
+        print(f"{n:>10} {legacy * 1e6:>12.1f} {compiled * 1e6:>14.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
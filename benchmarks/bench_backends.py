@@ -0,0 +1,107 @@
+"""Latency and throughput of every inference backend/precision on a video.
+
+Loads the model through jetson_nano.backends for each combination (the
+export is done once and cached in jetson_nano/models/exports; its time is
+reported separately), then times single-frame calls (latency) and batched
+calls (throughput) on frames of the test video. Combinations whose runtime
+is not installed are reported and skipped.
+
+    python -m benchmarks.bench_backends [--video tests/data/sheepHerd1.mp4] [--backends onnx openvino]
+"""
+import argparse, json, sys, time
+import cv2, numpy as np
+
+from jetson_nano.config import FRAME_WIDTH, FRAME_HEIGHT, MODEL_PATH, MAX_BATCH_SIZE
+from jetson_nano.backends import SUPPORTED, REQUIRES, available, select_device, load_model, export_model, PYTORCH
+
+
+def read_frames(video, count):
+    capture = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT)))
+    capture.release()
+    return frames
+
+
+def bench(model, frames, batch, warmup=3):
+    for frame in frames[:warmup]:
+        model.predict([frame])
+
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        model.predict([frame])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        model.predict(frames[i:i + batch])
+    throughput = len(frames) / (time.perf_counter() - start)
+
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "fps_batch1": round(1000 / float(ms.mean()), 2),
+        f"fps_batch{batch}": round(throughput, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", default="tests/data/sheepHerd1.mp4")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--backends", nargs="+", default=list(SUPPORTED))
+    parser.add_argument("--precisions", nargs="+", default=["fp32", "fp16", "int8"])
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        sys.exit(f"Não foi possível ler {args.video}")
+    device = select_device(args.device)
+    print(f"{len(frames)} frames de {args.video} | device {device}")
+
+    results = []
+    for backend in args.backends:
+        for precision in args.precisions:
+            if precision not in SUPPORTED[backend]:
+                continue
+            if not available(backend):
+                print(f"{backend:>9}/{precision}: ignorado ({REQUIRES[backend]} não instalado)")
+                continue
+            if backend == PYTORCH and precision == "fp16" and device == "cpu":
+                print(f"{backend:>9}/{precision}: ignorado (FP16 só em GPU)")
+                continue
+            try:
+                start = time.perf_counter()
+                export_model(args.model, backend, precision)
+                export_time = time.perf_counter() - start
+                model = load_model(args.model, backend, precision, device, fallback=False)
+                row = {"backend": backend, "precision": precision, "device": model.device,
+                       "export_s": round(export_time, 1), **bench(model, frames, args.batch)}
+            except Exception as e:
+                print(f"{backend:>9}/{precision}: falhou ({e})")
+                continue
+            results.append(row)
+            print(f"{backend:>9}/{precision}: p50 {row['p50_ms']:7.2f} ms | p95 {row['p95_ms']:7.2f} ms | "
+                  f"{row['fps_batch1']:7.2f} fps (batch 1) | {row[f'fps_batch{args.batch}']:7.2f} fps "
+                  f"(batch {args.batch}) | export {row['export_s']} s")
+
+    if results:
+        best = max(results, key=lambda r: r[f"fps_batch{args.batch}"])
+        print(f"Mais rápido: {best['backend']}/{best['precision']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
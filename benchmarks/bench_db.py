@@ -0,0 +1,103 @@
+"""Logins and role lookups per second under concurrent requests.
+
+Compares the previous access pattern (a new sqlite3 connection per call,
+run on the default thread pool) with ``ConnectionPool`` (WAL, per-thread
+connections, cached statements, dedicated executor). Passwords are hashed
+with a low bcrypt cost so the database work is what gets measured.
+
+    python -m benchmarks.bench_db [--requests 2000] [--concurrency 32]
+"""
+import argparse, asyncio, os, sqlite3, tempfile, time
+from passlib.context import CryptContext
+
+from server.db_pool import ConnectionPool
+from server.database_handler import SELECT_USER, SELECT_USER_ROLES
+
+USERS = 200
+fast_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+def create_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            password TEXT NOT NULL);
+        CREATE TABLE roles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL);
+        CREATE TABLE userRoles (id_user INTEGER NOT NULL, id_role INTEGER NOT NULL,
+                                PRIMARY KEY (id_user, id_role));
+    """)
+    password = fast_context.hash("secret")
+    conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                     [(f"user{i}", password) for i in range(USERS)])
+    conn.executemany("INSERT INTO roles (name) VALUES (?)",
+                     [(r,) for r in ("Admin", "Operator", "Viewer", "DataExporter")])
+    conn.executemany("INSERT OR IGNORE INTO userRoles VALUES (?, ?)",
+                     [(i + 1, 1 + i % 4) for i in range(USERS)] + [(i + 1, 4) for i in range(0, USERS, 3)])
+    conn.commit()
+    conn.close()
+
+
+# ---------------- previous code ----------------
+def legacy_login(db_path, username):
+    conn = sqlite3.connect(db_path)
+    user = conn.execute(SELECT_USER, (username,)).fetchone()
+    conn.close()
+    return user and fast_context.verify("secret", user[1])
+
+def legacy_roles(db_path, username):
+    conn = sqlite3.connect(db_path)
+    roles = [row[0] for row in conn.execute(SELECT_USER_ROLES, (username,)).fetchall()]
+    conn.close()
+    return roles
+
+
+# ---------------- pooled ----------------
+def pooled_login(pool, username):
+    user = pool.connection().execute(SELECT_USER, (username,)).fetchone()
+    return user and fast_context.verify("secret", user[1])
+
+def pooled_roles(pool, username):
+    return [row[0] for row in pool.connection().execute(SELECT_USER_ROLES, (username,)).fetchall()]
+
+
+async def measure(call, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await call(f"user{i % USERS}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def run(db_path, requests, concurrency):
+    pool = ConnectionPool(db_path)
+    cases = [
+        ("login", "legacy", lambda u: asyncio.to_thread(legacy_login, db_path, u)),
+        ("login", "pool", lambda u: pool.run(pooled_login, pool, u)),
+        ("roles", "legacy", lambda u: asyncio.to_thread(legacy_roles, db_path, u)),
+        ("roles", "pool", lambda u: pool.run(pooled_roles, pool, u)),
+    ]
+    print(f"{requests} requests, concurrency {concurrency}")
+    for operation, variant, call in cases:
+        rate = await measure(call, requests, concurrency)
+        print(f"{operation:>6} {variant:>7}: {rate:10.0f} ops/s")
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        create_database(db_path)
+        asyncio.run(run(db_path, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
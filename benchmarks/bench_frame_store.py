@@ -0,0 +1,102 @@
+"""Insert and read throughput: frames.image BLOB vs the segment FrameStore.
+
+Inserts go in batches with executemany inside one transaction (as the
+ingestion writer does). Reads fetch random frames by primary key; the
+store returns memoryviews over mmap'd segments, the BLOB column copies
+every image out of SQLite. "read+crc" also touches every byte.
+
+    python -m benchmarks.bench_frame_store [--frames 2000] [--size 50000]
+"""
+import argparse, os, random, sqlite3, tempfile, time, zlib
+
+from server.frame_store import FrameStore
+
+BATCH = 200
+
+
+def blob_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE frames (frame_number INTEGER PRIMARY KEY, captured_time TEXT NOT NULL,
+                                         image BLOB NOT NULL)""")
+    return conn
+
+def segment_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE frames (frame_number INTEGER PRIMARY KEY, captured_time TEXT NOT NULL,
+                                         image_segment INTEGER NOT NULL, image_offset INTEGER NOT NULL,
+                                         image_length INTEGER NOT NULL, image_hash TEXT NOT NULL)""")
+    return conn
+
+
+def insert_blob(conn, images):
+    for start in range(0, len(images), BATCH):
+        with conn:
+            conn.executemany("INSERT INTO frames VALUES (?, 'now', ?)",
+                             [(start + i, img) for i, img in enumerate(images[start:start + BATCH])])
+
+def insert_segment(conn, store, images):
+    for start in range(0, len(images), BATCH):
+        rows = [(start + i, *store.append(img)) for i, img in enumerate(images[start:start + BATCH])]
+        store.flush()
+        with conn:
+            conn.executemany("INSERT INTO frames VALUES (?, 'now', ?, ?, ?, ?)", rows)
+
+
+def read_blob(conn, keys, consume):
+    for key in keys:
+        image = conn.execute("SELECT image FROM frames WHERE frame_number=?", (key,)).fetchone()[0]
+        consume(image)
+
+def read_segment(conn, store, keys, consume):
+    for key in keys:
+        location = conn.execute("SELECT image_segment, image_offset, image_length FROM frames "
+                                "WHERE frame_number=?", (key,)).fetchone()
+        consume(store.read(*location))
+
+
+def db_size(path):
+    """Database plus WAL size in MB"""
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 1e6
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=50_000, help="bytes per image")
+    args = parser.parse_args()
+
+    images = [os.urandom(args.size) for _ in range(args.frames)]
+    keys = [random.randrange(args.frames) for _ in range(args.frames)]
+    mb = args.frames * args.size / 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blob = blob_db(os.path.join(tmp, "blob.db"))
+        seg = segment_db(os.path.join(tmp, "segment.db"))
+        store = FrameStore(os.path.join(tmp, "segments"), segment_size=16 * 1024 * 1024)
+
+        results = {
+            "insert": (timed(insert_blob, blob, images), timed(insert_segment, seg, store, images)),
+            "read": (timed(read_blob, blob, keys, len), timed(read_segment, seg, store, keys, len)),
+            "read+crc": (timed(read_blob, blob, keys, zlib.crc32), timed(read_segment, seg, store, keys, zlib.crc32)),
+        }
+        print(f"{args.frames} frames x {args.size} bytes")
+        for name, (t_blob, t_seg) in results.items():
+            print(f"{name:>9}: blob {args.frames / t_blob:8.0f} frames/s ({mb / t_blob:7.1f} MB/s) | "
+                  f"segments {args.frames / t_seg:8.0f} frames/s ({mb / t_seg:7.1f} MB/s)")
+        print(f"database size: blob {db_size(os.path.join(tmp, 'blob.db')):.1f} MB | "
+              f"segments {db_size(os.path.join(tmp, 'segment.db')):.2f} MB")
+        store.close()
+        blob.close()
+        seg.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Login latency (p50/p99) and event-loop lag during a burst of logins.
+
+"threadpool" mirrors the old sync /login endpoint (bcrypt on the shared
+thread pool); "verifier" is PasswordVerifier with a process pool and a
+queue limit, so excess logins are rejected (HTTP 429) instead of waiting.
+Loop lag approximates the delay seen by websocket traffic meanwhile.
+
+    python -m benchmarks.bench_login [--logins 200] [--rounds 10]
+"""
+import argparse, asyncio, os, statistics, time
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def loop_lag(stop, samples, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def burst(verify, logins):
+    from server.password_verifier import LoginBusy
+    latencies, rejected = [], 0
+    lag, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(loop_lag(stop, lag))
+
+    async def one():
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            await verify()
+            latencies.append(time.perf_counter() - start)
+        except LoginBusy:
+            rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    return latencies, rejected, lag, elapsed
+
+
+def report(name, latencies, rejected, lag, elapsed):
+    print(f"{name:>10}: ok {len(latencies):4d} rejected {rejected:4d} | "
+          f"p50 {percentile(latencies, 0.5) * 1000:8.1f} ms p99 {percentile(latencies, 0.99) * 1000:8.1f} ms | "
+          f"loop lag max {max(lag or [0]) * 1000:6.1f} ms mean {statistics.fmean(lag or [0]) * 1000:5.2f} ms | "
+          f"{len(latencies) / elapsed:6.1f} logins/s")
+
+
+async def run(args):
+    # Same cost as the server config, so no login triggers a rehash
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from server.auth import pwd_context as context
+    from server.password_verifier import PasswordVerifier
+    hashed = context.hash("secret")
+
+    latencies, rejected, lag, elapsed = await burst(
+        lambda: asyncio.to_thread(context.verify_and_update, "secret", hashed), args.logins)
+    report("threadpool", latencies, rejected, lag, elapsed)
+
+    verifier = PasswordVerifier(executor="process", workers=args.workers, queue_limit=args.queue_limit)
+    await verifier.verify("secret", hashed)  # start the worker processes
+    latencies, rejected, lag, elapsed = await burst(lambda: verifier.verify("secret", hashed), args.logins)
+    report("verifier", latencies, rejected, lag, elapsed)
+    verifier.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-limit", type=int, default=16)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
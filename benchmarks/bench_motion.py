@@ -0,0 +1,105 @@
+"""Motion-gated inference: counts and inference time with the gate on vs off.
+
+Runs the same video through two StreamSessions (same model, fresh tracker
+each) frame by frame, once with the motion gate and once without, and
+compares the final sheep counts. Exits with status 1 when the gate
+changes the count, or when a detection after motion-gated frames gets the
+wrong velocity (the motion since the last detection spread over one frame
+instead of the whole gap).
+
+Without --video a synthetic video with still stretches (benchmarks/stubs.py)
+is used with the stub detector and tracker, so it runs on any CPU.
+
+    python -m benchmarks.bench_motion [--video tests/data/sheepHerd1.mp4] [--area "[[x,y],...]"]
+"""
+import argparse, json, os, sys, tempfile, time
+import numpy as np
+
+from jetson_nano.backends import load_model
+from jetson_nano.batching import InferenceBatcher
+from jetson_nano.buffers import Detections
+from jetson_nano.config import FRAME_WIDTH, FRAME_HEIGHT
+from jetson_nano.session import StreamSession
+from jetson_nano.stride import TrackExtrapolator
+from benchmarks.stubs import make_video, load, StubTracker
+
+
+def check_hold(gap=30, step=1):
+    """Detection, ``gap - 1`` held frames, detection moved ``gap * step`` px: the velocity must be ``step`` px/frame"""
+    def detections(x):
+        return Detections(np.array([[x, 100, x + 40, 140]], dtype=np.int32), np.array([1]),
+                          np.zeros(1, dtype=bool), np.zeros(1, dtype=bool))
+
+    extrapolator = TrackExtrapolator()
+    extrapolator.update(0, detections(100))
+    for _ in range(1, gap):
+        extrapolator.hold()
+    extrapolator.update(gap, detections(100 + gap * step))
+    x = int(extrapolator.predict(gap + 3, FRAME_WIDTH, FRAME_HEIGHT).xyxy[0, 0])
+    expected = 100 + (gap + 3) * step
+    if abs(x - expected) > 1:
+        return f"caixa em x={x} no frame {gap + 3}, esperado {expected}"
+    return None
+
+
+def run(batcher, video, area, motion_gate, tracker_factory):
+    params = {"camera": video, "detect": "true", "area": area, "motion_gate": motion_gate}
+    session = StreamSession(params, batcher, **({"tracker_factory": tracker_factory} if tracker_factory else {}))
+    if not session.open():
+        sys.exit(f"Não foi possível abrir {video}")
+
+    frames = 0
+    start = time.perf_counter()
+    while (frame := session.read_frame()) is not None:
+        session.detect_frame(frame)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    session.capture.release()
+    return session, frames, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", default=None, help="video to use (default: synthetic video with the stub detector)")
+    parser.add_argument("--area", default="[]", help="area polygon as JSON")
+    parser.add_argument("--frames", type=int, default=300, help="length of the synthetic video")
+    parser.add_argument("--detector", default=None, help="module:Class instead of the YOLO model")
+    parser.add_argument("--device", default="auto")
+    args = parser.parse_args()
+    area = json.loads(args.area)
+
+    failure = check_hold()
+    if failure:
+        print("Extrapolação errada depois do motion gate:", failure)
+        sys.exit(1)
+
+    video, tracker_factory = args.video, None
+    if video is None:
+        video = make_video(os.path.join(tempfile.mkdtemp(), "synthetic.mp4"), frames=args.frames, still=True)
+        args.detector = args.detector or "benchmarks.stubs:StubDetector"
+    if args.detector:
+        tracker_factory = StubTracker
+
+    model = load(args.detector) if args.detector else load_model(device=args.device)
+    batcher = InferenceBatcher(model)
+    batcher.register()
+    try:
+        baseline, frames, t_off = run(batcher, video, area, False, tracker_factory)
+        gated, _, t_on = run(batcher, video, area, True, tracker_factory)
+    finally:
+        batcher.unregister()
+
+    stats = gated.motion_gate.stats(gated.stride_control.latency)
+    print(f"{frames} frames")
+    print(f"gate off: count {baseline.sheep_count:4d} | tracks {len(baseline.registry):4d} | {frames / t_off:6.1f} fps")
+    print(f"gate on : count {gated.sheep_count:4d} | tracks {len(gated.registry):4d} | {frames / t_on:6.1f} fps")
+    print(f"skip ratio {stats['motion_skip_ratio']} | gate {stats['motion_gate_ms']} ms/frame | "
+          f"inference saved {stats['inference_saved_s']} s")
+
+    if gated.sheep_count != baseline.sheep_count:
+        print("Contagens diferentes com o motion gate.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
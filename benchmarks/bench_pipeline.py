@@ -0,0 +1,289 @@
+"""Per-stage timings of the detection pipeline and the server relay, CPU only.
+
+Generates a synthetic video (benchmarks/stubs.py) unless --video is given,
+replaces YOLO and the tracker with pluggable stubs, and runs the Jetson
+app's stream_frames on it, timing every stage through its observer: read
+(capture and resize), detect (model, tracker, area mask and counting),
+render (annotate and encode) and send (binary frame over a loopback
+websocket). Those are the real Pipeline, queues and stages, so the
+threads and queues between them are measured too (fps). The relay part starts a stand-in Jetson websocket,
+connects the real JetsonBroker to it and measures how long frames take to
+reach fake browser subscribers.
+
+Results go to tests/results/logs/benchmark.json (and a bar chart in
+tests/results/plots/benchmark.png when matplotlib is installed). The run
+fails when a stage's median is more than --threshold slower than the
+baseline of this host (machine and CPU count) in benchmarks/baseline.json;
+--update-baseline stores the current run as this host's baseline instead.
+
+    python -m benchmarks.bench_pipeline [--frames 300] [--detector benchmarks.stubs:StubDetector]
+"""
+import argparse, asyncio, json, os, platform, sys, tempfile, time
+import cv2, numpy as np
+import websockets
+
+from jetson_nano import jetson_controller as jetson
+from jetson_nano.config import FRAME_WIDTH, FRAME_HEIGHT
+from jetson_nano.link import ClientLink
+from jetson_nano.session import StreamSession
+from common.protocol import encode_frame, decode_header, camera_key, FLAG_DETECT_ENABLED
+from benchmarks.stubs import make_video, load, StubTracker
+
+RESULTS_PATH = "tests/results/logs/benchmark.json"
+PLOT_PATH = "tests/results/plots/benchmark.png"
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+STAGES = ("read", "detect", "render", "send")
+AREA = [[100, 60], [540, 60], [600, 420], [40, 420]]
+RELAY_CAMERA = "benchmark"
+MIN_REGRESSION_MS = 0.05     # differences below this are noise, whatever the ratio
+
+
+def summarize(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+# ==============================================================
+# Pipeline stages
+# ==============================================================
+class LoopbackSocket:
+    """The app's websocket interface over a ``websockets`` client connection"""
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    async def send_bytes(self, message):
+        await self.ws.send(message)
+
+    async def send_text(self, message):
+        await self.ws.send(message)
+
+
+async def bench_stages(video, detector):
+    # the real stream_frames (Pipeline, queues, stages and send_frame), timed by its stage observer
+    jetson.SHOW_LOCAL = False
+    jetson.batcher.model = detector
+    session = StreamSession({"camera": video, "detect": "true", "area": AREA, "motion_gate": False},
+                            jetson.batcher, tracker_factory=StubTracker)
+    if not session.open():
+        sys.exit(f"Não foi possível abrir {video}")
+
+    async def sink(ws):
+        async for _ in ws:
+            pass
+
+    times = {stage: [] for stage in STAGES}
+    async with websockets.serve(sink, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+            start = time.perf_counter()
+            await jetson.stream_frames(ClientLink(LoopbackSocket(ws)), session,
+                                       observer=lambda stage, seconds: times[stage].append(seconds))
+            elapsed = time.perf_counter() - start
+
+    frames = len(times["send"])
+    return {
+        "frames": frames,
+        "fps": round(frames / elapsed, 2),
+        "sheep_count": session.sheep_count,
+        "stages": {stage: summarize(samples) for stage, samples in times.items() if samples},
+    }
+
+
+# ==============================================================
+# Server relay
+# ==============================================================
+class FakeBrowser:
+    """Subscriber websocket that records when each frame arrives"""
+
+    def __init__(self):
+        self.latencies = []
+
+    async def send_bytes(self, message):
+        self.latencies.append(time.time() - decode_header(message)["timestamp"])
+
+    async def send_text(self, message):
+        pass
+
+
+async def bench_relay(messages, subscribers):
+    from server.jetson_broker import broker, Subscriber
+
+    async def jetson(ws):
+        # stand-in Jetson: stream every frame once all browsers are subscribed
+        async for text in ws:
+            command = json.loads(text)
+            if command.get("type") == "subscribers" and command.get("count") == subscribers:
+                for camera_id, sequence, payload in messages:
+                    await ws.send(encode_frame(camera_id, sequence, payload, FLAG_DETECT_ENABLED))
+
+    browsers = [FakeBrowser() for _ in range(subscribers)]
+    async with websockets.serve(jetson, "127.0.0.1", 0) as server:
+        url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        subs = [Subscriber(browser, "benchmark", maxsize=len(messages)) for browser in browsers]
+        links = [await broker.connect(url) for _ in subs]
+        start = time.perf_counter()
+        for link, sub in zip(links, subs):
+            await broker.subscribe(link, sub, {"camera": RELAY_CAMERA})
+        while any(len(b.latencies) < len(messages) for b in browsers):
+            if time.perf_counter() - start > 60:
+                break
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        for link, sub in zip(links, subs):
+            await broker.disconnect(link, sub)
+            sub.close()
+
+    latencies = [lat for b in browsers for lat in b.latencies]
+    return {
+        "messages": len(messages),
+        "subscribers": subscribers,
+        "delivered": len(latencies),
+        "messages_per_sec": round(len(latencies) / elapsed, 2),
+        "latency": summarize(latencies) if latencies else None,
+    }
+
+
+# ==============================================================
+# Baseline / report
+# ==============================================================
+def host_key(meta):
+    """Baselines are only comparable on the same kind of machine"""
+    return f"{meta['machine']}-{meta['cpus']}cpu"
+
+
+def load_baselines(path):
+    """Baseline runs by host_key (a file with a single run is keyed by its own meta)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if "meta" in data:
+        return {host_key(data["meta"]): data}
+    return data
+
+
+def regressions(results, baseline, threshold):
+    failed = []
+    for stage, current in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        limit = base["p50_ms"] * (1 + threshold)
+        if current["p50_ms"] > limit and current["p50_ms"] - base["p50_ms"] > MIN_REGRESSION_MS:
+            failed.append(f"{stage}: {current['p50_ms']:.3f} ms > {limit:.3f} ms (baseline {base['p50_ms']:.3f})")
+    base_relay = (baseline.get("relay") or {}).get("latency")
+    relay = results["relay"]["latency"]
+    if base_relay and relay:
+        limit = base_relay["p50_ms"] * (1 + threshold)
+        if relay["p50_ms"] > limit and relay["p50_ms"] - base_relay["p50_ms"] > MIN_REGRESSION_MS:
+            failed.append(f"relay: {relay['p50_ms']:.3f} ms > {limit:.3f} ms (baseline {base_relay['p50_ms']:.3f})")
+    return failed
+
+
+def plot(results, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib não instalado: gráfico não gerado")
+        return
+
+    stages = list(results["stages"]) + ["relay"]
+    stats = list(results["stages"].values()) + [results["relay"]["latency"] or {"p50_ms": 0, "p95_ms": 0}]
+    x = np.arange(len(stages))
+    fig, ax = plt.subplots(figsize=(9, 4))
+    ax.bar(x - 0.2, [s["p50_ms"] for s in stats], 0.4, label="p50")
+    ax.bar(x + 0.2, [s["p95_ms"] for s in stats], 0.4, label="p95")
+    ax.set_xticks(x, stages)
+    ax.set_ylabel("ms / frame")
+    ax.set_title(f"Pipeline stages ({results['meta']['detector']}, {results['pipeline']['fps']} fps)")
+    ax.legend()
+    fig.tight_layout()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fig.savefig(path)
+    plt.close(fig)
+
+
+async def run(args):
+    detector = load(args.detector)
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_video(os.path.join(tmp, "synthetic.mp4"), frames=args.frames)
+        pipeline = await bench_stages(video, detector)
+
+        # relay the same kind of frames the pipeline produced
+        payload = cv2.imencode(".jpg", np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8))[1].tobytes()
+        messages = [(camera_key(RELAY_CAMERA), i, payload) for i in range(args.frames)]
+        relay = await bench_relay(messages, args.subscribers)
+
+    return {
+        "meta": {
+            "detector": args.detector,
+            "video": args.video or f"synthetic ({args.frames} frames)",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "pipeline": {k: v for k, v in pipeline.items() if k != "stages"},
+        "stages": pipeline["stages"],
+        "relay": relay,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--video", default=None, help="use this video instead of a synthetic one")
+    parser.add_argument("--detector", default="benchmarks.stubs:StubDetector")
+    parser.add_argument("--subscribers", type=int, default=4)
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown vs baseline (0.5 = +50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    with open(RESULTS_PATH, "w") as f:
+        json.dump(results, f, indent=2)
+    plot(results, PLOT_PATH)
+
+    print(f"{results['pipeline']['frames']} frames | {results['pipeline']['fps']} fps | "
+          f"{results['pipeline']['sheep_count']} counted")
+    for stage, s in results["stages"].items():
+        print(f"{stage:>9}: p50 {s['p50_ms']:8.3f} ms | p95 {s['p95_ms']:8.3f} ms")
+    relay = results["relay"]
+    if relay["latency"]:
+        print(f"{'relay':>9}: p50 {relay['latency']['p50_ms']:8.3f} ms | p95 {relay['latency']['p95_ms']:8.3f} ms "
+              f"| {relay['messages_per_sec']} msg/s to {relay['subscribers']} subscribers")
+
+    baselines = load_baselines(args.baseline)
+    host = host_key(results["meta"])
+    if args.update_baseline:
+        baselines[host] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline de {host} guardada em {args.baseline}")
+        return
+
+    if host not in baselines:
+        if baselines:
+            print(f"Aviso: sem baseline para {host} (há {', '.join(sorted(baselines))}); "
+                  f"regressões não verificadas, use --update-baseline")
+        return
+    failed = regressions(results, baselines[host], args.threshold)
+    if failed:
+        print("Regressões:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Bytes and CPU per frame: old double send vs the binary frame protocol.
+
+Before: JPEG bytes, plus the same JPEG as base64 inside a JSON text message
+whenever new detections were flagged. After: one binary message with the
+fixed header and the JPEG payload.
+
+    python -m benchmarks.bench_protocol [video] [--new-ratio 0.1]
+"""
+import argparse, base64, json, time
+from datetime import datetime
+import cv2, numpy as np
+
+from common.protocol import encode_frame, decode_frame, camera_key, FLAG_NEW_DETECTIONS
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+MAX_FRAMES = 300
+
+
+def load_frames(path):
+    frames = []
+    if path:
+        capture = cv2.VideoCapture(path)
+        while len(frames) < MAX_FRAMES:
+            success, frame = capture.read()
+            if not success:
+                break
+            frames.append(cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT)))
+        capture.release()
+    if not frames:
+        # Synthetic textured frames when no video is available
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(rng.integers(0, 255, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8), (0, 0), 3)
+        frames = [np.roll(base, i * 4, axis=1) for i in range(MAX_FRAMES)]
+    return frames
+
+
+def legacy_send(frame, new_detection, camera, sequence):
+    _, buffer = cv2.imencode(".jpg", frame)
+    messages = []
+    if new_detection:
+        messages.append(json.dumps({
+            "type": "frame",
+            "camera_id": camera,
+            "timestamp": datetime.utcnow().isoformat(),
+            "new_detections": True,
+            "image": base64.b64encode(buffer).decode("utf-8")
+        }).encode("utf-8"))
+    messages.append(buffer.tobytes())
+    return messages
+
+
+def binary_send(frame, new_detection, camera, sequence):
+    _, buffer = cv2.imencode(".jpg", frame)
+    flags = FLAG_NEW_DETECTIONS if new_detection else 0
+    return [encode_frame(camera_key(camera), sequence, buffer, flags)]
+
+
+def run(frames, new_ratio, send):
+    camera = "tests/data/sheepHerd1.mp4"
+    every = max(1, round(1 / new_ratio)) if new_ratio > 0 else 0
+    total_bytes = 0
+    start = time.process_time()
+    for i, frame in enumerate(frames):
+        new_detection = every > 0 and i % every == 0
+        messages = send(frame, new_detection, camera, i)
+        total_bytes += sum(len(m) for m in messages)
+    cpu = time.process_time() - start
+    return total_bytes / len(frames), cpu / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video", nargs="?", default="tests/data/sheepHerd1.mp4")
+    parser.add_argument("--new-ratio", type=float, default=0.1,
+                        help="fraction of frames flagged with new detections")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video)
+    header, payload = decode_frame(binary_send(frames[0], True, "0", 7)[0])
+    assert header["sequence"] == 7 and header["new_detections"] and bytes(payload[:2]) == b"\xff\xd8"
+
+    print(f"{len(frames)} frames, new-detection ratio {args.new_ratio}")
+    for ratio in sorted({0.0, args.new_ratio, 1.0}):
+        before_bytes, before_cpu = run(frames, ratio, legacy_send)
+        after_bytes, after_cpu = run(frames, ratio, binary_send)
+        print(f"ratio {ratio:>4.2f} | before {before_bytes / 1024:8.1f} KiB {before_cpu * 1000:6.2f} ms"
+              f" | after {after_bytes / 1024:8.1f} KiB {after_cpu * 1000:6.2f} ms"
+              f" | saved {(1 - after_bytes / before_bytes) * 100:4.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Server–Jetson link drops: reconnect, session resume and counts with a local stand-in Jetson.
+
+The stand-in is the Jetson app itself (jetson_nano.jetson_controller) with
+the CPU stub detector and tracker, served by uvicorn on a local port. The
+server's broker reaches it through a TCP proxy that is cut a few times
+while a video streams, like a flaky farm link. The same video is first
+streamed without cuts as the reference.
+
+Exits with status 1 when the cuts change the final count, when count
+events are missing at the browser, or when a stream was restarted instead
+of resumed.
+
+    python -m benchmarks.bench_reconnect [--frames 900] [--cuts 3] [--interval 1.0]
+"""
+import argparse, asyncio, json, os, sys, tempfile, time
+
+# fast retries for the test, and a throwaway database
+os.environ.setdefault("RECONNECT_BASE_DELAY", "0.1")
+os.environ.setdefault("RECONNECT_MAX_DELAY", "1.0")
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import uvicorn
+
+from jetson_nano import jetson_controller as jetson
+from jetson_nano.link import links
+from common.protocol import HEADER_SIZE
+from server.jetson_broker import broker, Subscriber
+from benchmarks.stubs import make_video, load, StubTracker
+
+
+# ==============================================================
+# Flaky link
+# ==============================================================
+class FlakyProxy:
+    """TCP proxy to the Jetson whose connections can be cut at any time"""
+
+    def __init__(self, target_port):
+        self.target_port = target_port
+        self.connections = set()
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        pair = (writer, up_writer)
+        self.connections.add(pair)
+        await asyncio.gather(self._pipe(reader, up_writer), self._pipe(up_reader, writer))
+        self.connections.discard(pair)
+
+    @staticmethod
+    async def _pipe(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def cut(self):
+        for a, b in list(self.connections):
+            a.transport.abort()
+            b.transport.abort()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class FakeBrowser:
+    """Subscriber websocket keeping what a browser would have received"""
+
+    def __init__(self):
+        self.frames = 0
+        self.counted = 0
+        self.statuses = []
+
+    async def send_bytes(self, message):
+        if len(message) >= HEADER_SIZE:
+            self.frames += 1
+
+    async def send_text(self, message):
+        data = json.loads(message)
+        if data.get("type") == "count":
+            self.counted += data.get("new", 0)
+        elif "status" in data:
+            self.statuses.append((time.perf_counter(), data))
+
+
+# ==============================================================
+# Runs
+# ==============================================================
+async def stream(video, proxy, cuts, interval):
+    """Stream the video through the proxy, cutting it ``cuts`` times; returns what happened"""
+    browser = FakeBrowser()
+    subscriber = Subscriber(browser, "benchmark", maxsize=1_000_000)
+    link = await broker.connect(f"ws://127.0.0.1:{proxy.port}/jetson_ws")
+    await broker.subscribe(link, subscriber, {"camera": video, "detect": "true"})
+
+    # the Jetson side of this link, found by the id the broker sent in "hello"
+    while (jetson_link := links.get(link.id)) is None or video not in jetson_link.sessions:
+        await asyncio.sleep(0.01)
+    session = jetson_link.sessions[video]
+
+    start = time.perf_counter()
+    for _ in range(cuts):
+        await asyncio.sleep(interval)
+        if session.task.done():
+            break
+        proxy.cut()
+    await session.task
+    # wait until the link is back and has delivered what the Jetson kept
+    while link.ws is None or link.reconnecting or browser.counted < session.sheep_count:
+        if time.perf_counter() - start > 120:
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - start
+
+    outages = []
+    down = None
+    for at, status in browser.statuses:
+        if status["status"] == "jetson_reconnecting":
+            down = at
+        elif status["status"] == "jetson_reconnected" and down is not None:
+            outages.append((at - down, status.get("resumed")))
+            down = None
+
+    result = {
+        "frames": session.frame_index,
+        "frames_received": browser.frames,
+        "frames_dropped_detached": jetson_link.frames_detached,
+        "sheep_count": session.sheep_count,
+        "counted_at_browser": browser.counted,
+        "reconnects": link.reconnects,
+        "resumed": sum(1 for _, resumed in outages if resumed),
+        "outage_ms": [round(seconds * 1000, 1) for seconds, _ in outages],
+        "lost": dict(link.lost),
+        "seconds": round(elapsed, 2),
+    }
+    await broker.disconnect(link, subscriber)
+    subscriber.close()
+    return result
+
+
+async def run(args):
+    jetson.SHOW_LOCAL = False
+    jetson.tracker_factory = StubTracker
+    jetson.loader.loader = lambda: load(args.detector)
+    jetson.loader.log_path = os.path.join(tempfile.mkdtemp(), "startup.csv")   # keep stub starts out of the real log
+
+    config = uvicorn.Config(jetson.app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    await jetson.loader.wait()
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    proxy = FlakyProxy(port)
+    await proxy.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            video = args.video or make_video(os.path.join(tmp, "synthetic.mp4"), frames=args.frames)
+            reference = await stream(video, proxy, 0, args.interval)
+            flaky = await stream(video, proxy, args.cuts, args.interval)
+    finally:
+        await proxy.close()
+        server.should_exit = True
+        await serving
+    return reference, flaky
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--video", default=None, help="use this video instead of a synthetic one")
+    parser.add_argument("--detector", default="benchmarks.stubs:StubDetector")
+    parser.add_argument("--cuts", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between cuts")
+    args = parser.parse_args()
+
+    reference, flaky = asyncio.run(run(args))
+    print("sem cortes:", json.dumps(reference))
+    print("com cortes:", json.dumps(flaky))
+
+    failed = []
+    if flaky["sheep_count"] != reference["sheep_count"]:
+        failed.append(f"contagem {flaky['sheep_count']} != {reference['sheep_count']} sem cortes")
+    if flaky["counted_at_browser"] != flaky["sheep_count"]:
+        failed.append(f"browser recebeu {flaky['counted_at_browser']} de {flaky['sheep_count']} contagens")
+    if flaky["resumed"] != flaky["reconnects"]:
+        failed.append(f"{flaky['reconnects'] - flaky['resumed']} ligações recomeçaram a sessão")
+    for failure in failed:
+        print("FALHOU:", failure)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""ROI inference: counts and inference time with the model on the area crop vs the whole frame.
+
+Runs the same video and area through two StreamSessions in "area" mode
+(same model, fresh tracker each) frame by frame, once with the model on
+the whole frame and once on the padded bounding rectangle of the area, and
+compares the final sheep counts. The crop's share of the frame and the
+model input size used for it are printed with the time per inference.
+Exits with status 1 when the crop changes the count.
+
+    python -m benchmarks.bench_roi [--video tests/data/sheepHerd1.mp4] [--area "[[x,y],...]"]
+"""
+import argparse, json, os, sys, tempfile, time
+
+from jetson_nano.backends import load_model
+from jetson_nano.batching import InferenceBatcher
+from jetson_nano.session import StreamSession
+from benchmarks.stubs import make_video, load, StubTracker
+
+# Left part of the (resized) synthetic video, which the stub sheep walk through
+SYNTHETIC_AREA = [[20, 40], [300, 40], [300, 400], [20, 400]]
+
+
+def run(batcher, video, area, roi, tracker_factory):
+    params = {"camera": video, "detect": "true", "area": area, "mode": "area", "motion_gate": False, "roi": roi}
+    session = StreamSession(params, batcher, **({"tracker_factory": tracker_factory} if tracker_factory else {}))
+    if not session.open():
+        sys.exit(f"Não foi possível abrir {video}")
+
+    frames = 0
+    start = time.perf_counter()
+    while (frame := session.read_frame()) is not None:
+        session.detect_frame(frame)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    session.capture.release()
+    return session, frames, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", default=None, help="video to use (default: synthetic video with the stub detector)")
+    parser.add_argument("--area", default=None, help="area polygon as JSON")
+    parser.add_argument("--frames", type=int, default=300, help="length of the synthetic video")
+    parser.add_argument("--detector", default=None, help="module:Class instead of the YOLO model")
+    parser.add_argument("--device", default="auto")
+    args = parser.parse_args()
+
+    video, tracker_factory = args.video, None
+    if video is None:
+        video = make_video(os.path.join(tempfile.mkdtemp(), "synthetic.mp4"), frames=args.frames)
+        args.detector = args.detector or "benchmarks.stubs:StubDetector"
+    if args.detector:
+        tracker_factory = StubTracker
+    area = json.loads(args.area) if args.area else SYNTHETIC_AREA
+
+    model = load(args.detector) if args.detector else load_model(device=args.device)
+    batcher = InferenceBatcher(model)
+    batcher.register()
+    try:
+        full, frames, t_full = run(batcher, video, area, False, tracker_factory)
+        cropped, _, t_roi = run(batcher, video, area, True, tracker_factory)
+    finally:
+        batcher.unregister()
+
+    if cropped.roi is None:
+        sys.exit("A área cobre o frame inteiro: não há ROI para comparar")
+    stats = cropped.roi.stats()
+    print(f"{frames} frames | ROI {stats['roi_ratio']:.1%} do frame | imgsz {stats['roi_imgsz']}")
+    for name, session, elapsed in (("frame", full, t_full), ("ROI  ", cropped, t_roi)):
+        print(f"{name}: count {session.sheep_count:4d} | tracks {len(session.registry):4d} | "
+              f"inferência {session.stride_control.latency * 1000:6.1f} ms | {frames / elapsed:6.1f} fps")
+
+    if cropped.sheep_count != full.sheep_count:
+        print("Contagens diferentes com ROI.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Count queries on a synthetic year: raw scans vs rollups + indexes.
+
+Builds the real schema (server/create_db.py) in a temp directory, fills a
+year of counts for several cameras/areas (rollups maintained by the
+triggers), then times typical dashboard queries against the same
+aggregate computed from counts with ``NOT INDEXED`` (a full scan).
+
+    python -m benchmarks.bench_rollups [--minutes 10] [--cameras 4] [--areas 3]
+"""
+import argparse, os, random, runpy, sqlite3, tempfile, time
+from datetime import datetime, timedelta
+
+from server.count_rollups import count_total, count_series
+
+YEAR_START = datetime(2025, 1, 1)
+
+
+def build(path, minutes, cameras, areas):
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    try:
+        runpy.run_path(os.path.join(cwd, "server", "create_db.py"))
+    finally:
+        os.chdir(cwd)
+
+    rng = random.Random(0)
+    rows = []
+    step = timedelta(minutes=minutes)
+    t = YEAR_START
+    while t < YEAR_START + timedelta(days=365):
+        for camera in range(1, cameras + 1):
+            for area in range(1, areas + 1):
+                rows.append((camera, 1, area, rng.randint(0, 5),
+                             t.strftime("%Y-%m-%d %H:%M:%S.000"), (t + step).strftime("%Y-%m-%d %H:%M:%S.000"),
+                             minutes * 60))
+        t += step
+
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    with conn:
+        conn.executemany("""INSERT INTO counts (id_camera, id_user, id_area, count_number, start_time, end_time,
+                            duration) VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
+    return conn, len(rows), time.perf_counter() - start
+
+
+def raw_total(conn, start, end, id_camera=None, id_area=None):
+    sql = "SELECT COALESCE(SUM(count_number), 0) FROM counts NOT INDEXED WHERE start_time >= ? AND start_time < ?"
+    params = [start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")]
+    if id_camera is not None:
+        sql += " AND id_camera = ?"
+        params.append(id_camera)
+    if id_area is not None:
+        sql += " AND id_area = ?"
+        params.append(id_area)
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def raw_series(conn, start, end, bucket, id_camera=None):
+    fmt = "%Y-%m-%d %H:00:00" if bucket == "hour" else "%Y-%m-%d 00:00:00"
+    sql = f"""SELECT strftime('{fmt}', start_time), SUM(count_number) FROM counts NOT INDEXED
+              WHERE start_time >= ? AND start_time < ?"""
+    params = [start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")]
+    if id_camera is not None:
+        sql += " AND id_camera = ?"
+        params.append(id_camera)
+    return sorted(conn.execute(sql + " GROUP BY 1", params).fetchall())
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, default=10, help="minutes per counts row")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--areas", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, rows, insert_time = build(os.path.join(tmp, "smartlivestock.db"), args.minutes, args.cameras, args.areas)
+        print(f"{rows} counts rows inserted in {insert_time:.1f}s ({rows / insert_time:.0f} rows/s with rollup triggers)")
+
+        ragged_start = YEAR_START + timedelta(days=31, hours=5, minutes=17)
+        ragged_end = YEAR_START + timedelta(days=123, hours=19, minutes=41)
+        queries = [
+            ("year total", lambda: count_total(conn, YEAR_START, YEAR_START + timedelta(days=365)),
+             lambda: raw_total(conn, YEAR_START, YEAR_START + timedelta(days=365))),
+            ("ragged range, camera 2", lambda: count_total(conn, ragged_start, ragged_end, 2),
+             lambda: raw_total(conn, ragged_start, ragged_end, 2)),
+            ("ragged range, area 1", lambda: count_total(conn, ragged_start, ragged_end, None, 1),
+             lambda: raw_total(conn, ragged_start, ragged_end, None, 1)),
+            ("daily series, quarter", lambda: count_series(conn, ragged_start, ragged_end, "day"),
+             lambda: raw_series(conn, ragged_start, ragged_end, "day")),
+            ("hourly series, week cam 1",
+             lambda: count_series(conn, ragged_start, ragged_start + timedelta(days=7), "hour", 1),
+             lambda: raw_series(conn, ragged_start, ragged_start + timedelta(days=7), "hour", 1)),
+        ]
+        for name, rollup, raw in queries:
+            rollup_result, rollup_time = timed(rollup)
+            raw_result, raw_time = timed(raw)
+            assert rollup_result == raw_result, name
+            print(f"{name:>26}: raw {raw_time * 1000:8.2f} ms | rollups {rollup_time * 1000:7.2f} ms "
+                  f"| {raw_time / rollup_time:6.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Tiled inference: throughput and sheep found against the tile budget per frame.
+
+Runs the same high-resolution video through one StreamSession per tile
+budget (same model, fresh tracker each) frame by frame: first without
+tiling (the frame downscaled to FRAME_WIDTH x FRAME_HEIGHT), then with
+tiled inference capped at each budget. Every row shows the model inputs
+per frame, the tile side in camera pixels, the inference time and FPS,
+and the sheep found, so an operator can pick the resolution the hardware
+can afford.
+
+The default synthetic video is 1920x1080 with 12 sheep that stay in the
+frame, small enough to fall under the stub detector's minimum size once
+downscaled. Exits with status 1 when a tiled run counts fewer sheep than
+the untiled one, or more than the known number of sheep (``--sheep``,
+else the untiled count) beyond ``--tolerance``: duplicates across tiles
+must not be counted twice. With a known number of sheep the boxes per
+frame are held to it as well.
+
+    python -m benchmarks.bench_tiles [--video pasture_4k.mp4] [--budgets 0,2,4,8,12] [--tile-size 640]
+"""
+import argparse, os, sys, tempfile, time
+
+from jetson_nano.config import TILE_SIZE, TILE_OVERLAP
+from jetson_nano.backends import load_model
+from jetson_nano.batching import InferenceBatcher
+from jetson_nano.buffers import ring_size
+from jetson_nano.session import StreamSession
+from benchmarks.stubs import make_video, load, StubTracker
+
+SYNTHETIC_SHEEP = 12
+
+
+def run(batcher, video, budget, args, tracker_factory):
+    params = {"camera": video, "detect": "true", "mode": "all", "motion_gate": False,
+              "tiled": budget > 0, "tile_size": args.tile_size, "tile_overlap": args.overlap, "max_tiles": budget}
+    session = StreamSession(params, batcher, **({"tracker_factory": tracker_factory} if tracker_factory else {}))
+    if not session.open():
+        sys.exit(f"Não foi possível abrir {video}")
+    session.reserve_frames(ring_size(2, 2))
+
+    frames = detections = 0
+    start = time.perf_counter()
+    while (frame := session.read_frame()) is not None:
+        detections += len(session.detect_frame(frame)["detections"])
+        frames += 1
+    elapsed = time.perf_counter() - start
+    session.capture.release()
+    return {
+        "budget": budget,
+        "inputs": len(session.tiles) if session.tiles else 1,
+        "tile_size": session.tiles.size if session.tiles else None,
+        "inference_ms": session.stride_control.latency * 1000,
+        "fps": frames / elapsed,
+        "detections": detections / frames,
+        "count": session.sheep_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", default=None, help="video to use (default: synthetic 1920x1080 video with the stub detector)")
+    parser.add_argument("--frames", type=int, default=150, help="length of the synthetic video")
+    parser.add_argument("--budgets", default="0,2,4,8,12", help="tile budgets to compare (0 = no tiling)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--overlap", type=float, default=TILE_OVERLAP)
+    parser.add_argument("--detector", default=None, help="module:Class instead of the YOLO model")
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--sheep", type=int, default=None, help="sheep in the video, when known (synthetic: 12)")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed excess over the expected count (fraction)")
+    args = parser.parse_args()
+    budgets = [int(b) for b in args.budgets.split(",")]
+
+    video, tracker_factory = args.video, None
+    if video is None:
+        video = make_video(os.path.join(tempfile.mkdtemp(), "synthetic.mp4"), frames=args.frames,
+                           width=1920, height=1080, sheep=SYNTHETIC_SHEEP, sheep_size=(24, 20), bounce=True)
+        args.detector = args.detector or "benchmarks.stubs:StubDetector"
+        args.sheep = args.sheep or SYNTHETIC_SHEEP
+    if args.detector:
+        tracker_factory = StubTracker
+
+    model = load(args.detector) if args.detector else load_model(device=args.device)
+    batcher = InferenceBatcher(model)
+    batcher.register()
+    try:
+        rows = [run(batcher, video, budget, args, tracker_factory) for budget in budgets]
+    finally:
+        batcher.unregister()
+
+    print(f"{'budget':>6} | {'inputs':>6} | {'tile px':>7} | {'inference':>9} | {'fps':>6} | {'boxes/frame':>11} | count")
+    for row in rows:
+        tile = row["tile_size"] or "-"
+        print(f"{row['budget'] or 'off':>6} | {row['inputs']:6d} | {tile:>7} | {row['inference_ms']:6.1f} ms | "
+              f"{row['fps']:6.1f} | {row['detections']:11.1f} | {row['count']}")
+
+    untiled = next((row for row in rows if not row["budget"]), None)
+    expected = args.sheep if args.sheep is not None else (untiled["count"] if untiled else None)
+    failed = []
+    for row in rows:
+        if not row["budget"]:
+            continue
+        if untiled and row["count"] < untiled["count"]:
+            failed.append(f"{row['budget']} tiles contaram {row['count']} ovelhas, sem tiles {untiled['count']}")
+        if expected is not None and row["count"] > expected + max(1, args.tolerance * expected):
+            failed.append(f"{row['budget']} tiles contaram {row['count']} ovelhas, esperadas {expected}")
+        if args.sheep is not None and row["detections"] > args.sheep * (1 + args.tolerance):
+            failed.append(f"{row['budget']} tiles: {row['detections']:.1f} caixas por frame para {args.sheep} ovelhas")
+    for failure in failed:
+        print("FALHOU:", failure)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
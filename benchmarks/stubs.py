@@ -0,0 +1,119 @@
+"""CPU stand-ins for YOLO and the tracker, plus a synthetic test video.
+
+The synthetic video shows bright rectangles ("sheep") walking across a dark
+noisy field, so the stub detector can find them with a threshold and
+contours, doing real per-pixel work without a neural network. Any class
+with the same ``names`` / ``predict`` interface can replace it in the
+benchmarks (``--detector module:Class``).
+"""
+import importlib
+import cv2, numpy as np
+
+STILL_SPAN = 30      # frames per moving / still stretch of make_video(still=True)
+
+
+def make_video(path, frames=300, width=1280, height=720, sheep=6, fps=30, seed=0, sheep_size=None, bounce=False,
+               still=False):
+    """Write a deterministic synthetic video and return its path (``sheep_size`` is (w, h) in pixels)
+
+    Sheep leaving on the right come back on the left (a new sheep for the
+    tracker), or with ``bounce`` turn around at the edges, so every sheep
+    stays whole in the frame and the video shows exactly ``sheep`` sheep.
+    With ``still`` the herd stops for every other ``STILL_SPAN`` frames, so
+    the scene is static half of the time.
+    """
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform((0, 0.1 * height), (width, 0.8 * height), size=(sheep, 2))
+    speeds = rng.uniform((2, -1), (6, 1), size=(sheep, 2))
+    size = np.array(sheep_size or (width // 16, height // 12))
+
+    field = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = field.copy()
+        moving = i // (2 * STILL_SPAN) * STILL_SPAN + min(i % (2 * STILL_SPAN), STILL_SPAN) if still else i
+        positions = starts + speeds * moving
+        if bounce:
+            span = np.array([width, height]) - size - 1
+            positions = span - np.abs(positions % (2 * span) - span)
+        for x, y in positions.astype(int):
+            x %= width
+            cv2.rectangle(frame, (x, y), (x + size[0], y + size[1]), (230, 230, 230), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class _Boxes:
+    """Minimal ``Boxes``: ``data`` rows are x1, y1, x2, y2, conf, cls"""
+
+    def __init__(self, data, orig_shape=None):
+        self.data = data
+        self.orig_shape = orig_shape
+
+    @property
+    def boxes(self):
+        # a property, not an attribute: a self-reference would leave a cycle for the GC every frame
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+
+class StubDetector:
+    """Threshold + contours detector with the ``model.predict`` interface"""
+
+    names = {0: "sheep"}
+
+    def __init__(self, threshold=180, min_area=100):
+        self.threshold = threshold
+        self.min_area = min_area
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, binary = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rows = [(x, y, x + w, y + h, 0.95, 0) for x, y, w, h in map(cv2.boundingRect, contours)
+                if w * h >= self.min_area]
+        return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+    def predict(self, frames, verbose=False, imgsz=None):
+        return [_Boxes(self.detect(frame)) for frame in frames]
+
+
+class StubTracker:
+    """Greedy nearest-centroid tracker returning rows x1, y1, x2, y2, id, conf, cls, idx"""
+
+    def __init__(self, max_distance=60):
+        self.max_distance = max_distance
+        self.tracks = {}      # id -> centroid
+        self.next_id = 1
+
+    def update(self, boxes, frame=None):
+        data = np.asarray(boxes.data, dtype=np.float32).reshape(-1, 6)
+        centroids = (data[:, :2] + data[:, 2:4]) / 2
+        ids = np.zeros(len(data), dtype=np.float32)
+        free = dict(self.tracks)
+        for i, c in enumerate(centroids):
+            best = min(free.items(), key=lambda kv: np.hypot(*(kv[1] - c)), default=None)
+            if best is not None and np.hypot(*(best[1] - c)) <= self.max_distance:
+                ids[i] = best[0]
+                del free[best[0]]
+            else:
+                ids[i] = self.next_id
+                self.next_id += 1
+        self.tracks = {int(i): c for i, c in zip(ids, centroids)}
+        idx = np.arange(len(data), dtype=np.float32)
+        return np.column_stack((data[:, :4], ids, data[:, 4:6], idx))
+
+
+def load(spec):
+    """Instantiate ``module:Class``"""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
@@ -0,0 +1,86 @@
+"""Binary frame messages exchanged on /jetson_ws and relayed by the server.
+
+Every frame is one binary websocket message: a fixed 20-byte header in
+network byte order followed by the JPEG payload.
+
+    offset  size  field
+    0       1     version      (PROTOCOL_VERSION)
+    1       1     type         (MSG_FRAME, ...)
+    2       1     flags        (FLAG_NEW_DETECTIONS | FLAG_DETECT_ENABLED)
+    3       1     reserved
+    4       4     camera id    (unsigned, see ``camera_key``)
+    8       8     timestamp    (microseconds since the Unix epoch)
+    16      4     sequence     (frame number within the stream)
+    20      ...   payload      (JPEG bytes)
+
+Control and status messages stay JSON text messages.
+"""
+import struct, time, zlib
+
+PROTOCOL_VERSION = 1
+
+# Message types
+MSG_FRAME = 1
+
+# Flags
+FLAG_NEW_DETECTIONS = 0x01
+FLAG_DETECT_ENABLED = 0x02
+
+HEADER = struct.Struct("!BBBxIQI")
+HEADER_SIZE = HEADER.size
+
+
+def camera_key(camera):
+    """Numeric camera id for the header (index as-is, other sources hashed)"""
+    try:
+        return int(camera) & 0xFFFFFFFF
+    except (ValueError, TypeError):
+        return zlib.crc32(str(camera).encode("utf-8"))
+
+def pack_header(msg_type, camera_id, sequence, flags=0, timestamp=None):
+    if timestamp is None:
+        timestamp = time.time()
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, flags, camera_id,
+                       int(timestamp * 1_000_000), sequence & 0xFFFFFFFF)
+
+def encode_frame(camera_id, sequence, payload, flags=0, timestamp=None):
+    """Header + JPEG payload as a single bytes object"""
+    return b"".join((pack_header(MSG_FRAME, camera_id, sequence, flags, timestamp), memoryview(payload)))
+
+def encode_frame_into(buffer, camera_id, sequence, payload, flags=0, timestamp=None):
+    """Same message written into a reused bytearray; returns a view of it
+
+    The buffer grows when the payload does not fit. The view must be
+    released before the buffer is resized again.
+    """
+    size = HEADER_SIZE + len(payload)
+    if len(buffer) < size:
+        buffer.extend(bytes(size - len(buffer)))
+    if timestamp is None:
+        timestamp = time.time()
+    message = memoryview(buffer)[:size]
+    HEADER.pack_into(message, 0, PROTOCOL_VERSION, MSG_FRAME, flags, camera_id,
+                     int(timestamp * 1_000_000), sequence & 0xFFFFFFFF)
+    # through the view: assigning to a bytearray slice would copy the payload first
+    message[HEADER_SIZE:] = memoryview(payload).cast("B")
+    return message
+
+def decode_header(message):
+    """Parse the header of a binary message into a dict"""
+    if len(message) < HEADER_SIZE:
+        raise ValueError("Mensagem binária demasiado curta")
+    version, msg_type, flags, camera_id, timestamp_us, sequence = HEADER.unpack_from(message)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Versão de protocolo desconhecida: {version}")
+    return {
+        "type": msg_type,
+        "flags": flags,
+        "camera_id": camera_id,
+        "timestamp": timestamp_us / 1_000_000,
+        "sequence": sequence,
+        "new_detections": bool(flags & FLAG_NEW_DETECTIONS),
+    }
+
+def decode_frame(message):
+    """Header dict and a zero-copy view of the JPEG payload"""
+    return decode_header(message), memoryview(message)[HEADER_SIZE:]
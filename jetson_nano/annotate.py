@@ -0,0 +1,20 @@
+import cv2
+
+from .config import CLASS_TYPE
+
+
+# ==============================================================
+# Annotation
+# ==============================================================
+def annotate_frame(frame, detections, area, line=None):
+    """Draw boxes, IDs, detection area and counting line"""
+    for (x1, y1, x2, y2), track_id, tracked in zip(detections.xyxy.tolist(), detections.ids.tolist(),
+                                                   detections.tracked.tolist()):
+        color = (0, 255, 0) if tracked else (255, 0, 0)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{CLASS_TYPE} #{track_id}",
+                    (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    if line:
+        (x1, y1), (x2, y2) = line
+        cv2.line(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2)
+    return area.draw(frame)
@@ -0,0 +1,75 @@
+import cv2, numpy as np
+from functools import lru_cache
+
+# ==============================================================
+# Configs
+# ==============================================================
+AREA_CACHE_SIZE = 16
+
+
+# ==============================================================
+# Compiled Area
+# ==============================================================
+class CompiledArea:
+    """Detection area rasterised once for a given polygon and frame size.
+
+    An empty polygon means the whole frame is the area. ``hull`` is ``None``
+    in that case so callers never need to inspect the mask shape.
+    """
+
+    def __init__(self, area_points, width, height):
+        self.width = width
+        self.height = height
+        self.hull = None
+        self.mask = None
+
+        if area_points:
+            pts = np.array(area_points, np.int32)
+            self.hull = cv2.convexHull(pts)
+            self.mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(self.mask, [self.hull], 255)
+
+    @property
+    def full_frame(self):
+        return self.mask is None
+
+    def bounding_rect(self, padding=0):
+        """Hull bounding box grown by ``padding`` pixels, clipped to the frame: (x1, y1, x2, y2)"""
+        if self.hull is None:
+            return 0, 0, self.width, self.height
+        x, y, w, h = cv2.boundingRect(self.hull)
+        return (max(0, x - padding), max(0, y - padding),
+                min(self.width, x + w + padding), min(self.height, y + h + padding))
+
+    def centroids(self, xyxy):
+        """Integer box centroids clipped to the frame, shape (N, 2)."""
+        boxes = np.asarray(xyxy).astype(np.int32, copy=False).reshape(-1, 4)
+        cx = (boxes[:, 0] + boxes[:, 2]) // 2
+        cy = (boxes[:, 1] + boxes[:, 3]) // 2
+        np.clip(cx, 0, self.width - 1, out=cx)
+        np.clip(cy, 0, self.height - 1, out=cy)
+        return np.stack((cx, cy), axis=1)
+
+    def contains(self, xyxy):
+        """Boolean array telling which box centroids fall inside the area."""
+        n = len(xyxy)
+        if self.full_frame or n == 0:
+            return np.ones(n, dtype=bool)
+        c = self.centroids(xyxy)
+        return self.mask[c[:, 1], c[:, 0]] > 0
+
+    def draw(self, frame):
+        """Draw the area outline on the frame"""
+        if self.hull is not None:
+            cv2.polylines(frame, [self.hull], isClosed=True, color=(255, 255, 0), thickness=2)
+        return frame
+
+
+@lru_cache(maxsize=AREA_CACHE_SIZE)
+def _compile(key, width, height):
+    return CompiledArea(key, width, height)
+
+def compile_area(area_points, width, height):
+    """Return the cached ``CompiledArea`` for a polygon (list of [x, y])."""
+    key = tuple(tuple(int(v) for v in p) for p in area_points) if area_points else ()
+    return _compile(key, width, height)
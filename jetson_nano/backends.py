@@ -0,0 +1,154 @@
+import importlib.util, os, shutil
+
+from .config import (MODEL_PATH, INFERENCE_BACKEND, INFERENCE_PRECISION, INFERENCE_DEVICE,
+                     EXPORT_CACHE_DIR, EXPORT_IMGSZ, INT8_CALIBRATION_DATA)
+
+# ==============================================================
+# Configs
+# ==============================================================
+PYTORCH = "pytorch"
+ONNX = "onnx"
+OPENVINO = "openvino"
+
+# Precisions each backend can run (ONNX FP16 export needs a GPU in Ultralytics)
+SUPPORTED = {
+    PYTORCH: ("fp32", "fp16"),
+    ONNX: ("fp32", "int8"),
+    OPENVINO: ("fp32", "fp16", "int8"),
+}
+
+# Python package each backend needs at runtime
+REQUIRES = {PYTORCH: "torch", ONNX: "onnxruntime", OPENVINO: "openvino"}
+
+
+# ==============================================================
+# Device / Backend Selection
+# ==============================================================
+def available(backend):
+    return importlib.util.find_spec(REQUIRES[backend]) is not None
+
+def select_device(device=INFERENCE_DEVICE):
+    """"cuda" when a GPU is usable, otherwise "cpu" (unless a device is forced)"""
+    if device != "auto":
+        return device
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+def select_backend(backend=INFERENCE_BACKEND, device="cpu"):
+    """PyTorch on a GPU; on CPU the first exported runtime that is installed"""
+    if backend != "auto":
+        return backend
+    if device != "cpu":
+        return PYTORCH
+    return next((b for b in (OPENVINO, ONNX) if available(b)), PYTORCH)
+
+
+# ==============================================================
+# Export Cache
+# ==============================================================
+def artifact_path(model_path, backend, precision, imgsz=EXPORT_IMGSZ, cache_dir=EXPORT_CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = ".onnx" if backend == ONNX else ""
+    return os.path.join(cache_dir, f"{stem}-{backend}-{precision}-{imgsz}{suffix}")
+
+def _fresh(path, model_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+def export_model(model_path=MODEL_PATH, backend=ONNX, precision="fp32", imgsz=EXPORT_IMGSZ,
+                 cache_dir=EXPORT_CACHE_DIR):
+    """Exported artifact for (model, backend, precision, imgsz), built once and cached"""
+    if backend == PYTORCH:
+        return model_path
+    if precision not in SUPPORTED[backend]:
+        raise ValueError(f"{backend} não suporta {precision}")
+
+    target = artifact_path(model_path, backend, precision, imgsz, cache_dir)
+    if _fresh(target, model_path):
+        return target
+
+    from ultralytics import YOLO
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"A exportar {model_path} para {backend} ({precision})...")
+
+    if backend == ONNX:
+        exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if precision == "int8":
+            # dynamic (weight-only) quantization, no calibration set needed
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+            os.remove(exported)
+        else:
+            shutil.move(exported, target)
+    else:
+        exported = YOLO(model_path).export(format="openvino", imgsz=imgsz, dynamic=precision != "int8",
+                                           half=precision == "fp16", int8=precision == "int8",
+                                           data=INT8_CALIBRATION_DATA if precision == "int8" else None)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    return target
+
+
+# ==============================================================
+# Inference Model
+# ==============================================================
+class InferenceModel:
+    """YOLO behind any backend, with the ``names`` / ``predict`` interface the batcher uses"""
+
+    def __init__(self, yolo, backend, precision, device):
+        self.yolo = yolo
+        self.backend = backend
+        self.precision = precision
+        self.device = device
+
+    @property
+    def names(self):
+        return self.yolo.names
+
+    @property
+    def dynamic(self):
+        """True when the input size can change between calls (INT8 OpenVINO is exported static)"""
+        return not (self.backend == OPENVINO and self.precision == "int8")
+
+    @property
+    def max_batch(self):
+        """Largest batch one forward pass accepts, None for any (the static INT8 export takes one frame)"""
+        return None if self.dynamic else 1
+
+    def predict(self, frames, verbose=False, imgsz=None):
+        kwargs = {"imgsz": imgsz} if imgsz and self.dynamic else {}
+        return self.yolo.predict(frames, verbose=verbose, device=self.device,
+                                 half=self.backend == PYTORCH and self.precision == "fp16", **kwargs)
+
+    def describe(self):
+        return f"{self.backend}/{self.precision} on {self.device}"
+
+
+def load_model(model_path=MODEL_PATH, backend=INFERENCE_BACKEND, precision=INFERENCE_PRECISION,
+               device=INFERENCE_DEVICE, imgsz=EXPORT_IMGSZ, fallback=True):
+    """Pick device and backend, export if needed and load; falls back to PyTorch FP32"""
+    from ultralytics import YOLO
+
+    device = select_device(device)
+    backend = select_backend(backend, device)
+    if backend == PYTORCH and precision == "fp16" and device == "cpu":
+        precision = "fp32"
+    try:
+        if backend != PYTORCH and not available(backend):
+            raise ImportError(f"{REQUIRES[backend]} não está instalado")
+        path = export_model(model_path, backend, precision, imgsz)
+        yolo = YOLO(path, task="detect")
+        if backend == PYTORCH:
+            yolo.to(device)
+        model = InferenceModel(yolo, backend, precision, device)
+    except Exception as e:
+        if not fallback or backend == PYTORCH:
+            raise
+        print(f"Backend {backend}/{precision} indisponível ({e}); a usar PyTorch.")
+        return load_model(model_path, PYTORCH, "fp32", device, imgsz, fallback=False)
+
+    print(f"Modelo carregado: {model.describe()}")
+    return model
@@ -0,0 +1,114 @@
+import threading, time
+from concurrent.futures import Future
+
+from .config import MAX_BATCH_SIZE, BATCH_WINDOW
+
+
+def batch_limit(model, max_batch):
+    """Frames per forward pass: ``max_batch`` capped by what the model accepts"""
+    limit = getattr(model, "max_batch", None)
+    return min(max_batch, limit) if limit else max_batch
+
+
+# ==============================================================
+# Batched Inference
+# ==============================================================
+class InferenceBatcher:
+    """Gathers frames from every active stream into one forward pass.
+
+    Each session's detect stage calls ``infer(frame)`` and blocks until its
+    result is ready. A single worker thread waits until every registered
+    session has submitted a frame (or ``window`` seconds have passed since the
+    first one) and runs ``model.predict`` once for the whole batch, so the
+    accelerator sees one call per tick instead of one call per camera.
+    Results are returned as NumPy ``Boxes`` ready for a tracker. Batches
+    never exceed what the model accepts (``model.max_batch``, when set).
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH_SIZE, window=BATCH_WINDOW):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self.frames = 0
+        self._active = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def limit(self):
+        return batch_limit(self.model, self.max_batch)
+
+    @property
+    def mean_batch_size(self):
+        return self.frames / self.batches if self.batches else 0.0
+
+    def register(self):
+        with self._cond:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def unregister(self):
+        with self._cond:
+            self._active = max(0, self._active - 1)
+            self._cond.notify_all()
+
+    def infer(self, frame, imgsz=None):
+        """Boxes for one frame; ``imgsz`` asks for a smaller model input (area crops)"""
+        return self.infer_many([frame], imgsz)[0]
+
+    def infer_many(self, frames, imgsz=None):
+        """Boxes for several images of one frame (tiles), queued together to share forward passes"""
+        futures = [Future() for _ in frames]
+        with self._cond:
+            self._pending.extend((frame, imgsz, future) for frame, future in zip(frames, futures))
+            self._cond.notify_all()
+        return [future.result() for future in futures]
+
+    def predict(self, frames, imgsz=None):
+        """Run forward passes over a list of frames on the calling thread, ``limit`` frames each"""
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        frames, limit, results = list(frames), self.limit, []
+        for start in range(0, len(frames), limit):
+            results += self.model.predict(frames[start:start + limit], verbose=False, **kwargs)
+            self.batches += 1
+        self.frames += len(frames)
+        return [result.boxes.cpu().numpy() for result in results]
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            limit = self.limit
+            deadline = time.perf_counter() + self.window
+            while len(self._pending) < min(max(self._active, 1), limit):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:limit]
+            del self._pending[:limit]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # one input size per pass: the largest asked for, full size if any frame needs it
+            sizes = [imgsz for _, imgsz, _ in batch]
+            imgsz = None if None in sizes else max(sizes)
+            try:
+                results = self.predict([frame for frame, _, _ in batch], imgsz)
+                for (_, _, future), boxes in zip(batch, results):
+                    future.set_result(boxes)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
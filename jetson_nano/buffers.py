@@ -0,0 +1,66 @@
+import numpy as np
+
+
+# ==============================================================
+# Detections (struct of arrays)
+# ==============================================================
+class Detections:
+    """Boxes of one frame as parallel arrays instead of one dict per box.
+
+    ``xyxy`` is (N, 4) int32, ``ids`` (N,) int64, ``tracked`` (N,) bool
+    (already counted) and ``new`` (N,) bool (counted on this frame).
+    """
+
+    __slots__ = ("xyxy", "ids", "tracked", "new")
+
+    def __init__(self, xyxy, ids, tracked, new):
+        self.xyxy = xyxy
+        self.ids = ids
+        self.tracked = tracked
+        self.new = new
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls):
+        return EMPTY_DETECTIONS
+
+    def moved(self, xyxy):
+        """Same tracks at new positions, nothing new"""
+        return Detections(xyxy, self.ids, self.tracked, np.zeros(len(self.ids), dtype=bool))
+
+
+EMPTY_DETECTIONS = Detections(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.int64),
+                              np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+
+
+# ==============================================================
+# Frame Ring
+# ==============================================================
+class FrameRing:
+    """Preallocated frames handed out in turn, to be filled through ``dst=``.
+
+    A buffer comes back after ``size`` calls to ``next()``, so ``size`` must
+    exceed the number of frames that can be alive at once (in every queue
+    and stage of the pipeline, plus the one being sent).
+    """
+
+    def __init__(self, size, shape, dtype=np.uint8):
+        self.buffers = [np.empty(shape, dtype=dtype) for _ in range(size)]
+        self._next = 0
+
+    def __len__(self):
+        return len(self.buffers)
+
+    def next(self):
+        buffer = self.buffers[self._next]
+        self._next = (self._next + 1) % len(self.buffers)
+        return buffer
+
+
+def ring_size(stages, queue_size):
+    """Frames alive at most in a pipeline of ``stages`` workers after the source"""
+    # one queue per stage plus the output queue, one frame in each worker,
+    # the frame being sent and one spare
+    return (stages + 1) * queue_size + (stages + 1) + 2
@@ -0,0 +1,77 @@
+from .pipeline import DROP_OLDEST
+
+# ==============================================================
+# Configs
+# ==============================================================
+SHOW_LOCAL = True
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+CLASS_TYPE = "sheep"
+CONF_THRESHOLD = 0.88
+MODEL_PATH = "jetson_nano/models/yolo11s.pt"
+
+# Tracker used per stream session ("botsort.yaml" is the default of model.track)
+TRACKER_CONFIG = "botsort.yaml"
+TRACKER_FRAME_RATE = 30
+
+# Pipeline: capture, detect/track and annotate+encode run as separate worker stages
+PIPELINED = True
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_DROP_POLICY = DROP_OLDEST   # "drop_oldest" or "block"
+
+# Batched inference across cameras: one forward pass per tick
+MAX_BATCH_SIZE = 8
+BATCH_WINDOW = 0.005     # seconds to wait for the other active cameras
+
+# Seconds between "stats" messages (counts, achieved FPS, inference stride)
+STATS_INTERVAL = 2.0
+
+# JPEG encoding: quality drops (then resolution) while frames wait to be sent
+JPEG_QUALITY = 90
+JPEG_MIN_QUALITY = 50
+JPEG_QUALITY_STEP = 10
+JPEG_SCALES = (0.75, 0.5)           # resolution steps below the minimum quality
+ENCODER_HIGH_WATER = PIPELINE_QUEUE_SIZE   # frames waiting to be sent that count as congestion
+ENCODER_RECOVERY_FRAMES = 30        # consecutive frames with an empty send queue before stepping back up
+
+# Motion gate: skip the model on detection frames where nothing moved inside the area
+MOTION_GATE = True
+MOTION_WIDTH = 160                  # width of the downscaled grey frame that is compared
+MOTION_PIXEL_THRESHOLD = 25         # grey-level difference for a pixel to count as changed
+MOTION_MIN_CHANGED = 0.002          # fraction of changed area pixels that wakes the model
+MOTION_MAX_SKIP = 30                # run the model at least once every N detection frames
+
+# Counting: "all", "area" (centroid enters the area) or "line" (centroid crosses params["line"])
+COUNTING_MODE = "area"
+TRACK_TTL = 90                      # model runs a track may go unseen before it is evicted
+TRACK_CAPACITY = 64                 # initial slots of the track registry (grows when needed)
+
+# Inference backend: "auto", "pytorch", "onnx" or "openvino"; precision "fp32", "fp16" or "int8"
+INFERENCE_BACKEND = "auto"
+INFERENCE_PRECISION = "fp32"
+INFERENCE_DEVICE = "auto"           # "auto", "cuda", "cpu", ...
+EXPORT_CACHE_DIR = "jetson_nano/models/exports"
+EXPORT_IMGSZ = 640
+INT8_CALIBRATION_DATA = "coco8.yaml"   # dataset used to calibrate OpenVINO INT8
+
+# Startup: the model loads in the background, then runs warmup passes before streams start
+WARMUP_PASSES = 3                   # passes per batch size (1 and MAX_BATCH_SIZE)
+STARTUP_LOG = "tests/results/logs/startup.csv"   # one row of load/warmup/import-to-ready times per start
+
+# ROI inference: in "area" mode the model only sees the padded bounding rectangle of the area hull
+ROI_INFERENCE = True
+ROI_PADDING = 32                    # pixels added around the hull bounding rectangle
+ROI_UPSCALE = 1.0                   # model input size relative to the crop (1.0 native, >1 upscales small pens)
+
+# Tiled inference: the model runs on overlapping native-resolution tiles (4K pasture cameras), merged before tracking
+TILED_INFERENCE = False
+TILE_SIZE = 640                     # tile side in camera pixels
+TILE_OVERLAP = 0.2                  # fraction of a tile shared with its neighbours
+TILE_MAX = 8                        # model inputs per frame at most; tiles grow (less resolution) to fit
+TILE_FULL_FRAME = True              # also run the resized frame, for sheep bigger than a tile
+TILE_NMS_IOU = 0.5                  # IoU above which the less confident of two boxes is dropped
+TILE_SEAM_MARGIN = 4                # camera pixels from an inner tile edge for a box to count as cut there
+
+# Resume: sessions of a client that sent "hello" survive a dropped connection for RESUME_GRACE seconds
+RESUME_GRACE = 30.0
+RESUME_BACKLOG = 256                # count events kept for the client while it is away
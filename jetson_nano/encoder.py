@@ -0,0 +1,103 @@
+import time
+import cv2, numpy as np
+
+from .config import (JPEG_QUALITY, JPEG_MIN_QUALITY, JPEG_QUALITY_STEP, JPEG_SCALES,
+                     ENCODER_HIGH_WATER, ENCODER_RECOVERY_FRAMES)
+
+ENCODE_SMOOTHING = 0.2
+
+
+# ==============================================================
+# Adaptive JPEG Encoder
+# ==============================================================
+class AdaptiveEncoder:
+    """Encodes each frame once, at a quality that follows the link.
+
+    The quality/resolution ladder goes from full quality down to
+    ``JPEG_MIN_QUALITY`` and then to the smaller ``JPEG_SCALES``. ``adjust``
+    is fed with the send backlog after every frame: a backlog at the high
+    water mark moves one step down, ``recovery_frames`` empty backlogs in a
+    row move one step back up. With no consumers nothing is encoded, except
+    frames with new detections, which the server stores.
+    """
+
+    def __init__(self, consumers=1, high_water=ENCODER_HIGH_WATER, recovery_frames=ENCODER_RECOVERY_FRAMES):
+        self.levels = [(q, 1.0) for q in range(JPEG_QUALITY, JPEG_MIN_QUALITY - 1, -JPEG_QUALITY_STEP)]
+        self.levels += [(self.levels[-1][0], scale) for scale in JPEG_SCALES]
+        self.level = 0
+        self.consumers = consumers
+        self.high_water = high_water
+        self.recovery_frames = recovery_frames
+
+        self.encoded = 0
+        self.skipped = 0
+        self.encode_time = 0.0    # EMA, seconds
+        self._calm = 0
+        self._bytes = 0
+        self._window_start = time.perf_counter()
+        self._bytes_per_sec = 0.0
+        self._scaled = {}         # scale -> reused resize buffer
+
+    @property
+    def quality(self):
+        return self.levels[self.level][0]
+
+    @property
+    def scale(self):
+        return self.levels[self.level][1]
+
+    def wanted(self, packet):
+        """True when somebody will use the encoded frame"""
+        return self.consumers > 0 or packet["new_detections"]
+
+    def encode(self, frame):
+        """JPEG bytes of the frame at the current quality/scale"""
+        start = time.perf_counter()
+        quality, scale = self.levels[self.level]
+        if scale < 1.0:
+            h, w = frame.shape[:2]
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            dst = self._scaled.get(scale)
+            if dst is None or dst.shape[:2] != size[::-1]:
+                dst = self._scaled[scale] = np.empty((size[1], size[0], 3), dtype=frame.dtype)
+            frame = cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+        elapsed = time.perf_counter() - start
+        self.encode_time = elapsed if not self.encoded else \
+            ENCODE_SMOOTHING * elapsed + (1 - ENCODE_SMOOTHING) * self.encode_time
+        self.encoded += 1
+        return buffer
+
+    def sent(self, nbytes):
+        self._bytes += nbytes
+        now = time.perf_counter()
+        if now - self._window_start >= 1.0:
+            self._bytes_per_sec = self._bytes / (now - self._window_start)
+            self._bytes = 0
+            self._window_start = now
+
+    def adjust(self, backlog):
+        """Step the quality down under backpressure, back up once it clears"""
+        if backlog >= self.high_water:
+            self._calm = 0
+            if self.level < len(self.levels) - 1:
+                self.level += 1
+        elif backlog == 0:
+            self._calm += 1
+            if self._calm >= self.recovery_frames and self.level > 0:
+                self.level -= 1
+                self._calm = 0
+        else:
+            self._calm = 0
+
+    def stats(self):
+        return {
+            "jpeg_quality": self.quality,
+            "jpeg_scale": self.scale,
+            "encode_ms": round(self.encode_time * 1000, 2),
+            "bytes_per_sec": round(self._bytes_per_sec),
+            "frames_encoded": self.encoded,
+            "frames_skipped": self.skipped,
+            "consumers": self.consumers,
+        }
@@ -1,186 +1,241 @@
-import cv2, json, asyncio, numpy as np, base64
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from ultralytics import YOLO
-from datetime import datetime
-
-# ==============================================================
-# Configs
-# ==============================================================
-SHOW_LOCAL = True
-FRAME_WIDTH = 640
-FRAME_HEIGHT = 480
-CLASS_TYPE = "sheep"
-CONF_THRESHOLD = 0.88
-MODEL_PATH = "jetson_nano/models/yolo11s.pt"
+import time
+IMPORTED_AT = time.perf_counter()   # start of the import-to-ready time
+
+import cv2, json, asyncio
+import numpy as np
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi.responses import JSONResponse
+from common.protocol import encode_frame_into, FLAG_NEW_DETECTIONS, FLAG_DETECT_ENABLED
+from common.metrics import Histogram, Counter, Collector, REGISTRY, CONTENT_TYPE
+from .config import (SHOW_LOCAL, PIPELINED, PIPELINE_QUEUE_SIZE,
+                     PIPELINE_DROP_POLICY, STATS_INTERVAL)
+from .pipeline import Pipeline, BLOCK
+from .batching import InferenceBatcher
+from .startup import ModelLoader
+from .session import StreamSession, create_tracker
+from .annotate import annotate_frame
+from .buffers import ring_size
+from .link import ClientLink, links
 
 app = FastAPI()
 
 # ==============================================================
 # Model Loading
 # ==============================================================
-model = YOLO(MODEL_PATH).to('cuda')
+# One forward pass per tick for every active camera; the model is set once loaded and warm
+batcher = InferenceBatcher(None)
 
-# ==============================================================
-# Variables
-# ==============================================================
+# Device and backend picked automatically (CUDA, OpenVINO/ONNX on CPU, PyTorch fallback),
+# loaded after startup so the app answers while it loads
+loader = ModelLoader(batcher, started=IMPORTED_AT)
 
-# Shared state variables
-shared_state = {
-    "camera": None,
-    "area": None,
-    "detect": None
-}
+# New tracker for every stream (replaced by a stub in the CPU benchmarks)
+tracker_factory = create_tracker
 
-# Global variables
-sheep_count = 0
-tracked_ids = set()
-flag_new_detections = False
+@app.on_event("startup")
+async def start_model_loading():
+    loader.start()
+
+# ==============================================================
+# Metrics
+# ==============================================================
+STAGE_SECONDS = Histogram("jetson_stage_seconds", "Time spent in each pipeline stage per frame", ["stage"])
+WS_SEND_SECONDS = Histogram("jetson_ws_send_seconds", "Websocket send latency of one frame (lock included)")
+FRAMES_PROCESSED = Counter("jetson_frames_processed_total", "Frames that went through the whole pipeline")
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+
+# (session, pipeline) of every running stream, read when /metrics is scraped
+active_streams = set()
+dropped_finished = 0
+
+Collector("jetson_frames_dropped_total", "Frames discarded by the drop-oldest queues", "counter",
+          lambda: dropped_finished + sum(p.dropped for _, p in active_streams))
+Collector("jetson_queue_depth", "Frames queued inside each running pipeline", "gauge",
+          lambda: [((s.camera,), p.depth) for s, p in active_streams], labels=["camera"])
+Collector("jetson_fps", "Achieved frames per second of each stream", "gauge",
+          lambda: [((s.camera,), round(s.fps_meter.fps, 2)) for s, _ in active_streams], labels=["camera"])
+Collector("jetson_active_streams", "Running camera streams", "gauge", lambda: len(active_streams))
+Collector("jetson_batch_size", "Mean frames per forward pass", "gauge", lambda: round(batcher.mean_batch_size, 2))
+Collector("jetson_frames_detached_total", "Frames dropped while their client was disconnected", "counter",
+          lambda: sum(link.frames_detached for link in links.values()))
+Collector("jetson_model_ready", "1 once the model is loaded and warmed up", "gauge", lambda: int(loader.ready))
+Collector("jetson_startup_seconds", "Model load, warmup and import-to-ready times", "gauge",
+          lambda: [((phase,), value) for phase, value in (("load", loader.load_time), ("warmup", loader.warmup_time),
+                                                          ("import_to_ready", loader.ready_time)) if value is not None],
+          labels=["phase"])
 
 # ==============================================================
 # Auxiliar Functions
 # ==============================================================
-def create_mask(area_points):
-    """Create a binary mask with the defined area points."""
-    mask = np.zeros((FRAME_HEIGHT, FRAME_WIDTH), dtype=np.uint8)
-    if not area_points:
-        mask[:] = 255  # If there is no area points all frame is considered area
-        return mask
-
-    pts = np.array(area_points, np.int32)
-    hull = cv2.convexHull(pts)
-    cv2.fillPoly(mask, [hull], 255)
-    return mask, hull
-
-def annotate_frame(frame, detections, mask):
-    """Draw boxes, IDs and detection area"""
-    for det in detections:
-        x1, y1, x2, y2 = det["bbox"]
-        track_id = det["id"]
-        class_name = det["class_name"]
-        color = (0, 255, 0) if det["tracked"] else (255, 0, 0)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        cv2.putText(frame, f"{class_name} #{track_id}",
-                    (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-    if isinstance(mask, tuple):  # If contains the hull too
-        _, hull = mask
-        cv2.polylines(frame, [hull], isClosed=True, color=(255, 255, 0), thickness=2)
-    return frame
-
-async def send_frame(websocket, frame, new_detection_flag, camera_id):
-    """Code and send the frame"""
-    _, buffer = cv2.imencode(".jpg", frame)
-
-    # Only sent the frame when necessary
-    if new_detection_flag:
-        frame_data = {
-            "type": "frame",
-            "camera_id": camera_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "new_detections": True,
-            "image": base64.b64encode(buffer).decode("utf-8")
-        }
-        await websocket.send_text(json.dumps(frame_data))
-
-    # Sent frame in bytes
-    await websocket.send_bytes(buffer.tobytes())
+async def send_frame(link, packet, session):
+    """Send an already encoded frame as a single binary message (only the count event when not encoded)
+
+    While the link is detached the frame is dropped and the count event kept for the next connection.
+    """
+    flags = FLAG_DETECT_ENABLED if packet["detect_enabled"] else 0
+    if packet["new_detections"]:
+        flags |= FLAG_NEW_DETECTIONS
+
+    message = None
+    if packet["buffer"] is not None:
+        # Written into the session's reused message buffer; the send copies it into the websocket frame
+        message = encode_frame_into(session.message, session.camera_id, packet["index"], packet["buffer"],
+                                    flags, packet["timestamp"])
+    start = time.perf_counter()
+    async with link.send_lock:
+        # Count event first, so the server can store it with the frame that follows
+        if packet["new_detections"]:
+            await link.write_json({
+                "type": "count",
+                "camera": session.camera,
+                "camera_id": session.camera_id,
+                "sequence": packet["index"],
+                "timestamp": packet["timestamp"],
+                "new": packet["new_count"],
+                "sheep_count": packet["sheep_count"]
+            }, keep=True)
+        sent = False
+        if message is not None:
+            nbytes = message.nbytes
+            try:
+                sent = await link.write_bytes(message)
+            finally:
+                message.release()
+            if sent:
+                session.encoder.sent(nbytes)
+    if sent:
+        WS_SEND_SECONDS.observe(time.perf_counter() - start)
 
 
+# ==============================================================
+# Pipeline Stages (run on worker threads)
+# ==============================================================
+def render_frame(packet, session):
+    """Annotate/encode stage: draw the detections and JPEG-encode the frame once"""
+    encoder = session.encoder
+    packet["buffer"] = None
+    packet["display"] = None
+    wanted = encoder.wanted(packet)
+    if not wanted:
+        encoder.skipped += 1
+        if not SHOW_LOCAL:
+            return packet
+
+    with STAGE_SECONDS.time("annotate"):
+        # Only this stage draws, so one preallocated copy per session is enough
+        annotated_frame = session.annotated
+        np.copyto(annotated_frame, packet["frame"])
+        annotate_frame(annotated_frame, packet["detections"], packet["area"], packet["line"])
+
+    if SHOW_LOCAL:
+        # HighGUI is not thread-safe: shown by the event loop thread (show_frame), from a copy
+        # because the next frame is drawn into the same buffer
+        packet["display"] = annotated_frame.copy()
+
+    if wanted:
+        with STAGE_SECONDS.time("encode"):
+            packet["buffer"] = encoder.encode(annotated_frame)
+    return packet
+
+
+def show_frame(packet, window_name):
+    """Local display, on the event loop thread for every stream; False when 'q' is pressed"""
+    if packet["display"] is None:
+        return True
+    cv2.imshow(window_name, packet["display"])
+    if cv2.waitKey(1) & 0xFF == ord('q'):
+        print("Transmissão interrompida localmente.")
+        return False
+    return True
+
 
 # ==============================================================
 # Streaming Function
 # ==============================================================
-async def stream_frames(websocket: WebSocket, capture: cv2.VideoCapture,
-                        stop_event: asyncio.Event, shared_state):
-    global sheep_count, tracked_ids, flag_new_detections
-
-    sheep_count = 0
-    flag_new_detections = False
-    tracked_ids.clear()
+async def stream_frames(link: ClientLink, session: StreamSession, observer=observe_stage):
+    """Run the session's pipeline and ship its frames through ``link`` (kept running while it is detached)
+
+    ``observer(stage, seconds)`` gets the time of every read, detect, render and send.
+    """
+    window_name = f"SmartLiveStock Stream {session.camera}"
+
+    # Capture, detection and encoding run on worker threads; this coroutine only ships finished buffers
+    stages = [
+        session.detect_frame,
+        lambda packet: render_frame(packet, session),
+    ]
+    # Enough preallocated frames for every queue and stage of the pipeline
+    session.reserve_frames(ring_size(len(stages), PIPELINE_QUEUE_SIZE))
+    pipeline = Pipeline(
+        source=session.read_frame,
+        stages=stages,
+        maxsize=PIPELINE_QUEUE_SIZE,
+        # Video files are processed frame by frame; only live cameras drop frames
+        policy=PIPELINE_DROP_POLICY if session.is_live else BLOCK,
+        pipelined=PIPELINED,
+        # A dropped frame is fine, a dropped count event is a sheep missing from the stored counts
+        keep=lambda packet: packet["new_detections"],
+        names=["read", "detect", "render"],
+        observer=observer,
+    )
+    if session.detect:
+        batcher.register()
+    pipeline.start()
+    active_streams.add((session, pipeline))
+    stop_watcher = asyncio.create_task(session.stop_event.wait())
+    stop_watcher.add_done_callback(lambda _: pipeline.stop())
 
     try:
-        while not stop_event.is_set():
-            success, frame = capture.read()
-
-            # if not success:
-            #     capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            #     await asyncio.sleep(0.1)
-            #     continue
-
-            if not success:
-                print("Vídeo terminou.")
-                stop_event.set()
+        async for packet in pipeline.results():
+            if session.stop_event.is_set():
                 break
+            if SHOW_LOCAL and not show_frame(packet, window_name):
+                session.stop_event.set()
+                break
+            start = time.perf_counter()
+            await send_frame(link, packet, session)
+            observer("send", time.perf_counter() - start)
+            FRAMES_PROCESSED.inc()
+            session.fps_meter.tick()
+            # Frames piling up behind the socket lower the JPEG quality of the next ones
+            session.encoder.adjust(pipeline.backlog)
+
+            fps = session.fps_meter.poll(STATS_INTERVAL)
+            if fps is not None:
+                await link.send_json(session.stats(fps))
 
-            frame = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
-            annotated_frame = frame.copy()
-
-            area_points = shared_state.get("area")
-            detect_enabled = shared_state.get("detect")
-
-            # Creates defined area
-            mask = create_mask(area_points)
-
-            detections = []
-
-            # Detection and tracking
-            if detect_enabled:
-                result = model.track(frame, persist=True, verbose=False)
-
-                if result[0] is not None and result[0].boxes.id is not None:
-                    boxes = result[0].boxes
-                    for xyxy, track_id, class_id, conf in zip(
-                            boxes.xyxy.cpu().tolist(),
-                            boxes.id.cpu().tolist(),
-                            boxes.cls.int().cpu().tolist(),
-                            boxes.conf.cpu().tolist()
-                    ):
-                        class_name = model.names[class_id]
-
-                        if class_name != CLASS_TYPE or conf < CONF_THRESHOLD:
-                            continue
-
-                        x1, y1, x2, y2 = map(int, xyxy)
-                        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-
-                        inside_area = mask[0][cy, cx] > 0 if isinstance(mask, tuple) else mask[cy, cx] > 0
-
-                        new_track = track_id not in tracked_ids and inside_area
-
-                        if new_track:
-                            tracked_ids.add(track_id)
-                            sheep_count += 1
-                            flag_new_detections = True
-                            print(f"[{sheep_count}] Nova ovelha ID {track_id} | Confiança: {conf:.2f}")
-
-                        detections.append({
-                            "bbox": (x1, y1, x2, y2),
-                            "id": track_id,
-                            "class_name": class_name,
-                            "tracked": track_id in tracked_ids
-                        })
+    finally:
+        stop_watcher.cancel()
+        await pipeline.join()
+        global dropped_finished
+        dropped_finished += pipeline.dropped
+        active_streams.discard((session, pipeline))
+        if session.detect:
+            batcher.unregister()
+        session.stop_event.set()
+        session.capture.release()
+        if SHOW_LOCAL:
+            cv2.destroyWindow(window_name)
+        print(f"Transmissão encerrada ({session.camera}). Frames descartados: {pipeline.dropped}")
 
-            # --------------------------------------------------------------
-            # Visualization and Sending
-            # --------------------------------------------------------------
-            annotated_frame = annotate_frame(annotated_frame, detections, mask)
 
-            if SHOW_LOCAL:
-                cv2.imshow("SmartLiveStock Stream", annotated_frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    print("Transmissão interrompida localmente.")
-                    break
+# ==============================================================
+# Readiness / Metrics Endpoints
+# ==============================================================
+@app.get("/ready")
+def ready():
+    """Model state with load/warmup times; 503 until streams can start"""
+    return JSONResponse(loader.status(), status_code=200 if loader.ready else 503)
 
-            try:
-                await send_frame(websocket, annotated_frame, flag_new_detections, shared_state["camera"])
-                flag_new_detections = False
-            except WebSocketDisconnect:
-                print("Cliente desconectado.")
-                break
 
-    finally:
-        capture.release()
-        cv2.destroyAllWindows()
-        print("Transmissão encerrada.")
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: stage histograms, frame counters and queue depths"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 # ==============================================================
@@ -190,9 +245,46 @@ async def stream_frames(websocket: WebSocket, capture: cv2.VideoCapture,
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("Cliente conectado à jetson.")
-    capture = None
-    stop_event = asyncio.Event()
-    frame_task = None
+
+    # One session per camera on this link; after a "hello" the link can outlive the connection
+    link = ClientLink(websocket)
+
+    # "video" commands received while the model loads, started in order once it is ready
+    pending = []
+    waiter = None
+
+    async def start_video(msg_params):
+        camera = msg_params.get("camera")
+
+        # Reinicia a captura se já estiver em execução
+        if camera in link.sessions:
+            await link.sessions.pop(camera).stop()
+
+        session = StreamSession(msg_params, batcher, tracker_factory)
+        if not session.open():
+            session.capture.release()
+            await link.send_json({"error": f"Não foi possível abrir {camera}"})
+            return
+
+        await link.send_json({
+            "type": "video",
+            "camera": session.camera,
+            "camera_id": session.camera_id,
+            "area": session.area,
+        })
+
+        link.sessions[camera] = session
+        session.task = asyncio.create_task(stream_frames(link, session))
+
+    async def start_pending():
+        ready = await loader.wait()
+        await link.send_json(loader.status())
+        while pending:
+            msg_params = pending.pop(0)
+            if ready:
+                await start_video(msg_params)
+            else:
+                await link.send_json({"error": f"Modelo indisponível: {loader.error}", "camera": msg_params.get("camera")})
 
     try:
         while True:
@@ -206,58 +298,59 @@ async def websocket_endpoint(websocket: WebSocket):
 
             if msg_type == "video":
                 msg_params = message.get("params", {})
-                shared_state.update({
-                    "camera": msg_params.get("camera"),
-                    "detect": msg_params.get("detect"),
-                    "area": msg_params.get("area", [])
-                })
-
-                # Reinicia a captura se já estiver em execução
-                if frame_task and not frame_task.done():
-                    stop_event.set()
-                    await frame_task
-                    stop_event.clear()
-
-                if capture:
-                    capture.release()
-
-                cam_source = shared_state["camera"]
-                try:
-                    cam_index = int(cam_source)
-                    capture = cv2.VideoCapture(cam_index)
-                    print(f"A usar câmara: {cam_index}")
-                except (ValueError, TypeError):
-                    capture = cv2.VideoCapture(cam_source)
-                    print(f"A reproduzir vídeo: {shared_state["camera"]}")
-
-                if not capture.isOpened():
-                    await websocket.send_text(json.dumps({"error": f"Não foi possível abrir {shared_state["camera"]}"}))
+                if loader.ready:
+                    await start_video(msg_params)
                     continue
 
-                await websocket.send_text(json.dumps({
-                    "type": msg_type,
-                    "camera": shared_state["camera"],
-                    "area": shared_state["area"],
-                }))
+                # Model still loading: the latest command per camera waits for it
+                camera = msg_params.get("camera")
+                pending[:] = [p for p in pending if p.get("camera") != camera]
+                pending.append(msg_params)
+                await link.send_json({"type": "video", "status": "queued", "camera": camera, "state": loader.state})
+                if waiter is None or waiter.done():
+                    waiter = asyncio.create_task(start_pending())
+
+            elif msg_type == "hello":
+                # Server link id: a known one resumes its sessions on this connection
+                link = await link.hello(message.get("link"))
+
+            elif msg_type == "bye":
+                # Client leaves on purpose: no grace period, its sessions stop now
+                links.pop(link.id, None)
+                link.id = None
+                break
+
+            elif msg_type == "ready":
+                await link.send_json(loader.status())
 
-                frame_task = asyncio.create_task(
-                    stream_frames(websocket, capture, stop_event, shared_state)
-                )
+            elif msg_type == "subscribers":
+                # Server tells how many viewers a camera has; 0 stops encoding its frames
+                session = link.sessions.get(message.get("camera"))
+                if session is not None:
+                    session.encoder.consumers = int(message.get("count", 0))
 
             elif msg_type == "teste":
-                await websocket.send_text(json.dumps({"status": "Jetson esta a responder"}))
+                await link.send_json({"status": "Jetson esta a responder"})
 
             elif msg_type == "stop":
-                stop_event.set()
-                await websocket.send_text(json.dumps({"status": "stopped"}))
+                # Stops one camera when given, otherwise every stream of this connection
+                camera = message.get("camera")
+                pending[:] = [p for p in pending if camera is not None and p.get("camera") != camera]
+                sessions = link.sessions
+                targets = [camera] if camera in sessions else ([] if camera is not None else list(sessions))
+                for target in targets:
+                    await sessions.pop(target).stop()
+                await link.send_json({"status": "stopped", "cameras": targets})
 
     except Exception as e:
         print("Erro na conexão:", e)
     finally:
-        if frame_task and not frame_task.done():
-            stop_event.set()
-            await frame_task
-        if capture:
-            capture.release()
-        cv2.destroyAllWindows()
-        print("Conexão encerrada.")
\ No newline at end of file
+        if waiter is not None:
+            waiter.cancel()
+        if link.id is not None:
+            # Known client: keep counting for the grace period, it may come back
+            link.detach(websocket)
+        else:
+            await link.close()
+            cv2.destroyAllWindows()
+        print("Conexão encerrada.")
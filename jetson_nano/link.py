@@ -0,0 +1,134 @@
+import asyncio, json
+from collections import deque
+
+from .config import RESUME_GRACE, RESUME_BACKLOG
+
+# Links that introduced themselves with "hello", kept while detached
+links = {}
+
+
+# ==============================================================
+# Client Link
+# ==============================================================
+class ClientLink:
+    """A client of this Jetson (normally the server) and its camera sessions.
+
+    The websocket underneath can change. When a client that sent ``hello``
+    drops, its sessions keep running detached for ``grace`` seconds: frames
+    are discarded, count events are kept (up to ``backlog``). A new
+    connection with the same link id takes the sessions over, gets the kept
+    events first and then a ``hello`` reply listing the resumed cameras.
+    Every JSON message carries ``seq``, a counter of the link that survives
+    reconnects, so the client can tell how many messages it missed.
+    """
+
+    def __init__(self, websocket, grace=RESUME_GRACE, backlog=RESUME_BACKLOG):
+        self.id = None
+        self.websocket = websocket
+        self.sessions = {}
+        self.send_lock = asyncio.Lock()
+        self.seq = 0
+        self.grace = grace
+        self.undelivered = deque(maxlen=backlog)
+        self.frames_detached = 0
+        self._expiry = None
+
+    @property
+    def attached(self):
+        return self.websocket is not None
+
+    # ---------------- sending (write_* expect send_lock to be held) ----------------
+    async def write_json(self, data, keep=False):
+        """Send a JSON message stamped with ``seq``; ``keep`` holds it for the next connection when detached"""
+        self.seq += 1
+        text = json.dumps({**data, "seq": self.seq})
+        if self.websocket is not None:
+            try:
+                await self.websocket.send_text(text)
+                return True
+            except Exception as e:
+                print("Erro ao enviar ao cliente:", e)
+                self.websocket = None
+        if keep:
+            self.undelivered.append(text)
+        return False
+
+    async def write_bytes(self, message):
+        if self.websocket is not None:
+            try:
+                await self.websocket.send_bytes(message)
+                return True
+            except Exception as e:
+                print("Erro ao enviar ao cliente:", e)
+                self.websocket = None
+        self.frames_detached += 1
+        return False
+
+    async def send_json(self, data, keep=False):
+        async with self.send_lock:
+            return await self.write_json(data, keep)
+
+    # ---------------- resume ----------------
+    async def hello(self, link_id):
+        """Register under ``link_id``; returns the link that owns it from now on"""
+        link = links.get(link_id)
+        if link is None or link is self:
+            self.id = link_id
+            links[link_id] = self
+            await self.send_json({"type": "hello", "link": link_id, "resumed": False, "cameras": []})
+            return self
+
+        # Sessions of an earlier connection: this websocket takes them over
+        # ("hello" comes first, anything this connection started is dropped)
+        await self.close()
+        await link.attach(self.websocket)
+        return link
+
+    async def attach(self, websocket):
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        async with self.send_lock:
+            self.websocket = websocket
+            replayed = len(self.undelivered)
+            while self.undelivered and self.websocket is not None:
+                text = self.undelivered.popleft()
+                try:
+                    await websocket.send_text(text)
+                except Exception as e:
+                    print("Erro ao reenviar eventos:", e)
+                    self.undelivered.appendleft(text)
+                    self.websocket = None
+            await self.write_json({
+                "type": "hello",
+                "link": self.id,
+                "resumed": True,
+                "cameras": [session.camera for session in self.sessions.values()],
+                "sequences": {session.camera_id: session.frame_index for session in self.sessions.values()},
+                "replayed": replayed,
+            })
+        print(f"Ligação {self.id} retomada: {len(self.sessions)} câmaras, {replayed} eventos reenviados.")
+
+    def detach(self, websocket):
+        """The connection ``websocket`` ended; keep the sessions for the grace period"""
+        if self.websocket is not None and self.websocket is not websocket:
+            return      # already taken over by a newer connection
+        self.websocket = None
+        if not self.sessions:
+            links.pop(self.id, None)    # nothing to resume
+            return
+        if self._expiry is None:
+            self._expiry = asyncio.create_task(self._expire())
+            print(f"Ligação {self.id} perdida: sessões mantidas durante {self.grace:.0f} s.")
+
+    async def _expire(self):
+        await asyncio.sleep(self.grace)
+        print(f"Ligação {self.id} não voltou: a parar {len(self.sessions)} câmaras.")
+        links.pop(self.id, None)
+        self._expiry = None
+        await self.close()
+
+    async def close(self):
+        sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            await session.stop()
@@ -0,0 +1,102 @@
+import time
+import cv2, numpy as np
+
+from .config import MOTION_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_CHANGED, MOTION_MAX_SKIP
+
+GATE_SMOOTHING = 0.2
+
+
+# ==============================================================
+# Motion Gate
+# ==============================================================
+class MotionGate:
+    """Cheap pre-filter that tells whether a frame is worth running the model on.
+
+    Frames are shrunk to ``width`` pixels wide, converted to grey and blurred,
+    then compared with the reference frame, i.e. the last frame the model ran
+    on, so slow changes add up until they are noticed. Only pixels inside the
+    detection area are considered. After ``max_skip`` skipped frames in a row
+    the model runs anyway.
+    """
+
+    def __init__(self, width=MOTION_WIDTH, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                 min_changed=MOTION_MIN_CHANGED, max_skip=MOTION_MAX_SKIP):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_skip = max_skip
+
+        self.reference = None
+        self.checked = 0
+        self.skipped = 0
+        self.gate_time = 0.0       # EMA, seconds
+        self._run = 0
+        self._area = None
+        self._mask = None
+        # reused buffers (gray frames swap with the reference)
+        self._small = None
+        self._gray = None
+        self._blurred = None
+        self._diff = None
+        self._moving = None
+
+    def _small_mask(self, area, shape):
+        if area is not self._area:
+            self._area = area
+            self._mask = None
+            if not area.full_frame:
+                self._mask = cv2.resize(area.mask, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST) > 0
+            self.reference = None
+        return self._mask
+
+    def changed(self, frame, area):
+        """True when the model must run on this frame (which becomes the reference)"""
+        start = time.perf_counter()
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, self.width * h // w))
+        if self._small is None or self._small.shape[:2] != size[::-1]:
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._gray = np.empty(size[::-1], dtype=np.uint8)
+            self._blurred = np.empty(size[::-1], dtype=np.uint8)
+            self._diff = np.empty(size[::-1], dtype=np.uint8)
+            self._moving = np.empty(size[::-1], dtype=bool)
+            self.reference = None
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        gray = cv2.GaussianBlur(self._gray, (5, 5), 0, dst=self._blurred)
+        mask = self._small_mask(area, gray.shape)
+
+        changed = True
+        if self.reference is not None and self._run < self.max_skip:
+            cv2.absdiff(gray, self.reference, dst=self._diff)
+            moving = np.greater(self._diff, self.pixel_threshold, out=self._moving)
+            if mask is not None:
+                moving &= mask
+                total = np.count_nonzero(mask)
+            else:
+                total = moving.size
+            changed = np.count_nonzero(moving) >= self.min_changed * max(total, 1)
+
+        self.checked += 1
+        if changed:
+            # the blurred frame becomes the reference, the old reference the next scratch buffer
+            if self.reference is None:
+                self.reference = np.empty_like(gray)
+            self.reference, self._blurred = gray, self.reference
+            self._run = 0
+        else:
+            self.skipped += 1
+            self._run += 1
+
+        elapsed = time.perf_counter() - start
+        self.gate_time = elapsed if self.checked == 1 else \
+            GATE_SMOOTHING * elapsed + (1 - GATE_SMOOTHING) * self.gate_time
+        return changed
+
+    def stats(self, inference_latency=None):
+        saved = self.skipped * inference_latency if inference_latency is not None else None
+        return {
+            "motion_skip_ratio": round(self.skipped / self.checked, 3) if self.checked else None,
+            "motion_gate_ms": round(self.gate_time * 1000, 3),
+            "inference_saved_s": round(saved, 2) if saved is not None else None,
+        }
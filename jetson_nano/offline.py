@@ -0,0 +1,170 @@
+"""Headless batch counting of a recorded video, as fast as the hardware allows.
+
+No websocket, no display and no annotation unless ``--annotate`` is given.
+Frames are decoded on a reader thread and sent through the model in
+batches; the tracker and counters then run over each batch in order.
+
+Writes, named after the video:
+    tests/results/logs/<name>.csv    frame, sheep_count, visible, new, fps
+    tests/results/ids/<name>.csv     sheep, track_id, frame, video_time
+    tests/results/videos/<name>.mp4  annotated video (only with --annotate)
+
+    python -m jetson_nano.offline tests/data/sheepHerd1.mp4 [--batch 8] [--area "[[x,y],...]"]
+"""
+import argparse, csv, json, os, threading, time
+import cv2, numpy as np
+
+from .config import (MODEL_PATH, FRAME_WIDTH, FRAME_HEIGHT, COUNTING_MODE, TILE_SIZE, TILE_MAX,
+                     INFERENCE_BACKEND, INFERENCE_PRECISION, INFERENCE_DEVICE)
+from .pipeline import FrameQueue, BLOCK
+from .batching import InferenceBatcher
+from .backends import load_model
+from .session import StreamSession
+from .annotate import annotate_frame
+
+# ==============================================================
+# Configs
+# ==============================================================
+LOGS_DIR = "tests/results/logs"
+IDS_DIR = "tests/results/ids"
+VIDEOS_DIR = "tests/results/videos"
+OFFLINE_BATCH_SIZE = 8
+PROGRESS_INTERVAL = 5.0
+
+
+# ==============================================================
+# Reader
+# ==============================================================
+def read_batches(session, batch_size, stop_event):
+    """Decode frames on a background thread and yield lists of batch_size frames"""
+    queue = FrameQueue(maxsize=2 * batch_size, policy=BLOCK)
+
+    def reader():
+        try:
+            while not stop_event.is_set():
+                frame = session.read_frame()
+                if frame is None:
+                    break
+                queue.put(frame, stop_event)
+        finally:
+            queue.put(None, stop_event)
+
+    threading.Thread(target=reader, daemon=True).start()
+    batch = []
+    while (frame := queue.get(stop_event)) is not None:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ==============================================================
+# Processing
+# ==============================================================
+def process_video(batcher, video, params, batch_size=OFFLINE_BATCH_SIZE, annotate=False):
+    """Count a video file; returns a summary dict"""
+    name = os.path.splitext(os.path.basename(video))[0]
+    session = StreamSession({**params, "camera": video, "detect": "true", "motion_gate": False}, batcher)
+    if not session.open():
+        raise RuntimeError(f"Não foi possível abrir {video}")
+    # queued frames, the batch being filled, the batch being counted and the one in the reader
+    session.reserve_frames(3 * batch_size + 2)
+    video_fps = session.capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    for directory in (LOGS_DIR, IDS_DIR):
+        os.makedirs(directory, exist_ok=True)
+    writer = None
+    if annotate:
+        os.makedirs(VIDEOS_DIR, exist_ok=True)
+        writer = cv2.VideoWriter(os.path.join(VIDEOS_DIR, f"{name}.mp4"),
+                                 cv2.VideoWriter_fourcc(*"mp4v"), video_fps, (FRAME_WIDTH, FRAME_HEIGHT))
+
+    stop_event = threading.Event()
+    frames = 0
+    start = last_report = time.perf_counter()
+    try:
+        with open(os.path.join(LOGS_DIR, f"{name}.csv"), "w", newline="") as log_file, \
+                open(os.path.join(IDS_DIR, f"{name}.csv"), "w", newline="") as ids_file:
+            log = csv.writer(log_file)
+            ids = csv.writer(ids_file)
+            log.writerow(["frame", "sheep_count", "visible", "new", "fps"])
+            ids.writerow(["sheep", "track_id", "frame", "video_time"])
+
+            for batch in read_batches(session, batch_size, stop_event):
+                # The frame, its area crop or its tiles (same area, so same imgsz, for the whole batch)
+                inputs = [session.model_inputs(frame) for frame in batch]
+                images = [image for images, _ in inputs for image in images]
+                results = []
+                for i in range(0, len(images), batch_size):
+                    results += batcher.predict(images[i:i + batch_size], inputs[0][1])
+                for frame, (images, _) in zip(batch, inputs):
+                    packet = session.detect_frame(frame, results[:len(images)])
+                    del results[:len(images)]
+                    frames += 1
+                    fps = frames / (time.perf_counter() - start)
+
+                    log.writerow([packet["index"], packet["sheep_count"], len(packet["detections"]),
+                                  packet["new_count"], round(fps, 2)])
+                    if packet["new_count"]:
+                        detections = packet["detections"]
+                        new = detections.ids[detections.new].tolist()
+                        for n, track_id in enumerate(new, packet["sheep_count"] - len(new) + 1):
+                            ids.writerow([n, track_id, packet["index"], round(packet["index"] / video_fps, 3)])
+                    if writer is not None:
+                        np.copyto(session.annotated, frame)
+                        writer.write(annotate_frame(session.annotated, packet["detections"], packet["area"], packet["line"]))
+
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    print(f"[{name}] {frames} frames | {frames / (now - start):.1f} fps | {session.sheep_count} ovelhas")
+                    last_report = now
+    finally:
+        stop_event.set()
+        session.capture.release()
+        if writer is not None:
+            writer.release()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "video": video,
+        "frames": frames,
+        "seconds": round(elapsed, 2),
+        "fps": round(frames / elapsed, 2) if elapsed else None,
+        "sheep_count": session.sheep_count,
+        "batch_size": round(batcher.mean_batch_size, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--batch", type=int, default=OFFLINE_BATCH_SIZE, help="frames per forward pass")
+    parser.add_argument("--area", default="[]", help="area polygon as JSON")
+    parser.add_argument("--mode", default=COUNTING_MODE, help="all, area or line")
+    parser.add_argument("--line", default=None, help="counting line as JSON [[x1,y1],[x2,y2]]")
+    parser.add_argument("--annotate", action="store_true", help="also write the annotated video")
+    parser.add_argument("--no-roi", action="store_true", help="run the model on the whole frame, not the area crop")
+    parser.add_argument("--tiled", action="store_true", help="run the model on native-resolution tiles")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--max-tiles", type=int, default=TILE_MAX, help="model inputs per frame at most")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, help="auto, pytorch, onnx or openvino")
+    parser.add_argument("--precision", default=INFERENCE_PRECISION, help="fp32, fp16 or int8")
+    parser.add_argument("--device", default=INFERENCE_DEVICE)
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.backend, args.precision, args.device)
+    batcher = InferenceBatcher(model, max_batch=args.batch)
+    params = {"area": json.loads(args.area), "mode": args.mode,
+              "line": json.loads(args.line) if args.line else None, "roi": not args.no_roi,
+              "tiled": args.tiled, "tile_size": args.tile_size, "max_tiles": args.max_tiles}
+
+    for video in args.videos:
+        summary = process_video(batcher, video, params, args.batch, args.annotate)
+        print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
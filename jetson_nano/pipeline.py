@@ -0,0 +1,259 @@
+import asyncio, threading, time
+from collections import deque
+
+# ==============================================================
+# Configs
+# ==============================================================
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+QUEUE_POLICIES = (DROP_OLDEST, BLOCK)
+
+POLL_INTERVAL = 0.1
+EMPTY = object()      # returned by FrameQueue.pop when there is nothing queued
+
+
+# ==============================================================
+# Bounded Queue
+# ==============================================================
+class FrameQueue:
+    """Bounded thread-safe queue between two pipeline stages.
+
+    With the ``drop_oldest`` policy a full queue discards its oldest item so
+    the producer never waits; with ``block`` the producer waits for room.
+    ``None`` is the end-of-stream marker and is never dropped, nor are items
+    for which ``keep(item)`` is true (the oldest other item goes instead, or
+    the queue briefly grows past ``maxsize`` when every item is kept).
+    """
+
+    def __init__(self, maxsize=2, policy=DROP_OLDEST, keep=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.keep = keep
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item, stop_event: threading.Event):
+        with self._cond:
+            if item is None:
+                self._items.append(item)
+                self._cond.notify_all()
+                return
+            while len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._drop_oldest()
+                    break
+                if stop_event.is_set():
+                    return
+                self._cond.wait(POLL_INTERVAL)
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def _drop_oldest(self):
+        for i, queued in enumerate(self._items):
+            if queued is not None and not (self.keep and self.keep(queued)):
+                del self._items[i]
+                self.dropped += 1
+                return
+
+    def get(self, stop_event: threading.Event):
+        """Next item, or ``None`` at end of stream or when stopped."""
+        with self._cond:
+            while not self._items:
+                if stop_event.is_set():
+                    return None
+                self._cond.wait(POLL_INTERVAL)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def pop(self):
+        """Next item without waiting, or ``EMPTY``"""
+        with self._cond:
+            if not self._items:
+                return EMPTY
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+
+# ==============================================================
+# Pipeline
+# ==============================================================
+class Pipeline:
+    """Runs a frame source and a chain of stages on worker threads.
+
+    ``source()`` returns the next item or ``None`` when the stream ends, and
+    each stage maps an item to the next one (``None`` also ends the stream).
+    In pipelined mode every step has its own thread joined by ``FrameQueue``s,
+    so frame N+1 is captured while frame N is still in inference; otherwise a
+    single worker runs the steps back to back. Finished items are handed to
+    the event loop through ``results()``, from an output ``FrameQueue`` with
+    the same policy: with ``block`` the last stage waits until the loop has
+    taken an item, so a slow consumer slows the pipeline down instead of
+    piling up frames. ``keep(item)`` marks stage outputs that must never be
+    dropped (the source's items are not checked). ``observer(name, seconds)``,
+    when set, gets the time of every source and stage call that produced an
+    item, ``names`` labelling the source and then each stage.
+    """
+
+    def __init__(self, source, stages, maxsize=2, policy=DROP_OLDEST, pipelined=True, keep=None,
+                 names=None, observer=None):
+        self.stages = list(stages)
+        self.names = list(names) if names is not None else ["source"] + [f"stage{i}" for i in range(len(self.stages))]
+        if observer is not None:
+            source = self._timed(source, self.names[0], observer)
+            self.stages = [self._timed(stage, name, observer) for stage, name in zip(self.stages, self.names[1:])]
+        self.source = source
+        self.maxsize = maxsize
+        self.policy = policy
+        self.keep = keep
+        self.pipelined = pipelined
+        self.stop_event = threading.Event()
+        self.error = None
+        self._queues = []
+        self._threads = []
+        self._loop = None
+        self._output = None
+        self._wake = None
+
+    @staticmethod
+    def _timed(fn, name, observer):
+        def timed(*args):
+            start = time.perf_counter()
+            item = fn(*args)
+            if item is not None:
+                observer(name, time.perf_counter() - start)
+            return item
+        return timed
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._output = FrameQueue(self.maxsize, self.policy, self.keep)
+        self._wake = asyncio.Event()
+
+        if self.pipelined:
+            # the first queue holds source items, the others stage outputs
+            self._queues = [FrameQueue(self.maxsize, self.policy, self.keep if i else None)
+                            for i in range(len(self.stages))]
+            workers = [self._run_source] + [
+                (lambda i=i: self._run_stage(i)) for i in range(len(self.stages))
+            ]
+        else:
+            workers = [self._run_sequential]
+
+        for worker in workers:
+            thread = threading.Thread(target=worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def join(self):
+        self.stop()
+        await asyncio.to_thread(self._join_threads)
+
+    def _join_threads(self):
+        for thread in self._threads:
+            thread.join()
+
+    @property
+    def dropped(self):
+        """Total frames discarded by the drop-oldest policy."""
+        return sum(q.dropped for q in self._queues) + (self._output.dropped if self._output is not None else 0)
+
+    @property
+    def depth(self):
+        """Items currently queued anywhere in the pipeline."""
+        return sum(len(q) for q in self._queues) + self.backlog
+
+    @property
+    def backlog(self):
+        """Finished items waiting for the event loop to send them."""
+        return len(self._output) if self._output is not None else 0
+
+    # ---------------- output ----------------
+    async def results(self):
+        """Async iterator over finished items, ending with the stream."""
+        while True:
+            item = self._output.pop()
+            if item is EMPTY:
+                self._wake.clear()
+                item = self._output.pop()     # an item may have come in before the clear
+                if item is EMPTY:
+                    await self._wake.wait()
+                    continue
+            if item is None:
+                return
+            yield item
+
+    def _emit(self, item):
+        """Hand an item to the event loop (waits for room under ``block``)"""
+        self._output.put(item, self.stop_event)
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _finish(self, exc=None):
+        if exc is not None and self.error is None:
+            self.error = exc
+            print("Erro no pipeline:", exc)
+        self.stop_event.set()
+
+    # ---------------- workers ----------------
+    def _run_source(self):
+        out = self._queues[0] if self._queues else None
+        try:
+            while not self.stop_event.is_set():
+                item = self.source()
+                if item is None:
+                    break
+                out.put(item, self.stop_event)
+        except Exception as e:
+            self._finish(e)
+        finally:
+            out.put(None, self.stop_event)
+
+    def _run_stage(self, index):
+        inbox = self._queues[index]
+        last = index == len(self.stages) - 1
+        emit = self._emit if last else (lambda item: self._queues[index + 1].put(item, self.stop_event))
+        stage = self.stages[index]
+        try:
+            while True:
+                item = inbox.get(self.stop_event)
+                if item is None:
+                    break
+                item = stage(item)
+                if item is None:
+                    break
+                emit(item)
+        except Exception as e:
+            self._finish(e)
+        finally:
+            emit(None)
+            if last:
+                self._finish()
+
+    def _run_sequential(self):
+        try:
+            while not self.stop_event.is_set():
+                item = self.source()
+                for stage in self.stages:
+                    if item is None:
+                        break
+                    item = stage(item)
+                if item is None:
+                    break
+                self._emit(item)
+        except Exception as e:
+            self._finish(e)
+        finally:
+            self._emit(None)
+            self._finish()
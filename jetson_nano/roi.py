@@ -0,0 +1,44 @@
+import math
+import numpy as np
+
+from .config import ROI_PADDING, ROI_UPSCALE, EXPORT_IMGSZ
+
+# Model strides: input sizes are multiples of this
+STRIDE = 32
+
+
+# ==============================================================
+# Region of Interest
+# ==============================================================
+class RegionOfInterest:
+    """Padded bounding rectangle of the detection area, where the model runs.
+
+    ``crop`` is a view of the frame (no copy). ``imgsz`` is the model input
+    size for the crop: its longer side times ``upscale``, rounded up to the
+    model stride and capped at the full input size, so a small pen costs a
+    fraction of the pixels. ``to_frame`` maps boxes found in the crop back
+    to frame coordinates.
+    """
+
+    def __init__(self, area, padding=ROI_PADDING, upscale=ROI_UPSCALE, max_imgsz=EXPORT_IMGSZ):
+        self.rect = area.bounding_rect(padding)
+        x1, y1, x2, y2 = self.rect
+        self.frame_shape = (area.height, area.width)
+        self.ratio = (x2 - x1) * (y2 - y1) / (area.width * area.height)
+        side = math.ceil(max(x2 - x1, y2 - y1) * upscale / STRIDE) * STRIDE
+        self.imgsz = min(max(side, STRIDE), max_imgsz)
+
+    def crop(self, frame):
+        x1, y1, x2, y2 = self.rect
+        return frame[y1:y2, x1:x2]
+
+    def to_frame(self, boxes):
+        """Same boxes (x1, y1, x2, y2, ... rows) shifted from crop to frame coordinates"""
+        data = np.array(boxes.data, dtype=np.float32)
+        if len(data):
+            data[:, [0, 2]] += self.rect[0]
+            data[:, [1, 3]] += self.rect[1]
+        return type(boxes)(data, self.frame_shape)
+
+    def stats(self):
+        return {"roi_ratio": round(self.ratio, 3), "roi_imgsz": self.imgsz}
@@ -0,0 +1,272 @@
+import asyncio, math, time
+import cv2, numpy as np
+
+from common.protocol import camera_key
+from .config import (FRAME_WIDTH, FRAME_HEIGHT, CLASS_TYPE, CONF_THRESHOLD,
+                     TRACKER_CONFIG, TRACKER_FRAME_RATE, MOTION_GATE, COUNTING_MODE, ROI_INFERENCE,
+                     TILED_INFERENCE, TILE_SIZE, TILE_OVERLAP, TILE_MAX)
+from .area import compile_area
+from .stride import AdaptiveStride, TrackExtrapolator, FpsMeter
+from .encoder import AdaptiveEncoder
+from .motion import MotionGate
+from .tracks import TrackRegistry, MODE_AREA
+from .roi import RegionOfInterest
+from .tiling import TileGrid
+from .buffers import Detections, FrameRing
+
+
+# ==============================================================
+# Tracker
+# ==============================================================
+def create_tracker(config=TRACKER_CONFIG, frame_rate=TRACKER_FRAME_RATE):
+    """New Ultralytics tracker, the same one ``model.track`` would create"""
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    try:
+        from ultralytics.utils import YAML
+        yaml_load = YAML.load
+    except ImportError:  # older Ultralytics releases
+        from ultralytics.utils import yaml_load
+
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(config)))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+
+
+# ==============================================================
+# Stream Session
+# ==============================================================
+class StreamSession:
+    """State of one camera stream: capture, tracker and counters.
+
+    Every ``video`` command creates its own session, so several cameras or
+    several ``/jetson_ws`` clients never share counts or tracker state. The
+    model itself is shared through the ``InferenceBatcher``.
+    """
+
+    def __init__(self, params, batcher, tracker_factory=create_tracker):
+        self.camera = params.get("camera")
+        self.camera_id = camera_key(self.camera)
+        self.detect = params.get("detect")
+        self.area = params.get("area", [])
+        self.line = params.get("line")
+        self.target_fps = params.get("target_fps")
+
+        self.batcher = batcher
+        self.tracker = tracker_factory()
+        self.class_id = next((i for i, name in batcher.names.items() if name == CLASS_TYPE), -1)
+
+        self.sheep_count = 0
+        self.registry = TrackRegistry(params.get("mode", COUNTING_MODE), self.line)
+        self.frame_index = 0
+        self.stride_control = AdaptiveStride(self.target_fps)
+        self.extrapolator = TrackExtrapolator()
+        self.fps_meter = FpsMeter()
+        self.motion_gate = MotionGate() if params.get("motion_gate", MOTION_GATE) else None
+        # Only area counting ignores everything outside the area, so only it can crop
+        self.roi_enabled = bool(params.get("roi", ROI_INFERENCE)) and self.registry.mode == MODE_AREA
+        self.roi = None
+        self._roi_area = None
+        # Tiled inference on the native-resolution frame (see TileGrid)
+        self.tiled = bool(params.get("tiled", TILED_INFERENCE))
+        self.tile_options = {"size": params.get("tile_size", TILE_SIZE),
+                             "overlap": params.get("tile_overlap", TILE_OVERLAP),
+                             "max_tiles": params.get("max_tiles", TILE_MAX)}
+        self.tiles = None
+        self._tiles_key = None
+        # Viewers behind the server; 0 keeps only the count (and stored) frames
+        self.encoder = AdaptiveEncoder(consumers=int(params.get("subscribers", 1)))
+
+        # Preallocated frames (see reserve_frames) and the reused capture buffer
+        self.frames = None
+        self.annotated = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        self.message = bytearray()
+        self._raw = None
+        # Tiled mode: native frames kept until detection, by id of the resized ring frame
+        self.sources = None
+        self._sources = {}
+
+        self.capture = None
+        self.stop_event = asyncio.Event()
+        self.task = None
+
+    # ---------------- capture ----------------
+    @property
+    def is_live(self):
+        """True for camera indexes, False for video files"""
+        try:
+            int(self.camera)
+            return True
+        except (ValueError, TypeError):
+            return False
+
+    def open(self):
+        """Open the camera index or video file; False when it fails"""
+        try:
+            cam_index = int(self.camera)
+            self.capture = cv2.VideoCapture(cam_index)
+            print(f"A usar câmara: {cam_index}")
+        except (ValueError, TypeError):
+            self.capture = cv2.VideoCapture(self.camera)
+            print(f"A reproduzir vídeo: {self.camera}")
+        return self.capture.isOpened()
+
+    def reserve_frames(self, count):
+        """Resize into a ring of ``count`` preallocated frames from now on"""
+        self.frames = FrameRing(count, (FRAME_HEIGHT, FRAME_WIDTH, 3))
+
+    def read_frame(self):
+        """Capture stage: read and resize the next frame"""
+        success, frame = self.capture.read(self.sources.next() if self.sources is not None else self._raw)
+
+        # if not success:
+        #     capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        #     continue
+
+        if not success:
+            print(f"Vídeo terminou: {self.camera}")
+            return None
+
+        if self.frames is None:
+            self._raw = frame
+            return cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
+        resized = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT), dst=self.frames.next())
+        if self.tiled:
+            # Detection runs later on another stage: the native frame must outlive this read
+            if self.sources is None:
+                self.sources = FrameRing(len(self.frames), frame.shape)
+            self._sources[id(resized)] = frame
+        else:
+            self._raw = frame
+        return resized
+
+    def source_of(self, frame):
+        """Native-resolution frame that ``frame`` was resized from"""
+        return self._sources.get(id(frame), self._raw)
+
+    # ---------------- detection ----------------
+    def region(self, area):
+        """RegionOfInterest the model runs on, None for the whole frame"""
+        if not self.roi_enabled or area.full_frame:
+            return None
+        if self._roi_area is not area:      # compile_area returns the same object until the area changes
+            self.roi = RegionOfInterest(area)
+            self._roi_area = area
+        return self.roi
+
+    def tile_grid(self, source, roi):
+        """TileGrid over the native frame (only the ROI part of it in ROI mode)"""
+        rect = None
+        if roi is not None:
+            sx, sy = source.shape[1] / FRAME_WIDTH, source.shape[0] / FRAME_HEIGHT
+            x1, y1, x2, y2 = roi.rect
+            rect = (int(x1 * sx), int(y1 * sy), math.ceil(x2 * sx), math.ceil(y2 * sy))
+        key = (source.shape, rect)
+        if self._tiles_key != key:
+            self.tiles = TileGrid(source.shape, rect, **self.tile_options)
+            self._tiles_key = key
+        return self.tiles
+
+    def model_inputs(self, frame):
+        """(images, imgsz) the model runs on for this frame: the frame, the area crop or the tiles"""
+        roi = self.region(compile_area(self.area, FRAME_WIDTH, FRAME_HEIGHT))
+        if self.tiled:
+            source = self.source_of(frame)
+            return self.tile_grid(source, roi).tiles(source, frame), None
+        if roi is not None:
+            return [roi.crop(frame)], roi.imgsz
+        return [frame], None
+
+    def to_frame(self, results):
+        """Boxes in frame coordinates from the model results for ``model_inputs``"""
+        if self.tiled:
+            return self.tiles.merge(results)
+        roi = self.region(compile_area(self.area, FRAME_WIDTH, FRAME_HEIGHT))
+        return roi.to_frame(results[0]) if roi is not None else results[0]
+
+    def detect_frame(self, frame, results=None):
+        """Detect/track stage: run the model and update this session's counters
+
+        ``results`` are the model results already computed for
+        ``model_inputs(frame)`` (offline batches); otherwise the inputs go
+        through the batcher.
+        """
+        index = self.frame_index
+        self.frame_index += 1
+
+        # Defined area, compiled once per polygon
+        area = compile_area(self.area, FRAME_WIDTH, FRAME_HEIGHT)
+
+        detections = Detections.empty()
+        new_count = 0
+
+        # Detection and tracking (every k-th frame when a target FPS is set)
+        if self.detect and not self.stride_control.should_detect():
+            detections = self.extrapolator.predict(index, FRAME_WIDTH, FRAME_HEIGHT)
+
+        elif self.detect and self.motion_gate is not None and not self.motion_gate.changed(frame, area):
+            # Nothing moved: keep the last boxes, the tracker and the registry are left untouched
+            detections = self.extrapolator.hold()
+
+        elif self.detect:
+            start = time.perf_counter()
+            if results is None:
+                results = self.batcher.infer_many(*self.model_inputs(frame))
+            tracks = self.tracker.update(self.to_frame(results), frame)
+            self.stride_control.record(time.perf_counter() - start)
+
+            # tracks columns: x1, y1, x2, y2, id, conf, cls, idx
+            tracks = np.asarray(tracks, dtype=np.float32).reshape(-1, 8)
+            keep = (tracks[:, 6].astype(np.int32) == self.class_id) & (tracks[:, 5] >= CONF_THRESHOLD)
+            tracks = tracks[keep]
+            xyxy = tracks[:, :4].astype(np.int32)
+            ids = tracks[:, 4].astype(np.int64)
+
+            # Update every track of the frame at once
+            hits, counted = self.registry.update(ids, area.centroids(xyxy), area.contains(xyxy))
+            detections = Detections(xyxy, ids, counted, hits)
+
+            new_count = int(np.count_nonzero(hits))
+            for track_id, conf in zip(detections.ids[hits].tolist(), tracks[hits, 5].tolist()):
+                self.sheep_count += 1
+                print(f"[{self.camera}] [{self.sheep_count}] Nova ovelha ID {track_id} | Confiança: {conf:.2f}")
+
+            self.extrapolator.update(index, detections)
+
+        return {
+            "index": index,
+            "timestamp": time.time(),
+            "detect_enabled": bool(self.detect),
+            "frame": frame,
+            "detections": detections,
+            "area": area,
+            "line": self.line,
+            "new_detections": new_count > 0,
+            "new_count": new_count,
+            "sheep_count": self.sheep_count
+        }
+
+    # ---------------- reporting ----------------
+    def stats(self, fps):
+        return {
+            "type": "stats",
+            "camera": self.camera,
+            "camera_id": self.camera_id,
+            "sheep_count": self.sheep_count,
+            **self.registry.stats(),
+            "fps": round(fps, 2),
+            "batch_size": round(self.batcher.mean_batch_size, 2),
+            **self.stride_control.stats(),
+            **self.encoder.stats(),
+            **(self.motion_gate.stats(self.stride_control.latency) if self.motion_gate else {}),
+            **(self.roi.stats() if self.roi else {}),
+            **(self.tiles.stats() if self.tiles else {})
+        }
+
+    # ---------------- lifecycle ----------------
+    async def stop(self):
+        self.stop_event.set()
+        if self.task and not self.task.done():
+            await self.task
+        if self.capture:
+            self.capture.release()
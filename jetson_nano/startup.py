@@ -0,0 +1,136 @@
+import asyncio, csv, os, time
+from functools import partial
+import numpy as np
+
+from .config import FRAME_WIDTH, FRAME_HEIGHT, WARMUP_PASSES, STARTUP_LOG
+from .backends import load_model, PYTORCH
+from .batching import batch_limit
+
+# ==============================================================
+# Configs
+# ==============================================================
+LOADING = "loading"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+
+# ==============================================================
+# Model Loader
+# ==============================================================
+class ModelLoader:
+    """Loads and warms up the model in the background, so the app answers meanwhile.
+
+    ``start`` runs ``load_model`` on a worker thread and then ``passes``
+    forward passes on blank frames at the stream resolution, with a batch of
+    one frame and the largest batch the model takes (every new input shape
+    pays its own kernel selection). A model that fails its warmup is
+    replaced by ``fallback`` (PyTorch FP32). The model is handed to the
+    batcher only once it is warm.
+    ``started`` is the ``perf_counter`` value of the import, so the
+    import-to-ready time covers the whole cold start; it is appended to
+    ``log_path`` on every start.
+    """
+
+    def __init__(self, batcher, started=None, passes=WARMUP_PASSES, log_path=STARTUP_LOG, loader=load_model,
+                 fallback=partial(load_model, backend=PYTORCH, precision="fp32", fallback=False)):
+        self.batcher = batcher
+        self.started = started if started is not None else time.perf_counter()
+        self.passes = passes
+        self.log_path = log_path
+        self.loader = loader
+        self.fallback = fallback
+
+        self.state = LOADING
+        self.model = None
+        self.error = None
+        self.load_time = None
+        self.warmup_time = None
+        self.ready_time = None
+        self._done = None
+        self._task = None
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def start(self):
+        """Schedule loading on the running event loop"""
+        self._done = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait(self):
+        """Wait until loading ends; True when the model can be used"""
+        await self._done.wait()
+        return self.ready
+
+    async def _run(self):
+        try:
+            start = time.perf_counter()
+            self.model = await asyncio.to_thread(self.loader)
+            self.load_time = time.perf_counter() - start
+
+            self.state = WARMING_UP
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._warmup, self.model)
+            except Exception as e:
+                if self.fallback is None or getattr(self.model, "backend", PYTORCH) == PYTORCH:
+                    raise
+                print(f"Aquecimento falhou com {self.describe()} ({e}); a usar PyTorch.")
+                self.model = await asyncio.to_thread(self.fallback)
+                await asyncio.to_thread(self._warmup, self.model)
+            self.warmup_time = time.perf_counter() - start
+
+            self.batcher.model = self.model
+            self.ready_time = time.perf_counter() - self.started
+            self.state = READY
+            print(f"Modelo pronto em {self.ready_time:.1f} s "
+                  f"(carregamento {self.load_time:.1f} s, aquecimento {self.warmup_time:.1f} s)")
+            self._record()
+        except Exception as e:
+            self.state = FAILED
+            self.error = str(e)
+            print("Erro ao carregar o modelo:", e)
+        finally:
+            self._done.set()
+
+    def _warmup(self, model):
+        frame = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        for _ in range(self.passes):
+            for size in sorted({1, batch_limit(model, self.batcher.max_batch)}):
+                model.predict([frame] * size, verbose=False)
+
+    def _record(self):
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            new = not os.path.exists(self.log_path)
+            with open(self.log_path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(["timestamp", "model", "load_s", "warmup_s", "import_to_ready_s"])
+                writer.writerow([round(time.time(), 3), self.describe(), round(self.load_time, 3),
+                                 round(self.warmup_time, 3), round(self.ready_time, 3)])
+        except OSError as e:
+            print("Erro ao registar o arranque:", e)
+
+    def describe(self):
+        if self.model is None:
+            return None
+        describe = getattr(self.model, "describe", None)
+        return describe() if describe else type(self.model).__name__
+
+    def status(self):
+        def seconds(value):
+            return round(value, 3) if value is not None else None
+        return {
+            "type": "ready",
+            "state": self.state,
+            "ready": self.ready,
+            "model": self.describe(),
+            "load_s": seconds(self.load_time),
+            "warmup_s": seconds(self.warmup_time),
+            "import_to_ready_s": seconds(self.ready_time),
+            "error": self.error,
+        }
@@ -0,0 +1,130 @@
+import math, time
+import numpy as np
+
+from .buffers import Detections
+
+# ==============================================================
+# Configs
+# ==============================================================
+MAX_STRIDE = 8
+LATENCY_SMOOTHING = 0.2     # weight of the newest sample in the moving average
+
+
+# ==============================================================
+# Adaptive Stride
+# ==============================================================
+class AdaptiveStride:
+    """Chooses how often to run detection to hold a target FPS.
+
+    Keeps an exponential moving average of the inference latency and runs
+    the model every k-th frame, with k = ceil(latency * target_fps). Without a
+    target FPS every frame is a detection frame.
+    """
+
+    def __init__(self, target_fps=None, max_stride=MAX_STRIDE):
+        self.target_fps = float(target_fps) if target_fps else None
+        self.max_stride = max_stride
+        self.latency = None
+        self.stride = 1
+        self.frames = 0
+        self.detections = 0
+
+    def should_detect(self):
+        """Called once per frame; True when this frame must run the model."""
+        detect = self.frames % self.stride == 0
+        self.frames += 1
+        if detect:
+            self.detections += 1
+        return detect
+
+    def record(self, latency):
+        """Feed the measured inference time (seconds) and update k."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+        if self.target_fps:
+            k = math.ceil(self.latency * self.target_fps)
+            self.stride = min(max(k, 1), self.max_stride)
+
+    def stats(self):
+        return {
+            "stride": self.stride,
+            "target_fps": self.target_fps,
+            "inference_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "detect_ratio": round(self.detections / self.frames, 3) if self.frames else None,
+        }
+
+
+# ==============================================================
+# Track Interpolation
+# ==============================================================
+class TrackExtrapolator:
+    """Moves track boxes forward on frames where detection is skipped.
+
+    Each track keeps its last box and a per-frame velocity estimated from its
+    last two detections; tracks missing from a detection frame are dropped.
+    """
+
+    def __init__(self):
+        self.detections = Detections.empty()
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.detected_at = 0     # frame index of the last detection
+
+    def update(self, frame_index, detections):
+        boxes = detections.xyxy.astype(np.float32)
+        velocity = np.zeros_like(boxes)
+        if len(self.detections) and frame_index > self.detected_at:
+            # match the previous detection frame by track id
+            order = np.argsort(self.detections.ids)
+            previous = self.detections.ids[order]
+            pos = np.minimum(np.searchsorted(previous, detections.ids), len(previous) - 1)
+            seen = previous[pos] == detections.ids
+            velocity[seen] = (boxes[seen] - self.boxes[order[pos[seen]]]) / (frame_index - self.detected_at)
+        self.detections = detections
+        self.boxes = boxes
+        self.velocity = velocity
+        self.detected_at = frame_index
+
+    def hold(self):
+        """Detections of the last detection frame, unchanged, for a frame where nothing moved
+
+        The velocity is reset so later skipped frames do not extrapolate the
+        old motion across the still gap; the next detection still measures
+        its velocity from the last detection frame.
+        """
+        self.velocity[:] = 0
+        return self.detections.moved(self.detections.xyxy)
+
+    def predict(self, frame_index, width, height):
+        """Detections for a skipped frame with extrapolated boxes"""
+        moved = self.boxes + self.velocity * (frame_index - self.detected_at)
+        np.clip(moved, 0, [width - 1, height - 1, width - 1, height - 1], out=moved)
+        return self.detections.moved(moved.astype(np.int32))
+
+
+# ==============================================================
+# FPS Meter
+# ==============================================================
+class FpsMeter:
+    """Achieved frames per second over a sliding reporting window."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.frames = 0
+        self.fps = 0.0
+
+    def tick(self):
+        self.frames += 1
+
+    def poll(self, interval):
+        """Update and return the FPS once per ``interval`` seconds, else None."""
+        elapsed = time.perf_counter() - self.start
+        if elapsed < interval:
+            return None
+        self.fps = self.frames / elapsed
+        self.start += elapsed
+        self.frames = 0
+        return self.fps
@@ -0,0 +1,172 @@
+import math
+import numpy as np
+
+from .config import (FRAME_WIDTH, FRAME_HEIGHT, TILE_SIZE, TILE_OVERLAP, TILE_MAX,
+                     TILE_FULL_FRAME, TILE_NMS_IOU, TILE_SEAM_MARGIN)
+
+# Tiles grow by this factor while the grid is over the budget
+TILE_GROWTH = 1.25
+# Share of a cut box (or of the seam span) that another box must cover to be the same sheep
+SEAM_OVERLAP = 0.5
+# Box sides, in xyxy column order
+LEFT, TOP, RIGHT, BOTTOM = 0, 1, 2, 3
+
+
+def _positions(start, end, size, overlap):
+    """Evenly spread tile starts covering [start, end) with at least ``overlap`` shared"""
+    length = end - start
+    if length <= size:
+        return [start]
+    count = math.ceil((length - size) / (size * (1 - overlap))) + 1
+    return np.linspace(start, end - size, count).round().astype(int).tolist()
+
+
+def _intersection(box, data):
+    w = np.minimum(box[2], data[:, 2]) - np.maximum(box[0], data[:, 0])
+    h = np.minimum(box[3], data[:, 3]) - np.maximum(box[1], data[:, 1])
+    return np.clip(w, 0, None) * np.clip(h, 0, None)
+
+
+def _area(data):
+    return (data[..., 2] - data[..., 0]) * (data[..., 3] - data[..., 1])
+
+
+def nms(data, threshold=TILE_NMS_IOU):
+    """Rows of x1, y1, x2, y2, conf, cls kept by per-class IoU NMS (most confident wins), in that order"""
+    order = np.argsort(-data[:, 4], kind="stable")
+    suppressed = np.zeros(len(data), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        inter = _intersection(data[i], data)
+        iou = inter / np.maximum(_area(data[i]) + _area(data) - inter, 1e-6)
+        suppressed |= (iou > threshold) & (data[:, 5] == data[i, 5])
+    return np.array(keep, dtype=np.int64)
+
+
+def join_seams(data, cuts):
+    """Resolve boxes cut by an inner tile edge (``cuts``: left, top, right, bottom flags per row).
+
+    A cut box mostly inside a bigger box of the same class is a piece of a
+    sheep another input saw whole, and is dropped. Two pieces cut at facing
+    seams (the right edge of one tile and the left edge of its neighbour,
+    or top/bottom) that overlap across the seam are one sheep, and become
+    their union with the higher confidence. Boxes not cut at a seam are
+    never merged.
+    """
+    data, cuts = data.copy(), cuts.copy()
+    alive = np.ones(len(data), dtype=bool)
+    changed = True
+    while changed:
+        changed = False
+        for i in np.flatnonzero(alive & cuts.any(axis=1)):
+            if not alive[i]:
+                continue
+            inter = _intersection(data[i], data)
+            for j in np.flatnonzero(alive & (inter > 0) & (data[:, 5] == data[i, 5])):
+                if j == i:
+                    continue
+                joined = _join(data, cuts, i, j)
+                if joined is not None:
+                    data[i], cuts[i] = joined
+                    alive[j] = False
+                    changed = True
+                    break
+                if inter[j] >= SEAM_OVERLAP * _area(data[i]) and _area(data[j]) >= _area(data[i]):
+                    alive[i] = False
+                    changed = True
+                    break
+    return data[alive]
+
+
+def _join(data, cuts, i, j):
+    """Union of pieces i and j when they are cut at facing seams and line up across them, else None"""
+    for near, far, lo, hi in ((LEFT, RIGHT, 1, 3), (TOP, BOTTOM, 0, 2)):
+        first, second = (i, j) if data[i, near] <= data[j, near] else (j, i)
+        if not (cuts[first, far] and cuts[second, near]):
+            continue
+        # the pieces must cover the same span along the seam
+        shared = min(data[i, hi], data[j, hi]) - max(data[i, lo], data[j, lo])
+        if shared < SEAM_OVERLAP * min(data[i, hi] - data[i, lo], data[j, hi] - data[j, lo]):
+            continue
+        box = data[i].copy()
+        box[:2] = np.minimum(data[i, :2], data[j, :2])
+        box[2:4] = np.maximum(data[i, 2:4], data[j, 2:4])
+        box[4] = max(data[i, 4], data[j, 4])
+        flags = cuts[i] | cuts[j]
+        flags[near], flags[far] = cuts[first, near], cuts[second, far]
+        return box, flags
+    return None
+
+
+# ==============================================================
+# Tile Grid
+# ==============================================================
+class TileGrid:
+    """Overlapping native-resolution tiles of a camera frame (or of one region of it).
+
+    The model sees small sheep at the camera's resolution instead of after
+    the downscale to ``FRAME_WIDTH`` x ``FRAME_HEIGHT``. Tiles are ``size``
+    pixels square with ``overlap`` shared between neighbours; when the grid
+    needs more than ``max_tiles`` model inputs the tiles grow (less
+    resolution per sheep) until it fits. ``full_frame`` adds the resized
+    frame as one more input, so sheep bigger than a tile are still seen
+    whole. ``merge`` maps every tile's boxes to frame coordinates, drops
+    the duplicates across tiles with NMS and rejoins sheep cut at a seam.
+    """
+
+    def __init__(self, source_shape, rect=None, size=TILE_SIZE, overlap=TILE_OVERLAP,
+                 max_tiles=TILE_MAX, full_frame=TILE_FULL_FRAME):
+        height, width = source_shape[:2]
+        x1, y1, x2, y2 = rect if rect is not None else (0, 0, width, height)
+        self.source_shape = (height, width)
+        self.full_frame = full_frame
+
+        budget = max(1, max_tiles - int(full_frame))
+        size = max(1, int(size))
+        while True:
+            xs = _positions(x1, x2, size, overlap)
+            ys = _positions(y1, y2, size, overlap)
+            if len(xs) * len(ys) <= budget:
+                break
+            size = math.ceil(size * TILE_GROWTH)
+        self.size = size
+        tile_w, tile_h = min(size, x2 - x1), min(size, y2 - y1)
+        self.rects = [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+        self._offsets = np.array([(x, y, x, y) for x, y, _, _ in self.rects], dtype=np.float32)
+        # inner edges (shared with another tile) of every tile: left, top, right, bottom
+        self._seams = np.array([(tx1 > x1, ty1 > y1, tx2 < x2, ty2 < y2) for tx1, ty1, tx2, ty2 in self.rects])
+        self._extent = np.array([tile_w, tile_h], dtype=np.float32)
+        self._scale = np.array([FRAME_WIDTH / width, FRAME_HEIGHT / height] * 2, dtype=np.float32)
+
+    def __len__(self):
+        """Model inputs per frame"""
+        return len(self.rects) + int(self.full_frame)
+
+    def tiles(self, source, frame):
+        """Views of ``source`` (native frame) for every tile, then ``frame`` (resized) when full_frame"""
+        tiles = [source[y1:y2, x1:x2] for x1, y1, x2, y2 in self.rects]
+        return tiles + [frame] if self.full_frame else tiles
+
+    def merge(self, results):
+        """One set of boxes in frame coordinates from the results of ``tiles``"""
+        rows, cuts = [], []
+        for boxes, offset, seams in zip(results, self._offsets, self._seams):
+            data = np.array(boxes.data, dtype=np.float32).reshape(-1, 6)
+            # touching an inner edge of its tile (tile pixels), i.e. possibly only part of a sheep
+            near = np.hstack((data[:, :2] <= TILE_SEAM_MARGIN, data[:, 2:4] >= self._extent - TILE_SEAM_MARGIN))
+            cuts.append(near & seams)
+            data[:, :4] = (data[:, :4] + offset) * self._scale
+            rows.append(data)
+        if self.full_frame:
+            rows.append(np.asarray(results[-1].data, dtype=np.float32).reshape(-1, 6))
+            cuts.append(np.zeros((len(rows[-1]), 4), dtype=bool))
+        data, cuts = np.concatenate(rows), np.concatenate(cuts)
+        keep = nms(data)
+        return type(results[0])(join_seams(data[keep], cuts[keep]), (FRAME_HEIGHT, FRAME_WIDTH))
+
+    def stats(self):
+        return {"tiles": len(self), "tile_size": self.size}
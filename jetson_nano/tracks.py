@@ -0,0 +1,141 @@
+import numpy as np
+
+from .config import TRACK_TTL, TRACK_CAPACITY
+
+# ==============================================================
+# Configs
+# ==============================================================
+MODE_ALL = "all"
+MODE_LINE = "line"
+MODE_AREA = "area"
+COUNTING_MODES = (MODE_ALL, MODE_LINE, MODE_AREA)
+
+
+# ==============================================================
+# Track Registry
+# ==============================================================
+class TrackRegistry:
+    """Compact per-track state kept in parallel arrays, with eviction.
+
+    Each slot holds a track ID, its last centroid, the update in which it was
+    last seen, the side of the counting line it was on and whether it has
+    been counted. ``update`` handles every track of a frame with array
+    operations; tracks not seen for ``ttl`` updates free their slot, so
+    memory stays bounded on a 24/7 stream. Ages are measured in updates (model
+    runs), not video frames, so frames skipped by the stride or the motion
+    gate do not evict anything.
+
+    Modes: ``all`` counts every new track, ``area`` counts a track the first
+    time its centroid is inside the area, ``line`` counts it the first time
+    its centroid crosses the segment ``line`` = [[x1, y1], [x2, y2]].
+    """
+
+    def __init__(self, mode=MODE_AREA, line=None, ttl=TRACK_TTL, capacity=TRACK_CAPACITY):
+        if mode not in COUNTING_MODES:
+            raise ValueError(f"Modo de contagem inválido: {mode}")
+        if mode == MODE_LINE and (line is None or len(line) != 2):
+            raise ValueError("O modo line precisa de uma linha [[x1, y1], [x2, y2]]")
+        self.mode = mode
+        self.line = np.array(line, dtype=np.float32) if line is not None else None
+        self.ttl = ttl
+        self.updates = 0
+        self.counted_total = 0
+        self.evicted = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.ids = np.full(capacity, -1, dtype=np.int64)          # -1 = free slot
+        self.centroids = np.zeros((capacity, 2), dtype=np.float32)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.sides = np.zeros(capacity, dtype=np.int8)
+        self.counted = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = (self.ids, self.centroids, self.last_seen, self.sides, self.counted)
+        n = len(self.ids)
+        self._allocate(2 * n)
+        for new, prev in zip((self.ids, self.centroids, self.last_seen, self.sides, self.counted), old):
+            new[:n] = prev
+
+    def __len__(self):
+        return int(np.count_nonzero(self.ids >= 0))
+
+    # ---------------- lookup ----------------
+    def _slots(self, ids):
+        """Slot of each track ID, allocating free slots for new ones"""
+        slots = np.full(len(ids), -1, dtype=np.int64)
+        used = np.flatnonzero(self.ids >= 0)
+        if len(used):
+            order = used[np.argsort(self.ids[used])]
+            sorted_ids = self.ids[order]
+            pos = np.clip(np.searchsorted(sorted_ids, ids), 0, len(order) - 1)
+            found = sorted_ids[pos] == ids
+            slots[found] = order[pos[found]]
+
+        new = np.flatnonzero(slots < 0)
+        if len(new):
+            free = np.flatnonzero(self.ids < 0)
+            while len(free) < len(new):
+                self._grow()
+                free = np.flatnonzero(self.ids < 0)
+            slots[new] = free[:len(new)]
+            self.ids[slots[new]] = ids[new]
+            self.last_seen[slots[new]] = self.updates
+            self.sides[slots[new]] = 0
+            self.counted[slots[new]] = False
+        return slots, new
+
+    def _side(self, centroids):
+        """Side of the line (-1/0/1) and whether the projection falls on the segment"""
+        p1, p2 = self.line
+        direction = p2 - p1
+        rel = centroids - p1
+        cross = direction[0] * rel[:, 1] - direction[1] * rel[:, 0]
+        t = rel @ direction / max(float(direction @ direction), 1e-6)
+        return np.sign(cross).astype(np.int8), (t >= 0) & (t <= 1)
+
+    # ---------------- update ----------------
+    def update(self, ids, centroids, inside):
+        """Record one model run; returns (newly counted, counted) boolean arrays per input track"""
+        self.updates += 1
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        centroids = np.asarray(centroids, dtype=np.float32).reshape(-1, 2)
+        inside = np.asarray(inside, dtype=bool).reshape(-1)
+
+        slots, new = self._slots(ids)
+        is_new = np.zeros(len(ids), dtype=bool)
+        is_new[new] = True
+        already = self.counted[slots]
+
+        if self.mode == MODE_ALL:
+            hit = ~already
+        elif self.mode == MODE_AREA:
+            hit = ~already & inside
+        else:
+            side, on_segment = self._side(centroids)
+            previous = self.sides[slots]
+            hit = ~already & ~is_new & (previous != 0) & (side != 0) & (side != previous) & on_segment
+            # keep the last non-zero side so touching the line is not a crossing
+            self.sides[slots] = np.where(side != 0, side, previous)
+
+        self.centroids[slots] = centroids
+        self.last_seen[slots] = self.updates
+        self.counted[slots] |= hit
+        self.counted_total += int(np.count_nonzero(hit))
+
+        self._evict()
+        return hit, self.counted[slots]
+
+    def _evict(self):
+        stale = (self.ids >= 0) & (self.updates - self.last_seen > self.ttl)
+        n = int(np.count_nonzero(stale))
+        if n:
+            self.ids[stale] = -1
+            self.evicted += n
+
+    def stats(self):
+        return {
+            "counting_mode": self.mode,
+            "active_tracks": len(self),
+            "evicted_tracks": self.evicted,
+        }
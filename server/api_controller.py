@@ -1,18 +1,39 @@
 from fastapi import FastAPI, HTTPException, Depends, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import os
 from dotenv import load_dotenv
-from .auth import create_access_token, get_current_user
-from .database_handler import authenticate_user, get_user_roles
+from .auth import create_access_token, get_current_user, get_current_context, AuthContext, auth_cache, require_role
+from .database_handler import authenticate_user_async, get_user_roles_async, get_count_total, get_count_series, pool
+from .count_rollups import parse_range, BUCKETS
+from typing import Optional
 import json
 import asyncio
-import websockets
+from .jetson_broker import broker, Subscriber
+from .ingestion import ingestor
+from .password_verifier import LoginBusy
+from .report_export import export_report, FORMATS
+from .password_verifier import password_verifier
+from .metrics import REGISTRY, CONTENT_TYPE, AUTH_SECONDS
+from common.metrics import Collector
 
 
 load_dotenv("server/.env")
 
 JETSON_WS_URL = os.getenv("JETSON_WS_URL")
+
+# Parâmetros do vídeo pedido à Jetson quando o browser não envia "params"
+DEFAULT_VIDEO_PARAMS = {
+    "detect": "true",
+    "camera": "tests/data/sheepHerd1.mp4",
+    "area": []
+}
+# Parâmetros próprios só para estas roles, com estas chaves e uma destas câmaras
+VIDEO_PARAMS_ROLES = {"Admin", "Operator"}
+VIDEO_PARAM_KEYS = {"detect", "camera", "area", "line", "mode", "target_fps", "id_camera", "id_area",
+                    "motion_gate", "roi", "tiled", "tile_size", "tile_overlap", "max_tiles"}
+ALLOWED_CAMERAS = [c for c in os.getenv("ALLOWED_CAMERAS", DEFAULT_VIDEO_PARAMS["camera"]).split(",") if c]
 # print(JETSON_WS_URL)
 
 # Configuração CORS
@@ -26,27 +47,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Valores lidos no momento do scrape
+Collector("server_active_subscribers", "Browsers subscribed to a camera", "gauge", lambda: broker.subscriber_count)
+Collector("server_subscriber_queue_depth", "Messages queued for browsers", "gauge",
+          lambda: sum(s.stats()["queued"] for link in broker.links.values()
+                      for subs in link.streams.values() for s in subs))
+Collector("server_ingest_queue_depth", "Rows waiting for the write-behind flusher", "gauge",
+          lambda: ingestor.stats()["queued"])
+Collector("server_ingest_rows_total", "Rows written by the ingestion flusher", "counter", lambda: ingestor.rows)
+Collector("server_ingest_rejected_total", "Rows dropped by the ingestion flusher (rejected or out of retries)", "counter",
+          lambda: ingestor.rejected)
+Collector("server_auth_cache_hits_total", "Token lookups served from the cache", "counter", lambda: auth_cache.hits)
+Collector("server_auth_cache_misses_total", "Token lookups that decoded the JWT", "counter", lambda: auth_cache.misses)
+auth_cache.decode_observer = AUTH_SECONDS.labels("decode").observe
+Collector("server_login_pending", "Password verifications in flight", "gauge", lambda: password_verifier.pending)
+Collector("server_login_rejected_total", "Logins rejected with 429", "counter", lambda: password_verifier.rejected)
+
+@app.on_event("startup")
+async def start_maintenance():
+    # retenção/compactação dos segmentos de imagens
+    asyncio.create_task(ingestor.maintenance_loop())
+
 @app.get("/")
 def root():
     return {"Hello": "World SmartLiveStock!"}
 
 # Endpoint de login para gerar token
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    try:
+        user = await authenticate_user_async(form_data.username, form_data.password)
+    except LoginBusy:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username or password incorrect",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user["username"]})
+    roles = await get_user_roles_async(user["username"])
+    access_token = create_access_token(data={"sub": user["username"], "roles": roles})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @app.get("/protected")
-def protected_route(current_user: str = Depends(get_current_user)):
-    return {"message": f"Hello {current_user}, with roles {get_user_roles(current_user)}, you have access!"}
+def protected_route(context: AuthContext = Depends(get_current_context)):
+    return {"message": f"Hello {context.username}, with roles {context.roles}, you have access!"}
+
+def video_params(message, roles):
+    """Params to send to the Jetson for a "video" message, or None when they are not allowed"""
+    params = message.get("params")
+    if params is None:
+        return DEFAULT_VIDEO_PARAMS
+    if not isinstance(params, dict) or not VIDEO_PARAMS_ROLES.intersection(roles):
+        return None
+    params = {**DEFAULT_VIDEO_PARAMS, **{key: value for key, value in params.items() if key in VIDEO_PARAM_KEYS}}
+    # a câmara chega ao cv2.VideoCapture da Jetson: só fontes conhecidas
+    if str(params["camera"]) not in ALLOWED_CAMERAS:
+        return None
+    return params
+
 
 @app.websocket("/server_ws")
 async def ws_endpoint(websocket: WebSocket):
@@ -57,7 +121,7 @@ async def ws_endpoint(websocket: WebSocket):
 
     token = token_header.split(" ")[1]
     try:
-        current_user = get_current_user(token)
+        current_user = await get_current_user(token)
     except Exception:
         await websocket.close(code=4401)
         return
@@ -65,8 +129,9 @@ async def ws_endpoint(websocket: WebSocket):
     await websocket.accept()
     print(f"Cliente conectado ao server: {current_user}")
 
-    jetson_ws = None
-    jetson_task = None
+    # Uma única ligação por Jetson, partilhada por todos os browsers
+    subscriber = Subscriber(websocket, current_user)
+    link = None
 
     try:
         while True:
@@ -79,7 +144,16 @@ async def ws_endpoint(websocket: WebSocket):
             msg_type = message.get("type")
 
             if msg_type == "video":
-                roles = get_user_roles(current_user)
+                # roles vêm do token (cache), sem consulta à base de dados
+                context = await auth_cache.lookup_async(token)
+                if context is None:
+                    await websocket.close(code=4401)
+                    break
+                roles = context.roles
+                params = video_params(message, roles)
+                if params is None:
+                    await websocket.send_text(json.dumps({"status": "parametros_video_recusados"}))
+                    continue
 
                 # enviar status ao browser
                 await websocket.send_text(json.dumps({
@@ -87,21 +161,10 @@ async def ws_endpoint(websocket: WebSocket):
 
                 }))
 
-                print(jetson_ws)
-
-                # enviar comando para a Jetson iniciar video
-                if jetson_ws is not None:
+                # subscrever o vídeo da Jetson (inicia-o apenas se for o primeiro browser)
+                if link is not None:
                     try:
-                        await jetson_ws.send(json.dumps(
-                            {
-                                "type": "video",
-                                "params":
-                                    {"detect": "true",
-                                     "camera": "tests/data/sheepHerd1.mp4",
-                                     "area": [
-                                     ]
-                                }
-                            }))
+                        await broker.subscribe(link, subscriber, params)
                     except Exception as e:
                         print("Erro ao enviar comando de vídeo para Jetson:", e)
                         await websocket.send_text(json.dumps({"status": "erro_enviar_comando_jetson"}))
@@ -110,28 +173,21 @@ async def ws_endpoint(websocket: WebSocket):
             elif msg_type == "jetson":
                 msg_command = message.get("command")
 
-                if msg_command == "connect" and jetson_ws is None:
+                if msg_command == "connect" and (link is None or link.ws is None):
                     try:
-                        jetson_ws = await websockets.connect(JETSON_WS_URL)
-                        print("Ligação aberta com a Jetson.")
-
+                        if link is not None:
+                            await broker.disconnect(link, subscriber)
+                            link = None
+                        link = await broker.connect(JETSON_WS_URL)
                         await websocket.send_text(json.dumps({"status": "conectado_a_jetson"}))
 
-                        # inicializar task paralela
-                        jetson_task = asyncio.create_task(
-                            relay_from_jetson(jetson_ws, websocket)
-                        )
-
                     except Exception as e:
                         print("Erro ao ligar à Jetson:", e)
                         await websocket.send_text(json.dumps({"status": "erro_conectar_jetson"}))
 
-                elif msg_command == "disconnect" and jetson_ws is not None:
-                    if jetson_task:
-                        jetson_task.cancel()
-                    if jetson_ws:
-                        await jetson_ws.close()
-                        jetson_ws = None
+                elif msg_command == "disconnect" and link is not None:
+                    await broker.disconnect(link, subscriber)
+                    link = None
                     await websocket.send_text(json.dumps({"status": "jetson_desconectada"}))
 
     except Exception as e:
@@ -139,19 +195,63 @@ async def ws_endpoint(websocket: WebSocket):
 
     finally:
         print("Conexão encerrada.")
-        if jetson_task:
-            jetson_task.cancel()
-        if jetson_ws:
-            await jetson_ws.close()
+        if link is not None:
+            await broker.disconnect(link, subscriber)
+        subscriber.close()
+
 
-async def relay_from_jetson(jetson_ws, browser_ws):
+@app.get("/counts")
+async def counts(start: str, end: str, bucket: Optional[str] = None,
+                 camera: Optional[int] = None, area: Optional[int] = None,
+                 current_user: str = Depends(get_current_user)):
+    """Total sheep counted in [start, end), optionally per hour/day bucket"""
     try:
-        while True:
-            msg = await jetson_ws.recv()
-            await browser_ws.send_text(msg)
-    except Exception as e:
-        print("Jetson desconectou:", e)
-        try:
-            await browser_ws.send_text(json.dumps({"status": "jetson_disconnected"}))
-        except:
-            pass
+        start_time, end_time = parse_range(start, end)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid start/end")
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"bucket must be one of {BUCKETS}")
+
+    total = await pool.run(get_count_total, start_time, end_time, camera, area)
+    result = {"start": start, "end": end, "camera": camera, "area": area, "total": total}
+    if bucket is not None:
+        series = await pool.run(get_count_series, start_time, end_time, bucket, camera, area)
+        result["series"] = [{"bucket_start": b, "total": t} for b, t in series]
+    return result
+
+
+@app.get("/reports/export")
+def export(start: str, end: str, format: str = "csv", frames: bool = False,
+           context: AuthContext = Depends(require_role("DataExporter"))):
+    """Stream the counts (and optionally frame metadata) of [start, end) as CSV or NDJSON"""
+    try:
+        start_time, end_time = parse_range(start, end)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid start/end")
+    if format not in FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of {tuple(FORMATS)}")
+
+    filename = f"report_{start_time:%Y%m%d%H%M%S}_{end_time:%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        export_report(start_time, end_time, format, frames),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/broker")
+def broker_stats(current_user: str = Depends(get_current_user)):
+    """Upstream links, subscriber count and per-subscriber drop counters"""
+    return broker.stats()
+
+
+@app.get("/ingestion")
+def ingestion_stats(current_user: str = Depends(get_current_user)):
+    """Write-behind queue depth, flush latency and rows/sec"""
+    return ingestor.stats()
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: latency histograms, counters and queue depths"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
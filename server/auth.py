@@ -1,6 +1,9 @@
 # auth.py
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, NamedTuple, List
+from collections import OrderedDict
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
@@ -13,8 +16,18 @@ load_dotenv("server/.env")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 300))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 4096))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes com outro custo são marcados para rehash no próximo login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 # Configuração OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -26,11 +39,16 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-# Função para criar token JWT
+# Verifica e devolve (válida, novo_hash) — novo_hash só quando o custo mudou
+def verify_and_update_password(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# Função para criar token JWT (data pode incluir "roles" como claim)
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -42,13 +60,132 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
-# Função para obter o utilizador autenticado
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    payload = decode_access_token(token)
-    if payload is None:
+# Contexto de autorização: utilizador e roles de um token verificado
+class AuthContext(NamedTuple):
+    username: str
+    roles: List[str]
+
+
+class AuthCache:
+    """Maps verified tokens to their ``AuthContext`` for a bounded time.
+
+    A hit is a dict lookup instead of a JWT decode. Entries live for
+    ``ttl`` seconds (never past the token expiry) and the least recently used
+    ones are evicted beyond ``maxsize``. ``invalidate_user`` drops a user's
+    entries and makes tokens issued before the call load the roles through
+    ``role_loader`` (``role_loader_async`` in ``lookup_async``) instead of
+    trusting their (now stale) claims.
+    ``decode_observer``, when set, gets the seconds spent on each JWT decode.
+    """
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, maxsize=AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.role_loader = None
+        self.role_loader_async = None
+        self.decode_observer = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, token: str) -> Optional[AuthContext]:
+        context, expires_at = self._verify(token)
+        if expires_at is None:
+            return context
+        roles = self.role_loader(context.username) if self.role_loader is not None else None
+        return self._remember(token, context._replace(roles=list(roles or [])), expires_at)
+
+    async def lookup_async(self, token: str) -> Optional[AuthContext]:
+        """``lookup`` for the event loop: missing roles come from ``role_loader_async``"""
+        context, expires_at = self._verify(token)
+        if expires_at is None:
+            return context
+        roles = await self.role_loader_async(context.username) if self.role_loader_async is not None else None
+        return self._remember(token, context._replace(roles=list(roles or [])), expires_at)
+
+    def _verify(self, token):
+        """(context, None) when resolved, or (context without roles, expiry) when the roles must be loaded"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                expires_at, context = entry
+                if expires_at > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return context, None
+                del self._entries[token]
+            self.misses += 1
+
+        start = time.perf_counter()
+        payload = decode_access_token(token)
+        if self.decode_observer is not None:
+            self.decode_observer(time.perf_counter() - start)
+        if payload is None or "sub" not in payload:
+            return None, None
+
+        username = payload["sub"]
+        roles = payload.get("roles")
+        issued_at = payload.get("iat", 0)
+        expires_at = min(now + self.ttl, payload.get("exp", now + self.ttl))
+        with self._lock:
+            stale = issued_at <= self._invalidated.get(username, -1)
+        if roles is None or stale:
+            return AuthContext(username, []), expires_at
+        return self._remember(token, AuthContext(username, list(roles)), expires_at), None
+
+    def _remember(self, token, context, expires_at):
+        with self._lock:
+            self._entries[token] = (expires_at, context)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return context
+
+    def invalidate_user(self, username: str):
+        """Hook for role changes: forget the user's cached tokens"""
+        with self._lock:
+            self._invalidated[username] = int(time.time())
+            for token in [t for t, (_, ctx) in self._entries.items() if ctx.username == username]:
+                del self._entries[token]
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+
+
+auth_cache = AuthCache()
+
+
+# Função para obter o contexto (utilizador + roles) do token
+async def get_current_context(token: str = Depends(oauth2_scheme)) -> AuthContext:
+    context = await auth_cache.lookup_async(token)
+    if context is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return payload["sub"]
+    return context
+
+# Função para obter o utilizador autenticado
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return (await get_current_context(token)).username
+
+# Dependência que exige uma role (403 se o token não a tiver)
+def require_role(role: str):
+    def dependency(context: AuthContext = Depends(get_current_context)) -> AuthContext:
+        if role not in context.roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Role {role} required",
+            )
+        return context
+    return dependency
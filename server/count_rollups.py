@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+#=================================
+# Consultas de contagens por intervalo
+#=================================
+# Counts are attributed to the bucket of their start_time. Wide ranges are
+# answered from countsDaily/countsHourly (maintained by triggers on counts)
+# and only the ragged edges that do not cover a whole bucket hit raw rows.
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+BUCKETS = ("hour", "day")
+
+RAW = ("counts", "start_time", "count_number")
+HOURLY = ("countsHourly", "bucket_start", "total")
+DAILY = ("countsDaily", "bucket_start", "total")
+
+BUCKET_KEY = {
+    "hour": "strftime('%Y-%m-%d %H:00:00', {column})",
+    "day": "strftime('%Y-%m-%d 00:00:00', {column})",
+}
+
+
+def _floor_hour(t):
+    return t.replace(minute=0, second=0, microsecond=0)
+
+def _ceil_hour(t):
+    floor = _floor_hour(t)
+    return floor if floor == t else floor + timedelta(hours=1)
+
+def _floor_day(t):
+    return t.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _ceil_day(t):
+    floor = _floor_day(t)
+    return floor if floor == t else floor + timedelta(days=1)
+
+
+def _fmt(source, t):
+    # countsDaily keys are plain dates
+    return t.strftime("%Y-%m-%d") if source is DAILY else t.strftime(TIME_FORMAT)
+
+
+def plan(start: datetime, end: datetime, bucket="day"):
+    """Split [start, end) into (source, lo, hi) pieces: raw edges, rollups inside"""
+    pieces = []
+    h0, h1 = _ceil_hour(start), _floor_hour(end)
+    if h0 >= h1:
+        return [(RAW, start, end)] if start < end else []
+
+    if start < h0:
+        pieces.append((RAW, start, h0))
+    d0, d1 = _ceil_day(h0), _floor_day(h1)
+    if bucket == "day" and d0 < d1:
+        if h0 < d0:
+            pieces.append((HOURLY, h0, d0))
+        pieces.append((DAILY, d0, d1))
+        if d1 < h1:
+            pieces.append((HOURLY, d1, h1))
+    else:
+        pieces.append((HOURLY, h0, h1))
+    if h1 < end:
+        pieces.append((RAW, h1, end))
+    return pieces
+
+
+def _where(source, lo, hi, id_camera, id_area):
+    _, time_column, _ = source
+    clauses = [f"{time_column} >= ?", f"{time_column} < ?"]
+    params = [_fmt(source, lo), _fmt(source, hi)]
+    if id_camera is not None:
+        clauses.append("id_camera = ?")
+        params.append(id_camera)
+    if id_area is not None:
+        clauses.append("id_area = ?")
+        params.append(id_area)
+    return " AND ".join(clauses), params
+
+
+def count_total(conn, start: datetime, end: datetime, id_camera=None, id_area=None):
+    """Total sheep counted in [start, end)"""
+    total = 0
+    for source, lo, hi in plan(start, end, "day"):
+        table, _, value = source
+        where, params = _where(source, lo, hi, id_camera, id_area)
+        total += conn.execute(f"SELECT COALESCE(SUM({value}), 0) FROM {table} WHERE {where}", params).fetchone()[0]
+    return total
+
+
+def count_series(conn, start: datetime, end: datetime, bucket="hour", id_camera=None, id_area=None):
+    """[(bucket_start, total)] per hour or day in [start, end)"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket inválido: {bucket}")
+
+    series = {}
+    for source, lo, hi in plan(start, end, bucket):
+        table, time_column, value = source
+        where, params = _where(source, lo, hi, id_camera, id_area)
+        key = BUCKET_KEY[bucket].format(column=time_column)
+        rows = conn.execute(f"SELECT {key}, SUM({value}) FROM {table} WHERE {where} GROUP BY 1", params)
+        for bucket_start, total in rows:
+            series[bucket_start] = series.get(bucket_start, 0) + total
+    return sorted(series.items())
+
+
+def parse_time(value: str):
+    """ISO time as the naive local time stored in the database (an offset is converted first)"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone()
+    return moment.replace(tzinfo=None)
+
+
+def parse_range(start: str, end: str):
+    """(start, end) of a query window; ValueError unless start < end"""
+    start_time, end_time = parse_time(start), parse_time(end)
+    if start_time >= end_time:
+        raise ValueError("start deve ser anterior a end")
+    return start_time, end_time
@@ -88,6 +88,92 @@ BEGIN
 END;
 """)
 
+# Covering indexes for the usual filters (camera / area / time range)
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS idx_counts_camera_time
+ON counts (id_camera, start_time, id_area, count_number)
+""")
+
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS idx_counts_area_time
+ON counts (id_area, start_time, id_camera, count_number)
+""")
+
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS idx_counts_time
+ON counts (start_time, id_camera, id_area, count_number)
+""")
+
+# Rollups per camera/area, kept up to date by the triggers below
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS countsHourly (
+    id_camera INTEGER NOT NULL,
+    id_area INTEGER NOT NULL,
+    bucket_start TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    
+    PRIMARY KEY (id_camera, id_area, bucket_start)
+) WITHOUT ROWID
+""")
+
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS countsDaily (
+    id_camera INTEGER NOT NULL,
+    id_area INTEGER NOT NULL,
+    bucket_start TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    
+    PRIMARY KEY (id_camera, id_area, bucket_start)
+) WITHOUT ROWID
+""")
+
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_counts_hourly_time ON countsHourly (bucket_start, id_camera, id_area, total)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_counts_daily_time ON countsDaily (bucket_start, id_camera, id_area, total)")
+
+for table, bucket in (("countsHourly", "strftime('%Y-%m-%d %H:00:00', {row}.start_time)"),
+                      ("countsDaily", "date({row}.start_time)")):
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_insert
+    AFTER INSERT ON counts
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO {table} (id_camera, id_area, bucket_start, total, rows)
+        VALUES (NEW.id_camera, NEW.id_area, {bucket.format(row="NEW")}, NEW.count_number, 1)
+        ON CONFLICT (id_camera, id_area, bucket_start) DO UPDATE SET
+            total = total + excluded.total,
+            rows = rows + 1;
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_update
+    AFTER UPDATE OF count_number, start_time, id_camera, id_area ON counts
+    FOR EACH ROW
+    BEGIN
+        UPDATE {table} SET total = total - OLD.count_number, rows = rows - 1
+        WHERE id_camera = OLD.id_camera AND id_area = OLD.id_area
+          AND bucket_start = {bucket.format(row="OLD")};
+        INSERT INTO {table} (id_camera, id_area, bucket_start, total, rows)
+        VALUES (NEW.id_camera, NEW.id_area, {bucket.format(row="NEW")}, NEW.count_number, 1)
+        ON CONFLICT (id_camera, id_area, bucket_start) DO UPDATE SET
+            total = total + excluded.total,
+            rows = rows + 1;
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_delete
+    AFTER DELETE ON counts
+    FOR EACH ROW
+    BEGIN
+        UPDATE {table} SET total = total - OLD.count_number, rows = rows - 1
+        WHERE id_camera = OLD.id_camera AND id_area = OLD.id_area
+          AND bucket_start = {bucket.format(row="OLD")};
+    END;
+    """)
+
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS vertices (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -125,13 +211,21 @@ CREATE TABLE IF NOT EXISTS frames (
     id_count INTEGER NOT NULL,
     num_counts_frame INTEGER NOT NULL,
     captured_time TIMESTAMP NOT NULL,
-    image BLOB NOT NULL,
+    image_segment INTEGER NOT NULL,
+    image_offset INTEGER NOT NULL,
+    image_length INTEGER NOT NULL,
+    image_hash TEXT NOT NULL,
     
     PRIMARY KEY (frame_number, id_count),
     FOREIGN KEY (id_count) REFERENCES counts (id)    
 )
 """)
 
+# Images live in segment files (server/frame_store.py); retention deletes by segment
+cursor.execute("""
+CREATE INDEX IF NOT EXISTS idx_frames_segment ON frames (image_segment, image_offset)
+""")
+
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS reportInfo (
     id INTEGER PRIMARY KEY AUTOINCREMENT, 
@@ -1,6 +1,8 @@
-import sqlite3
 from dotenv import load_dotenv
-from .auth import verify_password
+from .auth import verify_password, auth_cache
+from .db_pool import ConnectionPool
+from .password_verifier import password_verifier
+from .count_rollups import count_total, count_series
 import os
 
 #=================================
@@ -8,15 +10,42 @@ import os
 #=================================
 load_dotenv("server/.env")
 DB_PATH = os.getenv("DB_PATH", "server/smartlivestock.db")
+DB_WORKERS = int(os.getenv("DB_WORKERS", 4))
+
+pool = ConnectionPool(DB_PATH, DB_WORKERS)
+
+#=================================
+# Queries
+#=================================
+SELECT_USER = "SELECT username, password FROM users WHERE username=?"
+
+UPDATE_PASSWORD = "UPDATE users SET password=? WHERE username=?"
+
+SELECT_USER_ID = "SELECT id FROM users WHERE username=?"
+
+SELECT_USER_ROLES = """
+    SELECT r.name
+    FROM roles r
+    JOIN userRoles ur ON ur.id_role = r.id
+    JOIN users u ON ur.id_user = u.id
+    WHERE u.username = ?
+    """
+
+INSERT_USER_ROLE = """
+    INSERT OR IGNORE INTO userRoles (id_user, id_role)
+    SELECT u.id, r.id FROM users u, roles r WHERE u.username = ? AND r.name = ?
+    """
+
+DELETE_USER_ROLE = """
+    DELETE FROM userRoles
+    WHERE id_user = (SELECT id FROM users WHERE username = ?)
+      AND id_role = (SELECT id FROM roles WHERE name = ?)
+    """
 
 
 # Função para autenticar utilizador na base de dados
 def authenticate_user(username: str, password: str):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, password FROM users WHERE username=?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = pool.connection().execute(SELECT_USER, (username,)).fetchone()
     if not user:
         return False
     db_username, db_password = user
@@ -25,18 +54,76 @@ def authenticate_user(username: str, password: str):
     return {"username": db_username}
 
 
+def get_user_credentials(username: str):
+    return pool.connection().execute(SELECT_USER, (username,)).fetchone()
+
+
+def get_user_id(username: str):
+    row = pool.connection().execute(SELECT_USER_ID, (username,)).fetchone()
+    return row[0] if row else None
+
+
+def update_password_hash(username: str, hashed_password: str):
+    conn = pool.connection()
+    with conn:
+        conn.execute(UPDATE_PASSWORD, (hashed_password, username))
+
+
 def get_user_roles(current_user: str):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    rows = pool.connection().execute(SELECT_USER_ROLES, (current_user,)).fetchall()
+    return [row[0] for row in rows]
+
+
+# Alterações a userRoles invalidam a cache de autorização do utilizador
+def add_user_role(username: str, role: str):
+    conn = pool.connection()
+    with conn:
+        changed = conn.execute(INSERT_USER_ROLE, (username, role)).rowcount > 0
+    if changed:
+        auth_cache.invalidate_user(username)
+    return changed
+
+
+def remove_user_role(username: str, role: str):
+    conn = pool.connection()
+    with conn:
+        changed = conn.execute(DELETE_USER_ROLE, (username, role)).rowcount > 0
+    if changed:
+        auth_cache.invalidate_user(username)
+    return changed
+
+
+# Contagens por intervalo (rollups + linhas das extremidades)
+def get_count_total(start, end, id_camera=None, id_area=None):
+    return count_total(pool.connection(), start, end, id_camera, id_area)
+
+
+def get_count_series(start, end, bucket="hour", id_camera=None, id_area=None):
+    return count_series(pool.connection(), start, end, bucket, id_camera, id_area)
+
+
+# Roles de tokens invalidados são relidas da base de dados
+auth_cache.role_loader = get_user_roles
+
+
+# Versões não bloqueantes para endpoints async
+# bcrypt corre no executor limitado (pode lançar LoginBusy) e o hash é
+# atualizado quando o custo configurado mudou
+async def authenticate_user_async(username: str, password: str):
+    user = await pool.run(get_user_credentials, username)
+    if not user:
+        return False
+    db_username, db_password = user
+    valid, new_hash = await password_verifier.verify(password, db_password)
+    if not valid:
+        return False
+    if new_hash:
+        await pool.run(update_password_hash, db_username, new_hash)
+    return {"username": db_username}
+
+
+async def get_user_roles_async(current_user: str):
+    return await pool.run(get_user_roles, current_user)
 
-    cursor.execute("""
-    SELECT r.name
-    FROM roles r
-    JOIN userRoles ur ON ur.id_role = r.id
-    JOIN users u ON ur.id_user = u.id
-    WHERE u.username = ?
-    """, (current_user,))
 
-    roles = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return roles
+auth_cache.role_loader_async = get_user_roles_async
@@ -0,0 +1,74 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import DB_SECONDS
+
+#=================================
+# Configuração
+#=================================
+DB_WORKERS = 4
+STATEMENT_CACHE_SIZE = 128
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",     # seguro em WAL, sem fsync em cada commit
+    "PRAGMA cache_size=-16000",      # ~16 MB de page cache por ligação
+    "PRAGMA mmap_size=268435456",    # 256 MB de leituras mapeadas em memória
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+#=================================
+# Pool de ligações
+#=================================
+class ConnectionPool:
+    """One SQLite connection per thread, opened lazily and then reused.
+
+    Connections run in WAL mode so readers never block the writer, and keep
+    sqlite3's statement cache, so repeated queries are prepared only once per
+    thread. Async code should go through ``run`` which executes on a small
+    dedicated executor, keeping the number of open connections bounded.
+    """
+
+    def __init__(self, db_path, workers=DB_WORKERS):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    def open(self, check_same_thread=True):
+        """New connection with the pool's pragmas, owned (and closed) by the caller"""
+        conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE,
+                               check_same_thread=check_same_thread)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def run(self, fn, *args):
+        """Run a blocking DB function on the pool's executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, DB_SECONDS.timed(fn, fn.__name__), *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass  # ligação criada noutra thread
+            self._connections.clear()
+        self._local = threading.local()
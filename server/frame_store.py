@@ -0,0 +1,230 @@
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+
+#=================================
+# Configuração
+#=================================
+load_dotenv("server/.env")
+FRAME_STORE_DIR = os.getenv("FRAME_STORE_DIR", "server/frames")
+SEGMENT_SIZE = int(os.getenv("SEGMENT_SIZE", 64 * 1024 * 1024))
+DEDUP_INDEX_SIZE = int(os.getenv("DEDUP_INDEX_SIZE", 100_000))
+
+# Cada registo: comprimento (u32) + sha256 (32 bytes) + imagem
+RECORD_HEADER = struct.Struct("!I32s")
+SEGMENT_NAME = "segment-{:06d}.seg"
+SEGMENT_PATTERN = re.compile(r"segment-(\d{6})\.seg$")
+
+#=================================
+# Queries
+#=================================
+SELECT_SEGMENT_USAGE = """
+    SELECT image_segment, SUM(image_length)
+    FROM (SELECT DISTINCT image_segment, image_offset, image_length FROM frames)
+    GROUP BY image_segment
+    """
+
+SELECT_SEGMENT_FRAMES = """
+    SELECT DISTINCT image_offset, image_length, image_hash
+    FROM frames
+    WHERE image_segment = ?
+    """
+
+UPDATE_FRAME_LOCATION = """
+    UPDATE frames SET image_segment = ?, image_offset = ?
+    WHERE image_segment = ? AND image_offset = ?
+    """
+
+DELETE_EXPIRED_FRAMES = "DELETE FROM frames WHERE image_segment = ? AND captured_time < ?"
+
+SELECT_SEGMENT_HAS_FRAMES = "SELECT 1 FROM frames WHERE image_segment = ? LIMIT 1"
+
+
+#=================================
+# Segment store
+#=================================
+class FrameStore:
+    """Append-only segment files holding frame JPEGs outside SQLite.
+
+    Images are appended to the active segment, which rotates once it passes
+    ``segment_size``; the database keeps only (segment, offset, length, hash).
+    Identical images are stored once through a bounded index of recent
+    hashes, limited to the active segment so a frame never references a
+    segment older than itself. Reads return a ``memoryview`` over a memory-mapped segment, so
+    serving an image copies nothing.
+    """
+
+    def __init__(self, directory=FRAME_STORE_DIR, segment_size=SEGMENT_SIZE, dedup_size=DEDUP_INDEX_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.dedup_size = dedup_size
+        self.dedup_hits = 0
+        self._index = OrderedDict()      # sha256 -> (segment, offset, length)
+        self._maps = {}
+        self._lock = threading.Lock()
+        # held by writers from append() until their frame rows are committed,
+        # and by retention/compaction while they drop a segment
+        self.reference_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        segments = self.segments()
+        self._active = segments[-1] if segments else 1
+        self._file = open(self._path(self._active), "ab")
+
+    def _path(self, segment):
+        return os.path.join(self.directory, SEGMENT_NAME.format(segment))
+
+    def segments(self):
+        """Existing segment numbers, oldest first"""
+        found = (SEGMENT_PATTERN.match(name) for name in os.listdir(self.directory))
+        return sorted(int(m.group(1)) for m in found if m)
+
+    # ---------------- escrita ----------------
+    def append(self, data):
+        """Store an image and return (segment, offset, length, hash)"""
+        digest = hashlib.sha256(data).digest()
+        with self._lock:
+            location = self._index.get(digest)
+            if location is not None:
+                self._index.move_to_end(digest)
+                self.dedup_hits += 1
+                return location + (digest.hex(),)
+
+            if self._file.tell() >= self.segment_size:
+                self._rotate()
+
+            self._file.write(RECORD_HEADER.pack(len(data), digest))
+            offset = self._file.tell()
+            self._file.write(data)
+            location = (self._active, offset, len(data))
+
+            self._index[digest] = location
+            if len(self._index) > self.dedup_size:
+                self._index.popitem(last=False)
+            return location + (digest.hex(),)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def _rotate(self):
+        self._index.clear()
+        self._file.close()
+        self._active += 1
+        self._file = open(self._path(self._active), "ab")
+
+    # ---------------- leitura ----------------
+    def read(self, segment, offset, length):
+        """Zero-copy view of an image"""
+        with self._lock:
+            if segment == self._active:
+                self._file.flush()
+            view = self._maps.get(segment)
+            if view is None or len(view) < offset + length:
+                with open(self._path(segment), "rb") as f:
+                    view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                self._maps[segment] = view
+        return view[offset:offset + length]
+
+    # ---------------- retenção ----------------
+    def forget_segment(self, segment):
+        """Stop deduplicating against a segment that is about to go away"""
+        with self._lock:
+            self._index = OrderedDict((h, loc) for h, loc in self._index.items() if loc[0] != segment)
+
+    def delete_segment(self, segment):
+        self.forget_segment(segment)
+        with self._lock:
+            if segment == self._active:
+                self._rotate()
+            self._maps.pop(segment, None)
+            try:
+                os.remove(self._path(segment))
+            except FileNotFoundError:
+                pass
+
+    def segment_age(self, segment):
+        return time.time() - os.path.getmtime(self._path(segment))
+
+    def segment_bytes(self, segment):
+        return os.path.getsize(self._path(segment))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._maps.clear()
+
+
+#=================================
+# Retenção e compactação (base de dados + segmentos)
+#=================================
+def _cutoff(max_age_seconds):
+    # mesmo formato que captured_time (ingestion._timestamp)
+    return datetime.fromtimestamp(time.time() - max_age_seconds).isoformat(sep=" ", timespec="milliseconds")
+
+
+def apply_retention(store, conn, max_age_seconds):
+    """Delete the frame rows older than max_age from sealed segments older than max_age
+
+    A segment file goes away only once no row references it any more, so a
+    younger frame whose image lives there (compacted or deduplicated into
+    it) keeps the segment alive.
+    """
+    cutoff = _cutoff(max_age_seconds)
+    candidates = [s for s in store.segments()[:-1] if store.segment_age(s) > max_age_seconds]
+    expired = []
+    if candidates:
+        with store.reference_lock, conn:
+            for segment in candidates:
+                conn.execute(DELETE_EXPIRED_FRAMES, (segment, cutoff))
+                if conn.execute(SELECT_SEGMENT_HAS_FRAMES, (segment,)).fetchone() is None:
+                    expired.append(segment)
+        for segment in expired:
+            store.delete_segment(segment)
+    return expired
+
+
+def compact(store, conn, min_live_ratio=0.5):
+    """Rewrite sealed segments whose live bytes fell below min_live_ratio
+
+    The images are copied without blocking the writers; the frames
+    committed meanwhile are copied too, with the writers held off, in the
+    same step that repoints the rows and deletes the segment.
+    """
+    usage = dict(conn.execute(SELECT_SEGMENT_USAGE).fetchall())
+    compacted = []
+    for segment in store.segments()[:-1]:
+        live = usage.get(segment, 0)
+        if live >= min_live_ratio * store.segment_bytes(segment):
+            continue
+
+        store.forget_segment(segment)
+        moves = {}
+        _copy_frames(store, conn, segment, moves)
+        with store.reference_lock:
+            _copy_frames(store, conn, segment, moves)
+            with conn:
+                conn.executemany(UPDATE_FRAME_LOCATION,
+                                 [(new_segment, new_offset, segment, offset)
+                                  for offset, (new_segment, new_offset) in moves.items()])
+            store.delete_segment(segment)
+        compacted.append(segment)
+    return compacted
+
+
+def _copy_frames(store, conn, segment, moves):
+    """Append the images of ``segment`` not yet in ``moves`` (offset -> new location) to the active one"""
+    for offset, length, _ in conn.execute(SELECT_SEGMENT_FRAMES, (segment,)).fetchall():
+        if offset in moves:
+            continue
+        data = bytes(store.read(segment, offset, length))
+        new_segment, new_offset, _, _ = store.append(data)
+        moves[offset] = (new_segment, new_offset)
+    store.flush()
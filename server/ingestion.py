@@ -0,0 +1,343 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from dotenv import load_dotenv
+from common.protocol import HEADER_SIZE, decode_frame, camera_key
+from .database_handler import pool, get_user_id
+from .frame_store import FrameStore, apply_retention, compact
+
+#=================================
+# Configuração
+#=================================
+load_dotenv("server/.env")
+COUNT_INTERVAL = int(os.getenv("COUNT_INTERVAL", 60))               # segundos por linha de counts
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 1000))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 200))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 1.0))
+INGEST_RETRIES = int(os.getenv("INGEST_RETRIES", 3))                # novas tentativas de um lote que falhou
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", 0.5))    # segundos, dobra a cada tentativa
+FRAME_RETENTION_DAYS = float(os.getenv("FRAME_RETENTION_DAYS", 30))
+COMPACT_MIN_LIVE_RATIO = float(os.getenv("COMPACT_MIN_LIVE_RATIO", 0.5))
+MAINTENANCE_INTERVAL = int(os.getenv("MAINTENANCE_INTERVAL", 3600))
+
+#=================================
+# Queries
+#=================================
+SELECT_MAX_COUNT_ID = "SELECT COALESCE(MAX(id), 0) FROM counts"
+
+SELECT_COUNT_EXISTS = "SELECT 1 FROM counts WHERE id = ?"
+
+UPSERT_COUNT = """
+    INSERT INTO counts (id, id_camera, id_user, id_area, count_number, start_time, end_time, duration)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        count_number = excluded.count_number,
+        end_time = excluded.end_time,
+        duration = excluded.duration
+    """
+
+INSERT_FRAME = """
+    INSERT OR IGNORE INTO frames (frame_number, id_count, num_counts_frame, captured_time,
+                                  image_segment, image_offset, image_length, image_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+COUNT = "count"
+FRAME = "frame"
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).isoformat(sep=" ", timespec="milliseconds")
+
+
+#=================================
+# Contagem de uma câmara
+#=================================
+class CountStream:
+    """Open counting interval of one camera stream.
+
+    Each interval becomes one ``counts`` row. Its id is allocated up front so
+    frames can reference it before the row is final; the row is written once
+    when the interval opens and updated when it closes.
+    """
+
+    def __init__(self, id_camera, id_area, id_user):
+        self.id_camera = id_camera
+        self.id_area = id_area
+        self.id_user = id_user
+        self.count_id = None
+        self.start = None
+        self.count = 0
+        self.pending = {}     # sequence -> sheep counted in that frame
+
+    def row(self, end):
+        end = max(end, self.start + 0.001)
+        return (self.count_id, self.id_camera, self.id_user, self.id_area, self.count,
+                _timestamp(self.start), _timestamp(end), int(end - self.start))
+
+
+#=================================
+# Ingestão write-behind
+#=================================
+class Ingestor:
+    """Buffers count events and captured frames and writes them in batches.
+
+    The relay hands every Jetson message to ``observe``. Rows go into a
+    bounded queue (a full queue makes the relay wait, pushing back on the
+    Jetson link) and a flusher writes them with ``executemany`` in a single
+    transaction whenever ``batch_size`` rows are queued or ``flush_interval``
+    seconds have passed. A batch that fails is retried with backoff; when
+    rows are rejected (constraint errors) the batch is written row by row
+    and only the rejected rows are dropped. Counts and frames of a batch
+    share one transaction; images are appended to the frame store after
+    the counts are written, so a rejected count fails the batch first.
+    """
+
+    def __init__(self, db_pool=pool, queue_size=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE,
+                 flush_interval=INGEST_FLUSH_INTERVAL, count_interval=COUNT_INTERVAL, store=None,
+                 retries=INGEST_RETRIES, retry_delay=INGEST_RETRY_DELAY):
+        self.pool = db_pool
+        self._store = store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count_interval = count_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.streams = {}
+        self.flushes = 0
+        self.rows = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.flush_seconds = 0.0
+        self._queue = None
+        self._flusher = None
+        self._next_id = None
+        self._started_at = time.perf_counter()
+
+    # ---------------- streams ----------------
+    async def open_stream(self, params, username):
+        """Start recording a camera; needs id_camera and id_area in the params"""
+        id_camera, id_area = params.get("id_camera"), params.get("id_area")
+        if id_camera is None or id_area is None:
+            return None
+        id_user = await self.pool.run(get_user_id, username)
+        if id_user is None:
+            return None
+
+        stream = CountStream(id_camera, id_area, id_user)
+        self.streams[camera_key(params.get("camera"))] = stream
+        await self._open_interval(stream, time.time())
+        return stream
+
+    async def close_stream(self, cam_id):
+        stream = self.streams.pop(cam_id, None)
+        if stream is not None:
+            await self._submit(COUNT, stream.row(time.time()))
+
+    async def close_all(self):
+        for cam_id in list(self.streams):
+            await self.close_stream(cam_id)
+
+    async def _open_interval(self, stream, now):
+        if self._next_id is None:
+            self._next_id = (await self.pool.run(self._max_count_id)) + 1
+        stream.count_id = self._next_id
+        self._next_id += 1
+        stream.start = now
+        stream.count = 0
+        await self._submit(COUNT, stream.row(now))
+
+    async def _roll(self, stream, now):
+        if now - stream.start >= self.count_interval:
+            await self._submit(COUNT, stream.row(now))
+            await self._open_interval(stream, now)
+
+    # ---------------- messages ----------------
+    async def observe(self, message):
+        if isinstance(message, bytes):
+            if len(message) < HEADER_SIZE:
+                return
+            header, payload = decode_frame(message)
+            stream = self.streams.get(header["camera_id"])
+            if stream is None or not header["new_detections"]:
+                return
+            await self._roll(stream, time.time())
+            new = stream.pending.pop(header["sequence"], 0)
+            await self._submit(FRAME, (header["sequence"], stream.count_id, new,
+                                       _timestamp(header["timestamp"]), bytes(payload)))
+            return
+
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(data, dict) or data.get("type") not in ("count", "stats"):
+            return
+        stream = self.streams.get(data.get("camera_id"))
+        if stream is None:
+            return
+
+        await self._roll(stream, time.time())
+        if data["type"] == "count":
+            stream.count += data.get("new", 0)
+            if len(stream.pending) > 1000:
+                stream.pending.clear()
+            stream.pending[data.get("sequence")] = data.get("new", 0)
+
+    # ---------------- writer ----------------
+    async def _submit(self, kind, row):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+            self._flusher = asyncio.create_task(self._run())
+        await self._queue.put((kind, row))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        counts = [row for kind, row in batch if kind == COUNT]
+        frames = [row for kind, row in batch if kind == FRAME]
+        start = time.perf_counter()
+        delay = self.retry_delay
+        rejected = 0
+        for attempt in range(self.retries + 1):
+            try:
+                await self.pool.run(self._write, counts, frames)
+                break
+            except sqlite3.IntegrityError as e:
+                # linhas inválidas (ex.: câmara ou área desconhecida): gravar as outras uma a uma
+                print("Lote rejeitado, a gravar linha a linha:", e)
+                rejected = await self.pool.run(self._write_each, counts, frames)
+                break
+            except Exception as e:
+                self.errors += 1
+                if attempt == self.retries:
+                    print(f"Erro ao gravar contagens, {len(batch)} linhas perdidas:", e)
+                    self.rejected += len(batch)
+                    return
+                print(f"Erro ao gravar contagens (nova tentativa em {delay:.1f} s):", e)
+                await asyncio.sleep(delay)
+                delay *= 2
+        elapsed = time.perf_counter() - start
+        self.rejected += rejected
+        self.flushes += 1
+        self.rows += len(batch) - rejected
+        self.flush_seconds += elapsed
+        self.last_flush_ms = elapsed * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+    def _max_count_id(self):
+        return self.pool.connection().execute(SELECT_MAX_COUNT_ID).fetchone()[0]
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = FrameStore()
+        return self._store
+
+    def _store_images(self, frames):
+        # imagens vão para os segmentos; a tabela guarda só a localização
+        frames = [row[:4] + self.store.append(row[4]) for row in frames]
+        self.store.flush()
+        return frames
+
+    def _write(self, counts, frames):
+        # uma transação por lote: counts primeiro (os frames referenciam o intervalo),
+        # depois as imagens e os frames; se falhar, nada fica gravado e as imagens
+        # já escritas ficam sem referência até à compactação
+        # (repetir o lote é seguro: upsert, INSERT OR IGNORE e imagens deduplicadas)
+        conn = self.pool.connection()
+        with (self.store.reference_lock if frames else nullcontext()), conn:
+            if counts:
+                conn.executemany(UPSERT_COUNT, counts)
+            if frames:
+                conn.executemany(INSERT_FRAME, self._store_images(frames))
+
+    def _write_each(self, counts, frames):
+        """Write the rows one by one, skipping the rejected ones; returns how many were rejected"""
+        conn = self.pool.connection()
+        rejected = 0
+        for row in counts:
+            try:
+                with conn:
+                    conn.execute(UPSERT_COUNT, row)
+            except sqlite3.IntegrityError as e:
+                rejected += 1
+                print(f"Contagem {row[0]} (câmara {row[1]}, área {row[3]}) rejeitada:", e)
+
+        # frames de um intervalo que não foi gravado são descartados antes de escrever a imagem
+        valid = [row for row in frames if conn.execute(SELECT_COUNT_EXISTS, (row[1],)).fetchone()]
+        rejected += len(frames) - len(valid)
+        with self.store.reference_lock:
+            for row in self._store_images(valid):
+                try:
+                    with conn:
+                        conn.execute(INSERT_FRAME, row)
+                except sqlite3.IntegrityError as e:
+                    rejected += 1
+                    print(f"Frame {row[0]} rejeitado:", e)
+        return rejected
+
+    # ---------------- manutenção ----------------
+    def _maintain(self, max_age_seconds, min_live_ratio):
+        conn = self.pool.connection()
+        expired = apply_retention(self.store, conn, max_age_seconds)
+        compacted = compact(self.store, conn, min_live_ratio)
+        return expired, compacted
+
+    async def maintenance_loop(self, retention_days=FRAME_RETENTION_DAYS,
+                               min_live_ratio=COMPACT_MIN_LIVE_RATIO, interval=MAINTENANCE_INTERVAL):
+        """Periodically drop expired segments and compact sparse ones"""
+        while True:
+            try:
+                expired, compacted = await self.pool.run(self._maintain, retention_days * 86400, min_live_ratio)
+                if expired or compacted:
+                    print(f"Segmentos removidos: {expired} | compactados: {compacted}")
+            except Exception as e:
+                print("Erro na manutenção de frames:", e)
+            await asyncio.sleep(interval)
+
+    async def drain(self):
+        """Wait until everything queued so far is written"""
+        while self._queue is not None and not self._queue.empty():
+            await asyncio.sleep(self.flush_interval / 4)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "streams": len(self.streams),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "rows_per_sec": round(self.rows / elapsed, 2) if elapsed else 0.0,
+            "write_rows_per_sec": round(self.rows / self.flush_seconds, 2) if self.flush_seconds else 0.0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "dedup_hits": self._store.dedup_hits if self._store else 0,
+            "mean_flush_ms": round(self.flush_seconds * 1000 / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+
+ingestor = Ingestor()
@@ -0,0 +1,388 @@
+import asyncio, itertools, json, os, random, uuid
+from collections import deque
+import websockets
+from dotenv import load_dotenv
+from common.protocol import HEADER_SIZE, decode_header, camera_key
+from .ingestion import ingestor
+from .metrics import WS_SEND_SECONDS, RELAY_MESSAGES, SUBSCRIBER_DROPPED, JETSON_RECONNECTS, RELAY_GAPS
+
+#=================================
+# Configuração
+#=================================
+load_dotenv("server/.env")
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", 4))
+RECONNECT_BASE_DELAY = float(os.getenv("RECONNECT_BASE_DELAY", 0.5))    # segundos, duplica a cada tentativa
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", 8.0))
+RECONNECT_TIMEOUT = float(os.getenv("RECONNECT_TIMEOUT", 30.0))         # igual à tolerância da Jetson
+
+
+def backoff_delays(base=RECONNECT_BASE_DELAY, cap=RECONNECT_MAX_DELAY):
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))"""
+    for attempt in itertools.count():
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+#=================================
+# Subscriber (um browser)
+#=================================
+class Subscriber:
+    """One browser receiving a camera stream through its own bounded queue.
+
+    When the browser is slower than the Jetson the oldest queued message is
+    dropped, so it never stalls the upstream reader or the other viewers.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket, user, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.id = next(self._ids)
+        self.websocket = websocket
+        self.user = user
+        self.maxsize = maxsize
+        self.camera = None
+        self.sent = 0
+        self.dropped = 0
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, message):
+        if len(self._queue) >= self.maxsize:
+            self._queue.popleft()
+            self.dropped += 1
+            SUBSCRIBER_DROPPED.inc()
+        self._queue.append(message)
+        self._ready.set()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                message = self._queue.popleft()
+                if not self._queue:
+                    self._ready.clear()
+                with WS_SEND_SECONDS.time():
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Erro ao enviar para subscritor {self.id}:", e)
+
+    def close(self):
+        self._task.cancel()
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "user": self.user,
+            "camera": self.camera,
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+
+#=================================
+# Ligação a uma Jetson
+#=================================
+class JetsonLink:
+    """Single upstream websocket to a Jetson, shared by every browser.
+
+    Streams are multiplexed by camera: the first subscriber of a camera
+    starts it on the Jetson, the last one to leave stops it.
+
+    The link introduces itself with ``hello`` and a fixed id. When the
+    connection drops it reconnects with jittered backoff for up to
+    ``RECONNECT_TIMEOUT`` seconds; the Jetson then resumes the same
+    sessions (counts and tracker intact) and streams it no longer has are
+    started again. Gaps in the ``seq`` of text messages and in the frame
+    sequences are counted as lost messages.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.id = uuid.uuid4().hex
+        self.ws = None
+        self.users = 0
+        self.streams = {}       # camera_id -> set of Subscriber
+        self.cameras = {}       # camera_id -> camera source
+        self.params = {}        # camera_id -> params of its "video" command
+        self.reconnecting = False
+        self.reconnects = 0
+        self.last_seq = 0
+        self.frame_seq = {}     # camera_id -> last frame sequence
+        self.lost = {"text": 0, "frame": 0}
+        self._reader = None
+
+    async def open(self):
+        if self.ws is None:
+            await self._connect()
+            self._reader = asyncio.create_task(self._relay())
+            print("Ligação aberta com a Jetson.")
+
+    async def _connect(self):
+        self.ws = await websockets.connect(self.url)
+        await self.ws.send(json.dumps({"type": "hello", "link": self.id}))
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+            self._reader = None
+        if self.ws:
+            try:
+                # saída voluntária: a Jetson não espera pelo regresso desta ligação
+                await self.ws.send(json.dumps({"type": "bye"}))
+            except Exception:
+                pass
+            await self.ws.close()
+            self.ws = None
+            print("Ligação com a Jetson fechada.")
+
+    async def subscribe(self, subscriber, params):
+        cam_id = camera_key(params.get("camera"))
+        subscribers = self.streams.setdefault(cam_id, set())
+        if not subscribers:
+            # Primeiro subscritor desta câmara: iniciar o vídeo na Jetson
+            self.cameras[cam_id] = params.get("camera")
+            self.params[cam_id] = params
+            await self.ws.send(json.dumps({"type": "video", "params": params}))
+            await ingestor.open_stream(params, subscriber.user)
+        subscribers.add(subscriber)
+        subscriber.camera = params.get("camera")
+        await self._announce(cam_id)
+
+    async def unsubscribe(self, subscriber):
+        cam_id = camera_key(subscriber.camera)
+        subscribers = self.streams.get(cam_id)
+        if not subscribers or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        subscriber.camera = None
+        if subscribers:
+            await self._announce(cam_id)
+        else:
+            # Último subscritor saiu: parar a câmara na Jetson
+            del self.streams[cam_id]
+            camera = self.cameras.pop(cam_id, None)
+            self.params.pop(cam_id, None)
+            self.frame_seq.pop(cam_id, None)
+            await ingestor.close_stream(cam_id)
+            if self.ws:
+                try:
+                    await self.ws.send(json.dumps({"type": "stop", "camera": camera}))
+                except Exception as e:
+                    print("Erro ao parar câmara na Jetson:", e)
+
+    async def _announce(self, cam_id):
+        """Tell the Jetson how many browsers watch a camera (it encodes for them)"""
+        if self.ws:
+            try:
+                await self.ws.send(json.dumps({
+                    "type": "subscribers",
+                    "camera": self.cameras.get(cam_id),
+                    "count": len(self.streams.get(cam_id, ())),
+                }))
+            except Exception as e:
+                print("Erro ao enviar subscritores à Jetson:", e)
+
+    def _route(self, message, data):
+        """Subscribers that should receive an upstream message"""
+        if isinstance(message, bytes):
+            if len(message) < HEADER_SIZE:
+                return ()
+            return self.streams.get(decode_header(message)["camera_id"], ())
+
+        if isinstance(data, dict):
+            if "camera_id" in data:
+                return self.streams.get(data["camera_id"], ())
+            if data.get("camera") is not None:
+                return self.streams.get(camera_key(data["camera"]), ())
+        return [s for subscribers in self.streams.values() for s in subscribers]
+
+    def _track(self, message, data):
+        """Count messages missing from the sequence numbers (lost while the link was down)"""
+        if isinstance(message, bytes):
+            if len(message) < HEADER_SIZE:
+                return
+            header = decode_header(message)
+            last = self.frame_seq.get(header["camera_id"])
+            if last is not None and header["sequence"] > last + 1:
+                self.lost["frame"] += header["sequence"] - last - 1
+                RELAY_GAPS.labels("frame").inc(header["sequence"] - last - 1)
+            self.frame_seq[header["camera_id"]] = header["sequence"]
+        elif isinstance(data, dict) and isinstance(data.get("seq"), int):
+            if data["seq"] > self.last_seq + 1 and self.last_seq:
+                self.lost["text"] += data["seq"] - self.last_seq - 1
+                RELAY_GAPS.labels("text").inc(data["seq"] - self.last_seq - 1)
+            self.last_seq = max(self.last_seq, data["seq"])
+
+    async def _resumed(self, data):
+        """Jetson answered "hello" after a reconnect: restart what it no longer runs"""
+        cameras = data.get("cameras", ())
+        running = {camera_key(camera) for camera in cameras}
+        for cam_id, params in list(self.params.items()):
+            if cam_id not in running:
+                print(f"Câmara {self.cameras.get(cam_id)} não foi retomada: a reiniciar.")
+                self.frame_seq.pop(cam_id, None)
+                await self.ws.send(json.dumps({"type": "video", "params": params}))
+            await self._announce(cam_id)
+        for camera in cameras:
+            if camera_key(camera) not in self.params:
+                # parada enquanto a ligação estava em baixo
+                await self.ws.send(json.dumps({"type": "stop", "camera": camera}))
+        notice = json.dumps({"status": "jetson_reconnected", "resumed": bool(data.get("resumed"))})
+        for subscribers in self.streams.values():
+            for subscriber in subscribers:
+                subscriber.offer(notice)
+
+    async def _relay(self):
+        while True:
+            try:
+                message = await self.ws.recv()
+                RELAY_MESSAGES.labels("frame" if isinstance(message, bytes) else "text").inc()
+                data = None
+                if not isinstance(message, bytes):
+                    try:
+                        data = json.loads(message)
+                    except ValueError:
+                        data = {}
+                self._track(message, data)
+                if isinstance(data, dict) and data.get("type") == "hello":
+                    if not data.get("resumed"):
+                        # sessões novas na Jetson: as sequências recomeçam
+                        self.last_seq = data.get("seq", 0)
+                        self.frame_seq.clear()
+                    if self.reconnects:
+                        await self._resumed(data)
+                    continue
+                for subscriber in list(self._route(message, data)):
+                    subscriber.offer(message)
+                # Contagens e frames com novas deteções seguem para a base de dados
+                await ingestor.observe(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Jetson desconectou:", e)
+                self.ws = None
+                if not self.streams or not await self._reconnect():
+                    await self._drop()
+                    return
+
+    async def _reconnect(self):
+        """Reconnect with jittered exponential backoff; False after RECONNECT_TIMEOUT"""
+        self.reconnecting = True
+        notice = json.dumps({"status": "jetson_reconnecting"})
+        for subscribers in self.streams.values():
+            for subscriber in subscribers:
+                subscriber.offer(notice)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RECONNECT_TIMEOUT
+        try:
+            for delay in backoff_delays():
+                if loop.time() + delay > deadline:
+                    return False
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                except Exception as e:
+                    print("Nova tentativa de ligação à Jetson falhou:", e)
+                    continue
+                self.reconnects += 1
+                JETSON_RECONNECTS.inc()
+                print(f"Ligação à Jetson restabelecida (tentativa após {delay:.2f} s).")
+                return True
+        finally:
+            self.reconnecting = False
+
+    async def _drop(self):
+        """Give the link up: tell the browsers and close every stream"""
+        notice = json.dumps({"status": "jetson_disconnected"})
+        for subscribers in self.streams.values():
+            for subscriber in subscribers:
+                subscriber.offer(notice)
+                subscriber.camera = None
+        for cam_id in self.streams:
+            await ingestor.close_stream(cam_id)
+        self.streams.clear()
+        self.cameras.clear()
+        self.params.clear()
+        self.frame_seq.clear()
+        self.ws = None
+        self._reader = None
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "connected": self.ws is not None,
+            "reconnecting": self.reconnecting,
+            "reconnects": self.reconnects,
+            "lost": dict(self.lost),
+            "users": self.users,
+            "streams": {
+                str(self.cameras.get(cam_id, cam_id)): {
+                    "subscribers": len(subscribers),
+                    "subscriber_stats": [s.stats() for s in subscribers],
+                }
+                for cam_id, subscribers in self.streams.items()
+            },
+        }
+
+
+#=================================
+# Broker
+#=================================
+class JetsonBroker:
+    """Keeps one upstream link per Jetson and fans its frames out to browsers."""
+
+    def __init__(self):
+        self.links = {}
+        self._lock = asyncio.Lock()
+
+    async def connect(self, url):
+        """Register a browser as user of the Jetson link, opening it if needed"""
+        async with self._lock:
+            link = self.links.get(url)
+            if link is None:
+                link = JetsonLink(url)
+                await link.open()
+                self.links[url] = link
+            elif link.ws is None and not link.reconnecting:
+                await link.open()
+            link.users += 1
+            return link
+
+    async def disconnect(self, link, subscriber=None):
+        async with self._lock:
+            if subscriber is not None:
+                await link.unsubscribe(subscriber)
+            link.users = max(0, link.users - 1)
+            if link.users == 0:
+                await link.close()
+                self.links.pop(link.url, None)
+
+    async def subscribe(self, link, subscriber, params):
+        """Point a subscriber at a camera, leaving its previous one"""
+        async with self._lock:
+            if link.ws is None:
+                raise ConnectionError("Jetson não está ligada")
+            if subscriber.camera is not None:
+                await link.unsubscribe(subscriber)
+            await link.subscribe(subscriber, params)
+
+    @property
+    def subscriber_count(self):
+        return sum(len(s) for link in self.links.values() for s in link.streams.values())
+
+    def stats(self):
+        return {
+            "subscribers": self.subscriber_count,
+            "links": [link.stats() for link in self.links.values()],
+        }
+
+
+broker = JetsonBroker()
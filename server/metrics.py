@@ -0,0 +1,15 @@
+from common.metrics import Histogram, Counter, REGISTRY, CONTENT_TYPE
+
+#=================================
+# Métricas do servidor (expostas em /metrics)
+#=================================
+DB_SECONDS = Histogram("server_db_seconds", "Time of each blocking DB call run on the pool", ["call"])
+AUTH_SECONDS = Histogram("server_auth_seconds", "Password verification (queue included) and JWT decode time", ["step"])
+WS_SEND_SECONDS = Histogram("server_ws_send_seconds", "Time to send one message to a browser")
+RELAY_MESSAGES = Counter("server_relay_messages_total", "Messages received from Jetsons", ["kind"])
+SUBSCRIBER_DROPPED = Counter("server_subscriber_dropped_total", "Messages dropped for slow browsers")
+JETSON_RECONNECTS = Counter("server_jetson_reconnects_total", "Jetson links re-established after a drop")
+RELAY_GAPS = Counter("server_relay_gap_messages_total", "Jetson messages missing from the sequence numbers", ["kind"])
+
+__all__ = ["DB_SECONDS", "AUTH_SECONDS", "WS_SEND_SECONDS", "RELAY_MESSAGES", "SUBSCRIBER_DROPPED", "JETSON_RECONNECTS",
+           "RELAY_GAPS", "REGISTRY", "CONTENT_TYPE"]
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+from .auth import verify_and_update_password
+from .metrics import AUTH_SECONDS
+
+#=================================
+# Configuração
+#=================================
+load_dotenv("server/.env")
+LOGIN_EXECUTOR = os.getenv("LOGIN_EXECUTOR", "process")     # "process" ou "thread"
+LOGIN_WORKERS = int(os.getenv("LOGIN_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+LOGIN_QUEUE_LIMIT = int(os.getenv("LOGIN_QUEUE_LIMIT", 16))
+
+
+class LoginBusy(Exception):
+    """Raised when too many password checks are already waiting."""
+
+
+#=================================
+# Verificação de passwords
+#=================================
+class PasswordVerifier:
+    """Runs bcrypt checks on a dedicated, bounded executor.
+
+    A process pool keeps the CPU-heavy hashing off the GIL, so websocket and
+    API traffic keep flowing during a burst of logins. At most ``workers``
+    checks run at once and ``queue_limit`` more may wait; anything beyond
+    that fails fast with ``LoginBusy`` instead of piling up.
+    """
+
+    def __init__(self, executor=LOGIN_EXECUTOR, workers=LOGIN_WORKERS, queue_limit=LOGIN_QUEUE_LIMIT):
+        self.executor_type = executor
+        self.workers = workers
+        self.max_pending = workers + queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def verify(self, plain_password, hashed_password):
+        """(valid, new_hash) for the password; raises LoginBusy when saturated"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise LoginBusy()
+
+        self.pending += 1
+        try:
+            with AUTH_SECONDS.time("verify"):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._get_executor(), verify_and_update_password, plain_password, hashed_password
+                )
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_verifier = PasswordVerifier()
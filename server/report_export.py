@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .database_handler import pool
+from .ingestion import COUNT_INTERVAL, INGEST_FLUSH_INTERVAL, INGEST_RETRIES, INGEST_RETRY_DELAY
+
+#=================================
+# Configuração
+#=================================
+load_dotenv("server/.env")
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "server/reports")
+FILE_CHUNK_SIZE = 64 * 1024
+# Uma linha de counts ainda muda até COUNT_INTERVAL depois de começar, e a ingestão
+# write-behind ainda a pode gravar um flush (mais as novas tentativas) depois disso
+CACHE_SETTLE = timedelta(seconds=COUNT_INTERVAL + INGEST_FLUSH_INTERVAL
+                         + INGEST_RETRY_DELAY * (2 ** INGEST_RETRIES - 1))
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+COUNT_COLUMNS = ("id", "id_camera", "id_user", "id_area", "count_number", "start_time", "end_time", "duration")
+FRAME_COLUMNS = ("frame_number", "num_counts_frame", "captured_time",
+                 "image_segment", "image_offset", "image_length", "image_hash")
+
+#=================================
+# Queries (keyset pagination: nunca OFFSET)
+#=================================
+SELECT_COUNTS_PAGE = f"""
+    SELECT {", ".join(COUNT_COLUMNS)}
+    FROM counts
+    WHERE start_time >= ? AND start_time < ? AND (start_time, id) > (?, ?)
+    ORDER BY start_time, id
+    LIMIT ?
+    """
+
+SELECT_REPORT_COUNTS_PAGE = f"""
+    SELECT {", ".join("c." + column for column in COUNT_COLUMNS)}
+    FROM reportInfoCount ric
+    JOIN counts c ON c.id = ric.id_counts
+    WHERE ric.id_reports = ? AND (c.start_time, c.id) > (?, ?)
+    ORDER BY c.start_time, c.id
+    LIMIT ?
+    """
+
+SELECT_FRAMES = """
+    SELECT id_count, {columns}
+    FROM frames
+    WHERE id_count IN ({placeholders})
+    ORDER BY id_count, frame_number
+    """
+
+SELECT_REPORT = "SELECT id FROM reportInfo WHERE interval_start = ? AND interval_end = ?"
+INSERT_REPORT = "INSERT OR IGNORE INTO reportInfo (interval_start, interval_end) VALUES (?, ?)"
+DELETE_REPORT_COUNTS = "DELETE FROM reportInfoCount WHERE id_reports = ?"
+
+# Membros de um relatório em construção, na ligação da exportação (tabela TEMP)
+CREATE_STAGING = "CREATE TEMP TABLE IF NOT EXISTS reportStaging (id_counts INTEGER PRIMARY KEY)"
+CLEAR_STAGING = "DELETE FROM temp.reportStaging"
+INSERT_STAGING = "INSERT OR IGNORE INTO temp.reportStaging (id_counts) VALUES (?)"
+INSERT_REPORT_COUNTS = "INSERT INTO reportInfoCount (id_counts, id_reports) SELECT id_counts, ? FROM temp.reportStaging"
+
+
+#=================================
+# Leitura paginada
+#=================================
+def _pages(conn, query, params, page_size):
+    """Yield lists of count rows, one short query per page"""
+    last = ("", -1)
+    while True:
+        rows = conn.execute(query, (*params, *last, page_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1][5], rows[-1][0])
+        if len(rows) < page_size:
+            return
+
+def count_pages(conn, start, end, page_size=EXPORT_PAGE_SIZE):
+    return _pages(conn, SELECT_COUNTS_PAGE, (start, end), page_size)
+
+def report_pages(conn, report_id, page_size=EXPORT_PAGE_SIZE):
+    return _pages(conn, SELECT_REPORT_COUNTS_PAGE, (report_id,), page_size)
+
+def frames_for(conn, count_ids):
+    """Frame metadata for a page of counts, grouped by id_count"""
+    query = SELECT_FRAMES.format(columns=", ".join(FRAME_COLUMNS), placeholders=", ".join("?" * len(count_ids)))
+    frames = {}
+    for row in conn.execute(query, count_ids):
+        frames.setdefault(row[0], []).append(row[1:])
+    return frames
+
+
+#=================================
+# Formatação
+#=================================
+def render(conn, pages, fmt, include_frames):
+    """Turn pages of counts into CSV/NDJSON text chunks (one chunk per page)"""
+    header_written = False
+    for rows in pages:
+        frames = frames_for(conn, [row[0] for row in rows]) if include_frames else {}
+        out = io.StringIO()
+
+        if fmt == "csv":
+            writer = csv.writer(out)
+            if not header_written:
+                writer.writerow(COUNT_COLUMNS + (FRAME_COLUMNS if include_frames else ()))
+                header_written = True
+            for row in rows:
+                if include_frames:
+                    # uma linha por frame (ou uma linha sem frame)
+                    for frame in frames.get(row[0]) or [(None,) * len(FRAME_COLUMNS)]:
+                        writer.writerow(row + tuple(frame))
+                else:
+                    writer.writerow(row)
+        else:
+            for row in rows:
+                record = dict(zip(COUNT_COLUMNS, row))
+                if include_frames:
+                    record["frames"] = [dict(zip(FRAME_COLUMNS, f)) for f in frames.get(row[0], [])]
+                out.write(json.dumps(record) + "\n")
+
+        yield out.getvalue().encode("utf-8")
+
+    if fmt == "csv" and not header_written:
+        yield (",".join(COUNT_COLUMNS + (FRAME_COLUMNS if include_frames else ())) + "\r\n").encode("utf-8")
+
+
+#=================================
+# Cache de relatórios (reportInfo / reportInfoCount)
+#=================================
+def _cache_path(report_id, fmt, include_frames):
+    suffix = "-frames" if include_frames else ""
+    return os.path.join(REPORT_CACHE_DIR, f"report-{report_id}{suffix}.{fmt}")
+
+def _cached_files(report_id):
+    return [_cache_path(report_id, fmt, frames) for fmt in FORMATS for frames in (False, True)
+            if os.path.exists(_cache_path(report_id, fmt, frames))]
+
+def _get_or_create_report(conn, start, end):
+    with conn:
+        conn.execute(INSERT_REPORT, (start, end))
+    return conn.execute(SELECT_REPORT, (start, end)).fetchone()[0]
+
+def _record_membership(conn, pages, report_id):
+    """Pass pages through while storing them as the report's counts
+
+    The counts are staged page by page and replace the stored membership in
+    one transaction after the last page, so an export that is cut short (or
+    runs alongside another one) never leaves a partial membership.
+    """
+    conn.execute(CREATE_STAGING)
+    with conn:
+        conn.execute(CLEAR_STAGING)
+    for rows in pages:
+        with conn:
+            conn.executemany(INSERT_STAGING, [(row[0],) for row in rows])
+        yield rows
+    with conn:
+        conn.execute(DELETE_REPORT_COUNTS, (report_id,))
+        conn.execute(INSERT_REPORT_COUNTS, (report_id,))
+        conn.execute(CLEAR_STAGING)
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+def _write_through(chunks, path):
+    """Yield chunks while saving them; the file only appears when complete"""
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    # nome único: duas exportações do mesmo relatório não partilham o ficheiro temporário
+    fd, tmp_path = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def export_report(start: datetime, end: datetime, fmt="csv", include_frames=False):
+    """Byte chunks of the report for [start, end), in constant memory.
+
+    Settled intervals (ended more than CACHE_SETTLE ago) are cached: the
+    first export stores the report in reportInfo/reportInfoCount and keeps
+    the rendered file; a repeat export streams that file, and another format
+    reuses the stored membership.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"formato inválido: {fmt}")
+    return _export(start, end, fmt, include_frames)
+
+
+def _export(start, end, fmt, include_frames):
+    # uma ligação própria por exportação, fechada no fim: o StreamingResponse pede
+    # cada chunk numa thread qualquer do threadpool, fora do executor do pool
+    conn = pool.open(check_same_thread=False)
+    try:
+        yield from _chunks(conn, start, end, fmt, include_frames)
+    finally:
+        conn.close()
+
+
+def _chunks(conn, start, end, fmt, include_frames):
+    interval_start = start.strftime("%Y-%m-%d %H:%M:%S")
+    interval_end = end.strftime("%Y-%m-%d %H:%M:%S")
+
+    if end >= datetime.now() - CACHE_SETTLE:
+        # intervalo ainda aberto ou recente: os dados podem mudar, não guardar
+        return render(conn, count_pages(conn, interval_start, interval_end), fmt, include_frames)
+
+    report_id = _get_or_create_report(conn, interval_start, interval_end)
+    path = _cache_path(report_id, fmt, include_frames)
+    if os.path.exists(path):
+        return _read_file(path)
+
+    if _cached_files(report_id):
+        pages = report_pages(conn, report_id)
+    else:
+        pages = _record_membership(conn, count_pages(conn, interval_start, interval_end), report_id)
+    return _write_through(render(conn, pages, fmt, include_frames), path)
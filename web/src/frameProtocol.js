@@ -0,0 +1,43 @@
+// Decoder for the binary frame messages relayed from the Jetson.
+// Layout (network byte order) mirrors common/protocol.py:
+// version u8 | type u8 | flags u8 | reserved u8 | camera id u32 |
+// timestamp u64 (microseconds) | sequence u32 | JPEG payload
+
+export const PROTOCOL_VERSION = 1
+export const HEADER_SIZE = 20
+
+export const MSG_FRAME = 1
+
+export const FLAG_NEW_DETECTIONS = 0x01
+export const FLAG_DETECT_ENABLED = 0x02
+
+// Set `ws.binaryType = 'arraybuffer'` so binary messages arrive as ArrayBuffer
+export function decodeFrame(buffer) {
+  if (buffer.byteLength < HEADER_SIZE) {
+    throw new Error('Mensagem binária demasiado curta')
+  }
+
+  const view = new DataView(buffer)
+  const version = view.getUint8(0)
+  if (version !== PROTOCOL_VERSION) {
+    throw new Error(`Versão de protocolo desconhecida: ${version}`)
+  }
+
+  const flags = view.getUint8(2)
+  return {
+    type: view.getUint8(1),
+    flags,
+    cameraId: view.getUint32(4),
+    timestamp: Number(view.getBigUint64(8)) / 1000, // milliseconds, ready for new Date()
+    sequence: view.getUint32(16),
+    newDetections: (flags & FLAG_NEW_DETECTIONS) !== 0,
+    detectEnabled: (flags & FLAG_DETECT_ENABLED) !== 0,
+    // View over the same memory, no copy
+    jpeg: new Uint8Array(buffer, HEADER_SIZE),
+  }
+}
+
+// Object URL for an <img>; revoke the previous one to avoid leaking blobs
+export function frameToObjectURL(frame) {
+  return URL.createObjectURL(new Blob([frame.jpeg], { type: 'image/jpeg' }))
+}